@@ -0,0 +1,100 @@
+"""
+make_tree のキャプチャエンジン比較ベンチマーク。
+
+大規模なフィクスチャページを生成し、snapshot 方式 (1回の page.evaluate) と
+handle 方式 (ElementHandle の再帰) の処理時間を比較します。
+両方式の出力が一致することも合わせて確認します。
+
+使用例:
+    python benchmark/bench_make_tree.py --nodes 1000 5000 --repeat 3
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from playwright.async_api import async_playwright
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from content_extractor.make_tree import make_tree, CAPTURE_ENGINE_SNAPSHOT, CAPTURE_ENGINE_HANDLE
+
+
+def generate_fixture_page(node_count: int, fan_out: int = 4) -> str:
+    """
+    指定された要素数を持つ入れ子構造のHTMLを生成します。
+    各要素にはテキスト・クラス・リンクを含め、実際のニュース一覧ページに近い構造にします。
+    """
+    parts = ["<html><head><title>fixture</title></head><body>"]
+    emitted = 0
+    open_tags = []
+
+    def emit_leaf(i: int) -> str:
+        return (f'<div class="item item-{i % 7}"><a href="/article/{i}">Article {i}</a>'
+                f'<span class="meta">posted #{i}</span></div>')
+
+    while emitted < node_count:
+        depth = len(open_tags)
+        if depth < 6 and emitted % (fan_out + 1) == 0:
+            tag = "section" if depth % 2 == 0 else "div"
+            parts.append(f'<{tag} class="level-{depth}" id="block-{emitted}">')
+            open_tags.append(tag)
+            emitted += 1
+        else:
+            parts.append(emit_leaf(emitted))
+            emitted += 3
+            if depth and emitted % (fan_out * 5) == 0:
+                parts.append(f"</{open_tags.pop()}>")
+
+    while open_tags:
+        parts.append(f"</{open_tags.pop()}>")
+    parts.append('<div style="display:none"><a href="/hidden">hidden</a></div>')
+    parts.append("</body></html>")
+    return "".join(parts)
+
+
+async def time_engine(page, engine: str, repeat: int):
+    timings = []
+    tree = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        tree = await make_tree(page, selector="body", wait_for_load=False, engine=engine)
+        timings.append(time.perf_counter() - start)
+    return min(timings), tree
+
+
+async def run_benchmark(node_counts: list, repeat: int) -> None:
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        page = await browser.new_page(viewport={'width': 1920, 'height': 1080})
+        await page.goto("about:blank")
+        try:
+            print(f"{'nodes':>8} {'snapshot[s]':>12} {'handle[s]':>12} {'speedup':>8} {'match':>6}")
+            for count in node_counts:
+                await page.set_content(generate_fixture_page(count), wait_until="load")
+                element_count = await page.evaluate("document.body.getElementsByTagName('*').length")
+
+                snapshot_time, snapshot_tree = await time_engine(page, CAPTURE_ENGINE_SNAPSHOT, repeat)
+                handle_time, handle_tree = await time_engine(page, CAPTURE_ENGINE_HANDLE, repeat)
+
+                match = (snapshot_tree is not None and handle_tree is not None
+                         and snapshot_tree.to_dict() == handle_tree.to_dict())
+                speedup = handle_time / snapshot_time if snapshot_time else float("inf")
+                print(f"{element_count:>8} {snapshot_time:>12.3f} {handle_time:>12.3f} {speedup:>7.1f}x {str(match):>6}")
+        finally:
+            await browser.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare make_tree capture engines on large fixture pages.")
+    parser.add_argument("--nodes", type=int, nargs="+", default=[500, 2000, 5000],
+                        help="Approximate element counts of the generated fixture pages.")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Number of runs per engine; the fastest run is reported.")
+    args = parser.parse_args()
+
+    if sys.platform == 'win32':
+        asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+
+    asyncio.run(run_benchmark(args.nodes, args.repeat))
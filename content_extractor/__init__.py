@@ -3,9 +3,15 @@ from .core import (
     quick_extract_content,
     run_full_scan_standalone,
     run_quick_scan_standalone,
+    run_full_scan,
+    run_quick_scan,
     evaluate_search_quality,
     run_search_quality_evaluation_standalone,
 )
-from .playwright_helpers import save_screenshot
+from .browser_pool import BrowserPool
+from .resource_filter import ResourceAllowlist
+from .page_settle import PageSettler
+from .robots_cache import RobotsCache, create_http_session
+from .playwright_helpers import save_screenshot, capture_screenshots, capture_main_content, ScreenshotOutput
 from .dom_treeSt import DOMTreeSt, BoundingBox
 from .web_type_chk import WebType
\ No newline at end of file
@@ -0,0 +1,135 @@
+import asyncio
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, List, Optional
+
+from playwright.async_api import async_playwright, Browser, Playwright
+
+from setup_logger import setup_logger
+logger = setup_logger("browser_pool")
+
+
+@dataclass
+class _BrowserSlot:
+    """プール内の1ブラウザ分の状態"""
+    slot_id: int
+    browser: Optional[Browser] = None
+    pages_served: int = 0
+
+
+class BrowserPool:
+    """
+    全スキャンワーカーで共有する長寿命のChromiumブラウザプール。
+
+    URLごとにChromiumを起動・終了する代わりに、起動済みのブラウザを貸し出します。
+    1つのブラウザは同時に1ワーカーにのみ貸し出され、`max_pages_per_browser` 回
+    利用されると次回の貸し出し時に再起動（リサイクル）されます。
+
+    使用例:
+        async with BrowserPool(size=2) as pool:
+            async with pool.acquire() as browser:
+                ...
+    """
+
+    def __init__(self,
+                 size: int = 2,
+                 max_pages_per_browser: int = 50,
+                 headless: bool = True
+                 ):
+        if size < 1:
+            raise ValueError("size must be at least 1")
+        if max_pages_per_browser < 1:
+            raise ValueError("max_pages_per_browser must be at least 1")
+
+        self.size = size
+        self.max_pages_per_browser = max_pages_per_browser
+        self.headless = headless
+
+        self._playwright_cm = None
+        self._playwright: Optional[Playwright] = None
+        self._slots: List[_BrowserSlot] = []
+        self._idle: Optional[asyncio.Queue] = None
+        self.launch_count = 0
+
+    async def __aenter__(self) -> "BrowserPool":
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    @property
+    def started(self) -> bool:
+        return self._playwright is not None
+
+    async def start(self) -> None:
+        """Playwrightを起動し、空のスロットを用意します。ブラウザは初回貸し出し時に起動されます。"""
+        if self.started:
+            return
+        self._playwright_cm = async_playwright()
+        self._playwright = await self._playwright_cm.start()
+        self._slots = [_BrowserSlot(slot_id=i) for i in range(self.size)]
+        self._idle = asyncio.Queue()
+        for slot in self._slots:
+            self._idle.put_nowait(slot)
+        logger.info(f"Browser pool started (size={self.size}, max_pages_per_browser={self.max_pages_per_browser})")
+
+    async def close(self) -> None:
+        """起動中の全ブラウザとPlaywrightを終了します。"""
+        if not self.started:
+            return
+        for slot in self._slots:
+            await self._close_browser(slot)
+        try:
+            await self._playwright_cm.__aexit__(None, None, None)
+        finally:
+            self._playwright_cm = None
+            self._playwright = None
+            self._slots = []
+            self._idle = None
+        logger.info(f"Browser pool closed (browser launches: {self.launch_count})")
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[Browser]:
+        """
+        プールからブラウザを1つ借り受けます。
+        空きがない場合は他のワーカーが返却するまで待機します。
+        """
+        if not self.started:
+            raise RuntimeError("BrowserPool is not started")
+
+        slot = await self._idle.get()
+        try:
+            browser = await self._ensure_browser(slot)
+            slot.pages_served += 1
+            yield browser
+        finally:
+            self._idle.put_nowait(slot)
+
+    async def _ensure_browser(self, slot: _BrowserSlot) -> Browser:
+        """スロットのブラウザが利用可能か確認し、必要であれば(再)起動します。"""
+        if slot.browser is not None:
+            if not slot.browser.is_connected():
+                logger.warning(f"Browser in slot {slot.slot_id} was disconnected. Relaunching.")
+                await self._close_browser(slot)
+            elif slot.pages_served >= self.max_pages_per_browser:
+                logger.info(f"Recycling browser in slot {slot.slot_id} after {slot.pages_served} pages.")
+                await self._close_browser(slot)
+
+        if slot.browser is None:
+            slot.browser = await self._playwright.chromium.launch(headless=self.headless)
+            slot.pages_served = 0
+            self.launch_count += 1
+            logger.debug(f"Launched browser in slot {slot.slot_id}")
+        return slot.browser
+
+    async def _close_browser(self, slot: _BrowserSlot) -> None:
+        if slot.browser is None:
+            return
+        try:
+            await slot.browser.close()
+        except Exception as e:
+            logger.warning(f"Failed to close browser in slot {slot.slot_id}: {e}")
+        finally:
+            slot.browser = None
+            slot.pages_served = 0
@@ -1,36 +1,81 @@
-from typing import Dict, List, Any, Union , Optional
+from typing import Dict, List, Any, Union , Optional, Callable, Awaitable
 
+import logging
 import os
+from urllib.parse import urlparse
 from collections import Counter
 import asyncio
 from playwright.async_api import async_playwright, Page, Browser, TimeoutError as PlaywrightTimeoutError
+import aiohttp
 from aiohttp import ClientError
 
 import traceback
 import sys
 import hashlib
-from datetime import datetime
 import numpy as np
 
 # my module 
-from .scorer import MainContentScorer
+from .scorer import MainContentScorer, SCORING_BACKEND_NUMPY
 from .make_tree import make_tree
 from .web_type_chk import WebTypeCHK, WebType
-from .dom_treeSt import DOMTreeSt, BoundingBox
+from .dom_treeSt import DOMTreeSt, BoundingBox, SCAN_MODE_QUICK, SCAN_MODE_FULL
 from .dom_utils import rescore_main_content_with_children
-from .playwright_helpers import setup_page, adjust_page_view, fetch_robots_txt, is_scraping_allowed
+from .tree_index import TreeIndex
+from .browser_pool import BrowserPool
+from .static_scan import (
+    static_quick_extract,
+    QuickEngineSelector,
+    QUICK_ENGINE_AUTO,
+    QUICK_ENGINE_STATIC,
+    QUICK_ENGINE_BROWSER,
+    QUICK_ENGINE_VERIFY,
+)
+from .playwright_helpers import setup_page, adjust_page_view, fetch_robots_txt, is_scraping_allowed, probe_selectors
+from .resource_filter import ResourceAllowlist, RequestFilter, learn_main_content_resources, start_resource_recording
+from .page_settle import PageSettler, settle_page
+from .robots_cache import RobotsCache
 from .quality_evaluator import is_no_results_page, quantify_search_results
-from setup_logger import setup_logger
+from setup_logger import DEFAULT_LOG_FILE, setup_logger
 from utils.file_handler import save_json
+from utils.scan_metrics import span
 
 if sys.platform == 'win32':
     asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
 
 # logger setting 
-LOGGER_DATEFORMAT = "%Y%m%d_%H%M%S"
-nowtime = datetime.now()
-formatted_now = nowtime.strftime(LOGGER_DATEFORMAT)
-logger = setup_logger("web-cheacker",log_file=f"./log/web-chk_{formatted_now}.log")
+logger = setup_logger("web-cheacker", log_file=DEFAULT_LOG_FILE)
+
+# 初回スコアリングで保持するメインコンテンツ候補の上限数
+CANDIDATE_TOP_K = 10
+
+# スキャン結果が確定した時点で、ページを閉じる前に呼び出すフック (スキャン時のスクリーンショット撮影など)
+ResultHook = Callable[[Page, DOMTreeSt], Awaitable[None]]
+
+
+async def _run_result_hook(on_result: Optional[ResultHook], page: Page, node: DOMTreeSt) -> None:
+    """on_result を呼び出す。フックの失敗はスキャン結果に影響させない"""
+    if on_result is None:
+        return
+    try:
+        with span("result_hook"):
+            await on_result(page, node)
+    except Exception as e:
+        logger.warning(f"Result hook failed for {node.url}: {e}")
+
+
+async def _robots_allowed(url: str, robots_cache: Optional[RobotsCache]) -> bool:
+    """robots.txt でURLの取得が許可されているかを確認する (robots_cache がない場合は取得して確認する)"""
+    with span("robots"):
+        if robots_cache is not None:
+            # ホストごとに取得・解析済みのrobots.txtを使う
+            allowed = await robots_cache.can_fetch(url)
+        else:
+            # robots.txtを取得し、スクレイピングが許可されているか確認
+            robots_txt = await fetch_robots_txt(url)
+            allowed = not robots_txt or is_scraping_allowed(robots_txt, urlparse(url).path or "/")
+    if not allowed:
+        logger.info(f"robots.txtにより、このURLのスクレイピングは許可されていません: {url}")
+    return allowed
 
 
 # ----------------------------------------------------------------
@@ -48,7 +93,12 @@ def print_error_details(e : Exception) -> None :
 async def extract_main_content(url: str,
                     browser: Browser,
                     count : int = 0,
-                    arg_webtype : Any = None
+                    arg_webtype : Any = None,
+                    resource_allowlist : Optional[ResourceAllowlist] = None,
+                    page_settler : Optional[PageSettler] = None,
+                    page : Optional[Page] = None,
+                    on_result : Optional[ResultHook] = None,
+                    robots_cache : Optional[RobotsCache] = None
                     ) -> DOMTreeSt | None:       
     """
     URLからメインコンテンツを抽出し、DOMTreeStオブジェクトとして返します。(Fullスキャン)
@@ -59,33 +109,38 @@ async def extract_main_content(url: str,
         browser (Browser): 使用するPlaywrightのBrowserインスタンス。
         count (int, optional): ページ遷移の再帰呼び出し回数カウンタ。デフォルトは 0。
         arg_webtype (Any, optional): 前の処理から引き継がれたWebページタイプ。デフォルトは None。
+        resource_allowlist (ResourceAllowlist, optional): 指定した場合、メインコンテンツに影響した
+            スクリプト・通信を学習し、Quickスキャン用の許可リストとして記録します。
+        page_settler (PageSettler, optional): DOMの静止待機の設定。指定した場合は静止時間も記録します。
+        page (Page, optional): Quickスキャンで読み込み済みのページ。指定した場合はページを読み込み直さずに解析します。
+            (ページとコンテキストは呼び出し側が閉じます)
+        on_result (ResultHook, optional): メインコンテンツが確定した時点で、ページを閉じる前に
+            (ページ, 結果) を渡して呼び出すフック。
+        robots_cache (RobotsCache, optional): 指定した場合、robots.txtを取得し直さずにホストごとのキャッシュで確認します。
 
     Returns:
         DOMTreeSt | None: 抽出されたメインコンテンツのDOMTreeStオブジェクト。失敗した場合はNone。
     """
-    page = None
+    owns_page = page is None
     try:
-        # robots.txtを取得
-        robots_txt = await fetch_robots_txt(url)
-        
-        if robots_txt:
-            # スクレイピングが許可されているか確認
-            from urllib.parse import urlparse
-            parsed_url = urlparse(url)
-            target_path = parsed_url.path or "/"
-            
-            if not is_scraping_allowed(robots_txt, target_path):
-                logger.info(f"robots.txtにより、このURLのスクレイピングは許可されていません: {url}")
-                return None
-
-        page = await setup_page(url, browser)
-        if not page:
+        if not await _robots_allowed(url, robots_cache):
             return None
 
+        if owns_page:
+            page = await setup_page(url, browser, record_resources=resource_allowlist is not None, settler=page_settler)
+            if not page:
+                return None
+        else:
+            # Quickスキャン・ページ遷移の追跡では domcontentloaded までしか待っていないため、DOMの静止を待ってから解析する
+            await settle_page(page, url, page_settler, stage="load")
+
         max_loop_count = 5
-        dimensions = await adjust_page_view(page)
+        with span("adjust_page_view"):
+            dimensions = await adjust_page_view(page, settler=page_settler, url=url)
 
-        tree = await make_tree(page)
+        # DOMの静止は settle_page で待機済みのため、networkidle は待たない
+        with span("make_tree"):
+            tree = await make_tree(page, wait_for_load=False)
         if not tree:
             logger.info("Error: Empty tree structure returned")
             return None
@@ -99,16 +154,27 @@ async def extract_main_content(url: str,
 
         if watch_url and count < 3 :
             logger.info(f"URL updated: {url} -> {watch_url}. Restarting process...")
+            if not await _robots_allowed(watch_url, robots_cache):
+                return None
+            # 新しいコンテキストを作らず、読み込み済みのページで遷移先を開く (ページはこの呼び出しが閉じる)
+            # adjust_page_view で拡大したビューポートは新しいコンテキストと同じ大きさに戻してから開く
+            await page.set_viewport_size({'width': 1920, 'height': 1080})
+            with span("goto"):
+                await page.goto(watch_url, wait_until='domcontentloaded', timeout=10000)
             # 前回時点のwebtypeが存在する場合はそちらを採用する
-            if arg_webtype:
-                return await extract_main_content(watch_url, browser, count + 1, arg_webtype=arg_webtype)  # 再帰的に処理を実行
-            else:
-                return await extract_main_content(watch_url, browser, count + 1, arg_webtype=chktype)  # 再帰的に処理を実行
+            return await extract_main_content(watch_url, browser, count + 1, arg_webtype=arg_webtype or chktype,
+                                              resource_allowlist=resource_allowlist,
+                                              page_settler=page_settler, page=page, on_result=on_result,
+                                              robots_cache=robots_cache)  # 再帰的に処理を実行
+
 
+        # 再評価ループで部分木をスライスとして取り出せるよう、先行順インデックスを1度だけ構築する
+        tree_index = TreeIndex(tree)
 
         tree = [tree]  # Convert tree to list[Dict]
-        scorer = MainContentScorer(tree, dimensions['width'], dimensions['height'])
-        main_contents = scorer.find_candidates()
+        with span("find_candidates"):
+            scorer = MainContentScorer(tree, dimensions['width'], dimensions['height'], backend=SCORING_BACKEND_NUMPY)
+            main_contents = scorer.find_candidates(top_k=CANDIDATE_TOP_K)
 
         if not main_contents:
             logger.info("メインコンテンツ候補が見つかりませんでした。")
@@ -140,7 +206,8 @@ async def extract_main_content(url: str,
                 prev_best = current_best
                 
                 # 最有力候補の子要素を再スコアリングし、新たな候補リストとする
-                rescored_children_of_prev_best = rescore_main_content_with_children(prev_best)
+                with span("rescore"):
+                    rescored_children_of_prev_best = rescore_main_content_with_children(prev_best, tree_index)
 
                 logger.debug(f" Parent selector : {prev_best.css_selector} / Score: {prev_best.score}")
                 if rescored_children_of_prev_best:
@@ -162,13 +229,16 @@ async def extract_main_content(url: str,
 
             final_content = current_best
 
-            logger.info("最終的に選択されたメインコンテンツ:")
-            logger.info(final_content)
+            # ノードの全情報 (リンク一覧を含む) はDEBUGが有効な場合だけ組み立てる
+            logger.info("最終的に選択されたメインコンテンツ: <%s> %s (score=%s, links=%d)",
+                        final_content.tag, final_content.css_selector, final_content.score, len(final_content.links))
+            logger.debug("%r", final_content)
 
             # 最終的に選択されたコンテンツの子ノードをログ出力
-            logger.info("Rescored child nodes of final content:")
-            for child in current_best_children[:5]: # Display up to 5 children
-                logger.debug(child)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Rescored child nodes of final content:")
+                for child in current_best_children[:5]: # Display up to 5 children
+                    logger.debug("%r", child)
 
             # css_selector_list setting
             # 堅牢なセレクタ候補を上位3つまで取得（空のセレクタは除外）
@@ -199,12 +269,21 @@ async def extract_main_content(url: str,
             else:
                 final_content.web_type = current_type.name
             final_content.is_empty_result = False # 明示的にFalseを設定
+            final_content.scan_mode = SCAN_MODE_FULL
 
-            json_data = final_content.to_dict()
+            # Quickスキャンで読み込むリクエストを学習する
+            if resource_allowlist is not None:
+                with span("learn_resources"):
+                    learned = await learn_main_content_resources(page, final_content.css_selector)
+                if learned is not None:
+                    resource_allowlist.learn(url, learned)
 
             # JSONを保存
-            save_json(json_data,url)
+            with span("save_json"):
+                json_data = final_content.to_dict()
+                save_json(json_data,url)
 
+            await _run_result_hook(on_result, page, final_content)
             return final_content
         else:
             logger.warning("最初の探索でメインコンテンツが見つかりませんでした。")
@@ -225,8 +304,9 @@ async def extract_main_content(url: str,
         return None
 
     finally:
-        if page:
-            await page.close()
+        if page and owns_page:
+            # setup_page が作成したコンテキストごと閉じる (制限時間で中断された場合も含む)
+            await page.context.close()
 
 
 async def evaluate_search_quality(url: str,
@@ -303,6 +383,11 @@ async def quick_extract_content(url: str,
                                 browser: Browser,
                                 css_selector_list: list[str],
                                 webtype_str: str,
+                                resource_allowlist: Optional[ResourceAllowlist] = None,
+                                page_settler: Optional[PageSettler] = None,
+                                full_scan_fallback: bool = False,
+                                on_result: Optional[ResultHook] = None,
+                                robots_cache: Optional[RobotsCache] = None
                                 ):
     """
     CSSセレクタリストを使用して、ページから迅速にメインコンテンツを抽出します。(Quickスキャン)
@@ -313,6 +398,15 @@ async def quick_extract_content(url: str,
         browser (Browser): 使用するPlaywrightのBrowserインスタンス。
         css_selector_list (list[str]): 試行するCSSセレクタのリスト。
         webtype_str (str): Webページのタイプを示す文字列。
+        resource_allowlist (ResourceAllowlist, optional): 指定した場合、画像・メディア・フォントと
+            学習済みの許可リストにないリクエストを遮断して読み込みます。
+            セレクタが見つからなかった場合は遮断せずに読み込み直します。
+        page_settler (PageSettler, optional): セレクタの要素のDOMが静止するまで待つ設定と静止時間の記録先。
+        full_scan_fallback (bool, optional): True の場合、セレクタが見つからなければ読み込み済みのページを
+            そのまま使ってFullスキャンを行います (結果の scan_mode は "full")。
+        on_result (ResultHook, optional): 結果が確定した時点で、ページを閉じる前に呼び出すフック。
+            リクエストを遮断して読み込んだページ (画像が表示されない) では呼び出しません。
+        robots_cache (RobotsCache, optional): Fullスキャンに移行した場合に使うrobots.txtのキャッシュ。
 
     Returns:
         DOMTreeSt | None: 抽出されたメインコンテンツのDOMTreeStオブジェクト。失敗した場合はNone。
@@ -322,50 +416,122 @@ async def quick_extract_content(url: str,
     # logger.info(f"chk webtype : {webtype}({type(webtype)}) -- {WebType.page_changer} ({type(WebType.page_changer)})")
     if webtype == WebType.page_changer or webtype == WebType.not_quickscan :
         logger.warning(f"webtype is pagechange full scan process start :{webtype}")
-        return await extract_main_content(url, browser, arg_webtype=webtype)
+        return await extract_main_content(url, browser, arg_webtype=webtype_str, resource_allowlist=resource_allowlist,
+                                          page_settler=page_settler, on_result=on_result, robots_cache=robots_cache)
 
     if webtype in [WebType.page_changer, WebType.not_quickscan]:
         logger.warning(f"webtype is pagechange, starting full scan process: {webtype}")
-        return await extract_main_content(url, browser, arg_webtype=webtype)
+        return await extract_main_content(url, browser, arg_webtype=webtype_str, resource_allowlist=resource_allowlist,
+                                          page_settler=page_settler, on_result=on_result, robots_cache=robots_cache)
 
     # セレクタリストが空の場合はFullスキャンに移行
     if not css_selector_list:
         logger.warning("No selectors provided for quick scan, starting full scan.")
-        return await extract_main_content(url, browser, arg_webtype=webtype)
-
+        return await extract_main_content(url, browser, arg_webtype=webtype_str, resource_allowlist=resource_allowlist,
+                                          page_settler=page_settler, on_result=on_result, robots_cache=robots_cache)
+
+    full_scan_ran = False
+
+    async def full_scan_on_page(page: Page) -> DOMTreeSt | None:
+        nonlocal full_scan_ran
+        full_scan_ran = True
+        logger.info(f"Quick scan failed, running full scan on the already loaded page: {url}")
+        return await extract_main_content(url, browser, arg_webtype=webtype_str, resource_allowlist=resource_allowlist,
+                                          page_settler=page_settler, page=page, on_result=on_result,
+                                          robots_cache=robots_cache)
+
+    on_failure = full_scan_on_page if full_scan_fallback else None
+    if resource_allowlist is None:
+        found_tree = await _quick_extract_attempt(url, browser, css_selector_list, webtype_str,
+                                                  page_settler=page_settler, on_failure=on_failure,
+                                                  on_result=on_result)
+    else:
+        request_filter = resource_allowlist.filter_for(url)
+        # 遮断した状態のページはFullスキャンに使わない (結果が通常の読み込みと異なる可能性がある)
+        found_tree = await _quick_extract_attempt(url, browser, css_selector_list, webtype_str,
+                                                  request_filter=request_filter, page_settler=page_settler)
+        if not found_tree:
+            # 遮断したリクエストがメインコンテンツの描画に必要だった可能性があるため、遮断せずに読み込み直す
+            logger.info(f"Quick scan with blocked resources failed, retrying without blocking: {url}")
+            found_tree = await _quick_extract_attempt(url, browser, css_selector_list, webtype_str,
+                                                      page_settler=page_settler, on_failure=on_failure,
+                                                      record_resources=full_scan_fallback, on_result=on_result)
+            if found_tree and found_tree.scan_mode == SCAN_MODE_QUICK and request_filter.allowed is not None:
+                resource_allowlist.record_fallback(url)
+
+    if not found_tree and full_scan_fallback and not full_scan_ran:
+        # ページの読み込み自体に失敗した場合は、新しいページでFullスキャンする
+        logger.info(f"Quick scan could not load the page, running a fresh full scan: {url}")
+        found_tree = await extract_main_content(url, browser, arg_webtype=webtype_str, resource_allowlist=resource_allowlist,
+                                                page_settler=page_settler, on_result=on_result, robots_cache=robots_cache)
+    return found_tree
+
+
+async def _quick_extract_attempt(url: str,
+                                 browser: Browser,
+                                 css_selector_list: list[str],
+                                 webtype_str: str,
+                                 request_filter: Optional[RequestFilter] = None,
+                                 page_settler: Optional[PageSettler] = None,
+                                 on_failure: Optional[Callable[[Page], Awaitable[DOMTreeSt | None]]] = None,
+                                 record_resources: bool = False,
+                                 on_result: Optional[ResultHook] = None
+                                 ) -> DOMTreeSt | None:
+    """
+    新しいコンテキストでページを1回読み込み、保存済みのセレクタでメインコンテンツを抽出します。
+    セレクタが見つからず on_failure が指定されている場合は、コンテキストを閉じる前に読み込み済みのページで呼び出します。
+    on_result は、リクエストを遮断していない場合に限り、抽出に成功した時点でコンテキストを閉じる前に呼び出します。
+    """
     context = await browser.new_context(viewport={'width': 1920, 'height': 1080})
-    page = await context.new_page()
     
     try:
+        if request_filter is not None:
+            await request_filter.install(context)
+        if record_resources:
+            # Fullスキャンに引き継いだ場合に許可リストを学習できるよう、読み込み前から記録する
+            await start_resource_recording(context)
+        page = await context.new_page()
         found_tree = None
+        found_selector = None
         # ページ移動と初期待機を簡略化
-        await page.goto(url, wait_until='domcontentloaded', timeout=10000)
-
-        # セレクタをループで試す
-        for selector in css_selector_list:
-            try:
-                # 短いタイムアウトでセレクタの存在を確認
-                await page.wait_for_selector(selector, state='attached', timeout=5000)
-                logger.info(f"Selector found, extracting content with: {selector}")
-                tree = await make_tree(page, selector=selector)
-                if tree:
-                    found_tree = tree
-                    # Quickスキャン成功時は、成功したセレクタをプライマリとし、リストの先頭に持ってくる
-                    css_selector_list.remove(selector)
-                    css_selector_list.insert(0, selector)
-                    found_tree.css_selector_list = css_selector_list
-                    found_tree.css_selector = selector
-                    break # 見つかったらループを抜ける
-            except PlaywrightTimeoutError:
-                logger.debug(f"Selector failed, trying next: {selector}")
-                continue # 次のセレクタへ
-        
+        with span("goto"):
+            await page.goto(url, wait_until='domcontentloaded', timeout=10000)
+
+        # 全セレクタを一括でプローブし、マッチしたものだけを順に試す
+        with span("probe_selectors"):
+            probe = await probe_selectors(page, css_selector_list)
+        logger.debug(f"Selector probe result: {probe.counts}")
+        for selector in probe.live_selectors:
+            logger.info(f"Selector found, extracting content with: {selector}")
+            # 要素が描画途中のまま取得しないよう、そのサブツリーの変更が止まるまで待つ
+            await settle_page(page, url, page_settler, selector=selector, stage="quick")
+            with span("make_tree"):
+                tree = await make_tree(page, selector=selector, wait_for_load=False)
+            if tree:
+                found_tree = tree
+                found_selector = selector
+                break # 見つかったらループを抜ける
+            logger.debug(f"Selector matched but produced no tree, trying next: {selector}")
+
+        # プローブ結果に基づいてセレクタリストを並べ替える
+        # (成功したセレクタを先頭に、マッチしなかったセレクタを末尾へ)
+        css_selector_list[:] = probe.reorder(css_selector_list, preferred=found_selector)
+
         if not found_tree:
             logger.warning(f"All selectors failed for URL: {url}. Quick scan failed.")
+            if on_failure is not None:
+                return await on_failure(page)
             return None # 全て失敗したらNoneを返す
 
+        # Quickスキャン成功時は、成功したセレクタをプライマリとする
+        found_tree.css_selector_list = css_selector_list
+        found_tree.css_selector = found_selector
+
         found_tree.url = url
         found_tree.web_type = webtype_str
+        found_tree.scan_mode = SCAN_MODE_QUICK
+        if request_filter is None:
+            await _run_result_hook(on_result, page, found_tree)
         return found_tree
 
     except PlaywrightTimeoutError as e:
@@ -379,32 +545,124 @@ async def quick_extract_content(url: str,
         await context.close()
 
 
+async def run_full_scan(url: str,
+                        pool: BrowserPool,
+                        arg_webtype: Any = None,
+                        resource_allowlist: Optional[ResourceAllowlist] = None,
+                        page_settler: Optional[PageSettler] = None,
+                        on_result: Optional[ResultHook] = None,
+                        robots_cache: Optional[RobotsCache] = None
+                        ) -> DOMTreeSt | None:
+    """
+    ブラウザプールからブラウザを借り受け、単一URLのフルスキャンを実行します。
+    """
+    async with pool.acquire() as browser:
+        return await extract_main_content(url, browser, arg_webtype=arg_webtype, resource_allowlist=resource_allowlist,
+                                          page_settler=page_settler, on_result=on_result, robots_cache=robots_cache)
+
+
+async def run_quick_scan(url: str,
+                         pool: BrowserPool,
+                         css_selector_list: list[str],
+                         webtype_str: str,
+                         resource_allowlist: Optional[ResourceAllowlist] = None,
+                         page_settler: Optional[PageSettler] = None,
+                         full_scan_fallback: bool = False,
+                         on_result: Optional[ResultHook] = None,
+                         robots_cache: Optional[RobotsCache] = None
+                         ) -> DOMTreeSt | None:
+    """
+    ブラウザプールからブラウザを借り受け、単一URLのクイックスキャンを実行します。
+    full_scan_fallback が True の場合、失敗時は同じページ (同じブラウザ) でFullスキャンまで行います。
+    """
+    async with pool.acquire() as browser:
+        return await quick_extract_content(url, browser, css_selector_list, webtype_str, resource_allowlist,
+                                           page_settler, full_scan_fallback, on_result, robots_cache)
+
+
+async def run_quick_scan_with_engine(url: str,
+                                     pool: BrowserPool,
+                                     session: aiohttp.ClientSession,
+                                     css_selector_list: list[str],
+                                     webtype_str: str,
+                                     engine: str = QUICK_ENGINE_AUTO,
+                                     engine_selector: Optional[QuickEngineSelector] = None,
+                                     resource_allowlist: Optional[ResourceAllowlist] = None,
+                                     page_settler: Optional[PageSettler] = None,
+                                     full_scan_fallback: bool = False,
+                                     on_result: Optional[ResultHook] = None,
+                                     robots_cache: Optional[RobotsCache] = None
+                                     ) -> DOMTreeSt | None:
+    """
+    静的HTMLエンジンとブラウザのどちらでQuickスキャンを行うかを選択して実行します。
+
+    engine が "auto" の場合は engine_selector の記録に従い、未検証のURLでは両方で取得して
+    リンク一覧 (= result_vl のハッシュ元) が一致するかを記録します。
+    静的エンジンで取得できなかった場合は必ずブラウザにフォールバックします。
+    on_result はブラウザで取得した場合のみ呼び出します (静的エンジンの結果には描画済みのページがないため)。
+    """
+    webtype = WebType.from_string(webtype_str)
+    if webtype in [WebType.page_changer, WebType.not_quickscan] or not css_selector_list:
+        # Fullスキャンに移行するページは常にブラウザで処理する
+        mode = QUICK_ENGINE_BROWSER
+    elif engine == QUICK_ENGINE_AUTO:
+        mode = engine_selector.choose(url) if engine_selector else QUICK_ENGINE_BROWSER
+    else:
+        mode = engine
+
+    if mode == QUICK_ENGINE_STATIC:
+        with span("static_extract"):
+            result = await static_quick_extract(url, session, css_selector_list, webtype_str)
+        if result:
+            logger.info(f"Quick scan served by static engine: {url}")
+            return result
+        logger.info(f"Static engine could not extract content, falling back to browser: {url}")
+        if engine_selector:
+            engine_selector.record(url, matched=False)
+        return await run_quick_scan(url, pool, css_selector_list, webtype_str, resource_allowlist, page_settler,
+                                    full_scan_fallback, on_result, robots_cache)
+
+    if mode == QUICK_ENGINE_VERIFY:
+        with span("static_extract"):
+            static_result = await static_quick_extract(url, session, list(css_selector_list), webtype_str)
+        browser_result = await run_quick_scan(url, pool, css_selector_list, webtype_str, resource_allowlist,
+                                              page_settler, full_scan_fallback, on_result, robots_cache)
+        # Fullスキャンにフォールバックした結果は静的エンジンとの照合に使わない
+        if browser_result and browser_result.scan_mode != SCAN_MODE_FULL and engine_selector:
+            matched = static_result is not None and static_result.links == browser_result.links
+            engine_selector.record(url, matched=matched)
+        return browser_result
+
+    return await run_quick_scan(url, pool, css_selector_list, webtype_str, resource_allowlist, page_settler,
+                                full_scan_fallback, on_result, robots_cache)
+
+
 async def run_full_scan_standalone(url: str, arg_webtype: Any = None):
     """
     従来のtest_mainと同様に、単一URLのフルスキャンをスタンドアロンで実行します。
-    ブラウザの起動と終了を内包します。
+    CLI用の薄いラッパーで、1ブラウザのみのプールを起動・終了します。
     """
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        try:
-            return await extract_main_content(url, browser, arg_webtype=arg_webtype)
-        finally:
-            if browser:
-                await browser.close()
+    async with BrowserPool(size=1) as pool:
+        return await run_full_scan(url, pool, arg_webtype=arg_webtype)
 
 
-async def run_quick_scan_standalone(url: str, css_selector_list: list[str], webtype_str: str):
+async def run_quick_scan_standalone(url: str,
+                                    css_selector_list: list[str],
+                                    webtype_str: str,
+                                    engine: str = QUICK_ENGINE_AUTO):
     """
     従来のchoice_contentと同様に、単一URLのクイックスキャンをスタンドアロンで実行します。
-    ブラウザの起動と終了を内包します。
+    CLI用の薄いラッパーで、静的HTMLで取得できるページではブラウザを起動しません。
     """
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        try:
-            return await quick_extract_content(url, browser, css_selector_list, webtype_str)
-        finally:
-            if browser:
-                await browser.close()
+    engine_selector = QuickEngineSelector() if engine == QUICK_ENGINE_AUTO else None
+    async with aiohttp.ClientSession() as session, BrowserPool(size=1) as pool:
+        result = await run_quick_scan_with_engine(
+            url, pool, session, css_selector_list, webtype_str,
+            engine=engine, engine_selector=engine_selector,
+        )
+    if engine_selector:
+        engine_selector.save()
+    return result
 
 
 async def run_search_quality_evaluation_standalone(url: str, search_query: str):
@@ -444,6 +702,12 @@ if __name__ == "__main__":
         nargs='+',
         help="CSS selector(s) to use for 'quick' mode."
     )
+    parser.add_argument(
+        "--engine",
+        choices=[QUICK_ENGINE_AUTO, QUICK_ENGINE_STATIC, QUICK_ENGINE_BROWSER],
+        default=QUICK_ENGINE_AUTO,
+        help="Quick scan engine for 'quick' mode. 'auto' picks static HTML or browser per URL. Default: auto"
+    )
     parser.add_argument(
         "--query", "-q",
         help="Search query to use for 'quality' mode."
@@ -468,7 +732,7 @@ if __name__ == "__main__":
             sys.exit(1)
         
         logger.info(f"Quickスキャンを実行します (セレクタ: {args.selectors})")
-        result_obj = asyncio.run(run_quick_scan_standalone(url=args.url, css_selector_list=args.selectors, webtype_str="plane"))
+        result_obj = asyncio.run(run_quick_scan_standalone(url=args.url, css_selector_list=args.selectors, webtype_str="plane", engine=args.engine))
 
     elif args.mode == 'quality':
         # --- 品質評価スキャン実行 ---
@@ -2,6 +2,11 @@ from dataclasses import dataclass, field
 from typing import Dict, List, Optional
 from enum import Enum
 
+# DOMTreeSt.scan_mode の値
+SCAN_MODE_QUICK = "quick"
+SCAN_MODE_FULL = "full"
+
+
 @dataclass
 class BoundingBox:
     x: float
@@ -47,6 +52,7 @@ class DOMTreeSt:
     sqs_score: float = 0.0
     quality_category: str = ""
     is_empty_result: bool = False # 新しく追加するフィールド
+    scan_mode: str = "" # この結果を得たスキャンの種類 ("quick" / "full")
 
     def add_child(self, child: "DOMTreeSt") -> None:
         """子ノードを追加する"""
@@ -77,6 +83,7 @@ class DOMTreeSt:
             "sqs_score": self.sqs_score,
             "quality_category": self.quality_category,
             "is_empty_result": self.is_empty_result,
+            "scan_mode": self.scan_mode,
         }
     
     def format_children(self) -> str:
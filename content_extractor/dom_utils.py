@@ -1,7 +1,10 @@
-from typing import List
+from typing import List, Optional
+
+import numpy as np
 
 from .dom_treeSt import DOMTreeSt
-from .scorer import MainContentScorer
+from .scorer import MainContentScorer, SCORING_BACKEND_NUMPY, assign_scores, top_indices
+from .tree_index import TreeIndex
 from setup_logger import setup_logger
 
 logger = setup_logger("dom_utils")
@@ -21,18 +24,27 @@ def print_content(content: DOMTreeSt) -> None:
 def flatten_dom_tree(node: DOMTreeSt) -> List[DOMTreeSt]:
     """
     指定されたDOMTreeStノードをルートとして、すべての子孫ノードを含む平坦なリストを返します。
+    深いDOMでも再帰上限に達しないよう、明示的なスタックで先行順に走査します。
     """
-    nodes = [node]
-    for child in node.children:
-        nodes.extend(flatten_dom_tree(child))
+    nodes = []
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        nodes.append(current)
+        stack.extend(reversed(current.children))
     return nodes
 
-def rescore_main_content_with_children(main_content: DOMTreeSt) -> List[DOMTreeSt]:
+def rescore_main_content_with_children(main_content: DOMTreeSt,
+                                       tree_index: Optional[TreeIndex] = None
+                                       ) -> List[DOMTreeSt]:
     """
     メインコンテンツ候補とその子ノードを再評価し、スコアの高い順にソートしたリストを返します。
+    tree_index が与えられた場合、部分木をインデックスのスライスとして取り出し、
+    事前抽出済みの特徴量でベクトル化スコアリングを行います（ツリーの再走査は行いません）。
 
     Args:
         main_content (DOMTreeSt): 評価対象のメインコンテンツ候補ノード。
+        tree_index (TreeIndex, optional): キャプチャ済みツリー全体の先行順インデックス。
 
     Returns:
         List[DOMTreeSt]: 再評価され、スコアでソートされたノードのリスト。
@@ -47,10 +59,18 @@ def rescore_main_content_with_children(main_content: DOMTreeSt) -> List[DOMTreeS
     main_width = main_rect.width
     main_height = main_rect.height
 
+    if tree_index is not None and main_content in tree_index:
+        subtree = tree_index.subtree_slice(main_content)
+        nodes = tree_index.nodes[subtree]
+        scorer = MainContentScorer([main_content], main_width, main_height, backend=SCORING_BACKEND_NUMPY)
+        scores = scorer.refinement_scores(tree_index.features.take(subtree), depth_diff=main_content.depth)
+        assign_scores(nodes, scores)
+        return [nodes[i] for i in top_indices(scores, np.arange(len(nodes)), None)]
+
     # ツリーをフラットなリストに変換
     scorer_list = flatten_dom_tree(main_content)
 
-    scorer = MainContentScorer(scorer_list, main_width, main_height)
+    scorer = MainContentScorer(scorer_list, main_width, main_height, backend=SCORING_BACKEND_NUMPY)
 
     scored_nodes = scorer.score_parent_and_children()
 
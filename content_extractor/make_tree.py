@@ -2,7 +2,7 @@ import logging
 import json
 import asyncio
 import sys
-from typing import Optional, List, Dict
+from typing import Any, Optional, List, Dict
 from playwright.async_api import Page, ElementHandle, async_playwright
 
 from .dom_treeSt import DOMTreeSt, BoundingBox
@@ -10,16 +10,140 @@ from .dom_treeSt import DOMTreeSt, BoundingBox
 # Use standard logging practice; configuration should be at the application entry point.
 logger = logging.getLogger(__name__)
 
+# DOMキャプチャエンジン
+# snapshot: 1回の page.evaluate でサブツリー全体をシリアライズする (デフォルト)
+# handle  : ElementHandle を1要素ずつ辿る従来の方式 (フォールバック)
+CAPTURE_ENGINE_SNAPSHOT = "snapshot"
+CAPTURE_ENGINE_HANDLE = "handle"
+CAPTURE_ENGINES = (CAPTURE_ENGINE_SNAPSHOT, CAPTURE_ENGINE_HANDLE)
+
+# ページ内でサブツリー全体を先行順(pre-order)の平坦な配列にシリアライズするスクリプト。
+# 従来方式と同じく、body に含まれない要素や描画ボックスを持たない要素はサブツリーごと除外する。
+# リンクは重複が多いため hrefs テーブルへのインデックスとして返し、転送量を抑える。
+SNAPSHOT_SCRIPT = """selector => {
+    const root = document.querySelector(selector);
+    if (!root) {
+        return { found: false, nodes: [], hrefs: [] };
+    }
+    const hrefs = [];
+    const hrefIndex = new Map();
+    const intern = href => {
+        let idx = hrefIndex.get(href);
+        if (idx === undefined) {
+            idx = hrefs.length;
+            hrefs.push(href);
+            hrefIndex.set(href, idx);
+        }
+        return idx;
+    };
+    const nodes = [];
+    const body = document.body;
+    const stack = [[root, -1, 1]];
+    while (stack.length) {
+        const [el, parent, depth] = stack.pop();
+        if (!body || !body.contains(el)) continue;
+        if (el.getClientRects().length === 0) continue;
+        const r = el.getBoundingClientRect();
+        const index = nodes.length;
+        nodes.push({
+            parent: parent,
+            depth: depth,
+            tag: el.tagName.toLowerCase(),
+            id: el.id || "",
+            attributes: Object.fromEntries(Array.from(el.attributes).map(attr => [attr.name, attr.value])),
+            rect: [r.x, r.y, r.width, r.height],
+            text: el.innerText || "",
+            links: Array.from(el.getElementsByTagName('a')).map(a => a.href).filter(Boolean).sort().map(intern)
+        });
+        // 先行順を保つため子要素は逆順に積む
+        const children = el.children;
+        for (let i = children.length - 1; i >= 0; i--) {
+            stack.push([children[i], index, depth + 1]);
+        }
+    }
+    return { found: true, nodes: nodes, hrefs: hrefs };
+}"""
+
+
 async def make_tree(
     page: Page,
     selector: str = "body",
     wait_for_load: bool = True,
     timeout: int = 30000,
-    debug: bool = True
+    debug: bool = True,
+    engine: str = CAPTURE_ENGINE_SNAPSHOT
 ) -> Optional[DOMTreeSt]:
     """
     Get DOM tree starting from a specific selector or body.
     Page.goto(url)後に使用
+
+    engine に "snapshot" (デフォルト) を指定すると1回の page.evaluate でツリー全体を取得し、
+    "handle" を指定すると ElementHandle を再帰的に辿る従来方式で取得します。
+    snapshot 方式が失敗した場合は自動的に handle 方式へフォールバックします。
+    """
+    if engine not in CAPTURE_ENGINES:
+        raise ValueError(f"Unknown capture engine: {engine}")
+
+    try:
+        if wait_for_load:
+            try:
+                logger.debug("Waiting for network to be idle...")
+                await page.wait_for_load_state('networkidle', timeout=timeout)
+                logger.info("Network is idle.")
+            except Exception as e:
+                logger.warning(f"Network did not become idle within {timeout}ms: {str(e)}")
+
+        if engine == CAPTURE_ENGINE_SNAPSHOT:
+            try:
+                snapshot = await page.evaluate(SNAPSHOT_SCRIPT, selector)
+            except Exception as e:
+                logger.warning(f"Snapshot capture failed, falling back to handle engine: {str(e)}")
+            else:
+                if not snapshot.get('found'):
+                    logger.error(f"Root element not found with selector: {selector}")
+                    return None
+                return build_tree_from_snapshot(snapshot)
+
+        return await _make_tree_from_handles(page, selector)
+
+    except Exception as e:
+        logger.critical(f"Failed to create DOM tree for selector '{selector}': {str(e)}")
+        return None
+
+
+def build_tree_from_snapshot(snapshot: Dict[str, Any]) -> Optional[DOMTreeSt]:
+    """
+    SNAPSHOT_SCRIPT が返した先行順の平坦なノード配列から DOMTreeSt の階層を再構築します。
+    親ノードは必ず子ノードより前に現れるため、再帰なしの1パスで組み立てられます。
+    """
+    hrefs = snapshot.get('hrefs', [])
+    built: List[DOMTreeSt] = []
+
+    for properties in snapshot.get('nodes', []):
+        x, y, width, height = properties['rect']
+        tree = DOMTreeSt(
+            tag=properties['tag'],
+            id=properties['id'],
+            attributes=properties['attributes'],
+            rect=BoundingBox(x=x, y=y, width=width, height=height),
+            depth=properties['depth'],
+            text=properties['text'].strip(),
+            css_selector=make_css_selector(properties),
+            links=[hrefs[i] for i in properties['links']],
+        )
+        built.append(tree)
+
+        parent = properties['parent']
+        if parent >= 0:
+            built[parent].add_child(tree)
+
+    return built[0] if built else None
+
+
+async def _make_tree_from_handles(page: Page, selector: str) -> Optional[DOMTreeSt]:
+    """
+    ElementHandle を再帰的に辿って DOM ツリーを取得する従来方式。
+    要素ごとに複数回の Playwright 呼び出しが発生するため低速ですが、フォールバックとして残しています。
     """
     async def parse_element(el: ElementHandle, current_depth: int = 1) -> Optional[DOMTreeSt]:
         """
@@ -80,26 +204,13 @@ async def make_tree(
             logger.error(f"Error parsing element: {str(e)}")
             return None
 
-    try:
-        if wait_for_load:
-            try:
-                logger.debug("Waiting for network to be idle...")
-                await page.wait_for_load_state('networkidle', timeout=timeout)
-                logger.info("Network is idle.")
-            except Exception as e:
-                logger.warning(f"Network did not become idle within {timeout}ms: {str(e)}")
-
-        root_element = await page.query_selector(selector)
-        if not root_element:
-            logger.error(f"Root element not found with selector: {selector}")
-            return None
-
-        return await parse_element(root_element)
-
-    except Exception as e:
-        logger.critical(f"Failed to create DOM tree for selector '{selector}': {str(e)}")
+    root_element = await page.query_selector(selector)
+    if not root_element:
+        logger.error(f"Root element not found with selector: {selector}")
         return None
 
+    return await parse_element(root_element)
+
 def make_css_selector(properties: Dict[str, any]) -> str:
     """
     Generates a more stable CSS selector from element properties.
@@ -0,0 +1,189 @@
+import asyncio
+import json
+import os
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from playwright.async_api import Page
+
+from utils.host_scheduler import host_of
+from utils.scan_metrics import span
+from setup_logger import setup_logger
+logger = setup_logger("page_settle")
+
+# DOMがこの時間変化しなければ読み込み完了とみなす (ミリ秒)
+DEFAULT_QUIET_WINDOW_MS = 500
+# 変化が続くページでも、この時間で待機を打ち切る (ミリ秒)
+DEFAULT_MAX_WAIT_MS = 10000
+# page.evaluate 自体が応答しない場合に備えた、ページ内の上限に対する余裕 (秒)
+EVALUATE_GRACE_SECONDS = 5
+
+# 監視対象 (セレクタの要素、なければ document) のDOMが quietMs の間変化しなくなるか、
+# capMs に達するまで待つスクリプト。ネットワークの状態には依存しないため、
+# ロングポーリングや解析用ビーコンが止まらないページでも上限まで待たされない。
+QUIESCENCE_SCRIPT = """({ selector, quietMs, capMs }) => new Promise(resolve => {
+    const start = performance.now();
+    const target = (selector && document.querySelector(selector)) || document;
+    let last = start;
+    let quietTimer = null;
+    const finish = settled => {
+        observer.disconnect();
+        clearTimeout(quietTimer);
+        clearTimeout(capTimer);
+        const now = performance.now();
+        resolve({ settled: settled, settle_ms: last - start, waited_ms: now - start });
+    };
+    const arm = () => {
+        clearTimeout(quietTimer);
+        quietTimer = setTimeout(() => finish(true), quietMs);
+    };
+    const observer = new MutationObserver(() => {
+        last = performance.now();
+        arm();
+    });
+    observer.observe(target, { childList: true, subtree: true, attributes: true, characterData: true });
+    const capTimer = setTimeout(() => finish(false), capMs);
+    arm();
+})"""
+
+
+@dataclass
+class SettleResult:
+    # quiet window の間DOMが変化しなかった場合 True (False は上限で打ち切った、または評価に失敗した)
+    settled: bool
+    # 待機開始から最後のDOM変更までの時間 (ミリ秒)
+    settle_ms: float = 0.0
+    # 実際に待機した時間 (ミリ秒)
+    waited_ms: float = 0.0
+
+
+@dataclass
+class SettleWindow:
+    quiet_window_ms: int = DEFAULT_QUIET_WINDOW_MS
+    max_wait_ms: int = DEFAULT_MAX_WAIT_MS
+
+
+async def wait_for_dom_quiescence(page: Page,
+                                  selector: Optional[str] = None,
+                                  quiet_window_ms: int = DEFAULT_QUIET_WINDOW_MS,
+                                  max_wait_ms: int = DEFAULT_MAX_WAIT_MS
+                                  ) -> SettleResult:
+    """
+    ページ (selector を指定した場合はその要素のサブツリー) のDOMが quiet_window_ms の間
+    変化しなくなるまで待ちます。max_wait_ms に達した場合は打ち切って結果を返します。
+    """
+    args = {"selector": selector or "", "quietMs": quiet_window_ms, "capMs": max(quiet_window_ms, max_wait_ms)}
+    try:
+        result = await asyncio.wait_for(page.evaluate(QUIESCENCE_SCRIPT, args),
+                                        timeout=max_wait_ms / 1000 + EVALUATE_GRACE_SECONDS)
+    except Exception as e:
+        # 待機中のページ遷移でコンテキストが破棄された場合など
+        logger.debug(f"DOM quiescence wait failed: {e}")
+        return SettleResult(settled=False)
+    if not isinstance(result, dict):
+        return SettleResult(settled=False)
+    return SettleResult(
+        settled=bool(result.get("settled")),
+        settle_ms=float(result.get("settle_ms") or 0.0),
+        waited_ms=float(result.get("waited_ms") or 0.0),
+    )
+
+
+async def settle_page(page: Page,
+                      url: str,
+                      settler: Optional["PageSettler"] = None,
+                      selector: Optional[str] = None,
+                      stage: str = "load"
+                      ) -> SettleResult:
+    """settler を指定した場合はその設定で待って静止時間を記録し、省略時は既定値で待ちます。"""
+    with span(f"settle_{stage}"):
+        if settler is not None:
+            return await settler.wait(page, url, selector, stage)
+        return await wait_for_dom_quiescence(page, selector)
+
+
+class PageSettler:
+    """
+    DOMの静止待機の設定と、URLごとに観測した静止時間の記録を保持します。
+
+    quiet window と上限はホストごとに上書きでき (`example.com` の設定はサブドメインにも適用)、
+    記録した静止時間 (段階ごとの直近値・平均・最大・打ち切り回数) をもとにサイトごとに調整できます。
+    """
+
+    def __init__(self,
+                 quiet_window_ms: int = DEFAULT_QUIET_WINDOW_MS,
+                 max_wait_ms: int = DEFAULT_MAX_WAIT_MS,
+                 host_windows: Optional[Dict[str, SettleWindow]] = None,
+                 stats_path: Optional[str] = None):
+        self.default_window = SettleWindow(quiet_window_ms, max_wait_ms)
+        self.host_windows = {host.lower(): window for host, window in (host_windows or {}).items()}
+        self.stats_path = stats_path
+        self.stats: Dict[str, Dict[str, Dict]] = {}
+        if stats_path:
+            self.load()
+
+    @classmethod
+    def from_config(cls, config: Optional[dict], stats_path: Optional[str] = None) -> "PageSettler":
+        """
+        config.yaml の `page_settle` セクションから作成する。
+
+        page_settle:
+          quiet_window_ms: 500
+          max_wait_ms: 10000
+          hosts:
+            example.com: {quiet_window_ms: 1500}
+        """
+        config = config or {}
+        quiet = config.get("quiet_window_ms", DEFAULT_QUIET_WINDOW_MS)
+        cap = config.get("max_wait_ms", DEFAULT_MAX_WAIT_MS)
+        host_windows = {}
+        for host, window in (config.get("hosts") or {}).items():
+            window = window or {}
+            host_windows[host] = SettleWindow(window.get("quiet_window_ms", quiet), window.get("max_wait_ms", cap))
+        return cls(quiet, cap, host_windows, stats_path)
+
+    def window_for(self, url: str) -> SettleWindow:
+        labels = host_of(url).split(".")
+        for i in range(len(labels)):
+            window = self.host_windows.get(".".join(labels[i:]))
+            if window is not None:
+                return window
+        return self.default_window
+
+    async def wait(self, page: Page, url: str, selector: Optional[str] = None, stage: str = "load") -> SettleResult:
+        """URLの設定でDOMの静止を待ち、観測した静止時間を stage ごとに記録する"""
+        window = self.window_for(url)
+        result = await wait_for_dom_quiescence(page, selector, window.quiet_window_ms, window.max_wait_ms)
+        self.record(url, stage, result)
+        return result
+
+    def record(self, url: str, stage: str, result: SettleResult) -> None:
+        entry = self.stats.setdefault(url, {}).setdefault(stage, {"samples": 0, "mean_ms": 0.0, "max_ms": 0.0,
+                                                                  "capped": 0})
+        entry["samples"] += 1
+        entry["last_ms"] = round(result.settle_ms, 1)
+        entry["mean_ms"] = round(entry["mean_ms"] + (result.settle_ms - entry["mean_ms"]) / entry["samples"], 1)
+        entry["max_ms"] = round(max(entry["max_ms"], result.settle_ms), 1)
+        if not result.settled:
+            entry["capped"] += 1
+
+    def load(self) -> None:
+        try:
+            with open(self.stats_path, "r", encoding="utf-8") as f:
+                self.stats = json.load(f)
+        except FileNotFoundError:
+            self.stats = {}
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning(f"Could not load settle time stats '{self.stats_path}': {e}")
+            self.stats = {}
+
+    def save(self) -> None:
+        if not self.stats_path:
+            return
+        directory = os.path.dirname(self.stats_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.stats_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.stats, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.stats_path)
@@ -1,38 +1,77 @@
+import io
 import os
 import hashlib
+from dataclasses import dataclass, field
 from urllib.parse import urlparse, urljoin
-from typing import Optional
+from typing import Dict, List, Optional
 import aiohttp
 from playwright.async_api import async_playwright, Page, Browser, TimeoutError as PlaywrightTimeoutError
 from PIL import Image
 import traceback
 import asyncio # Import asyncio for sleep
+from concurrent.futures import ThreadPoolExecutor
 
+from .browser_pool import BrowserPool
+from .resource_filter import start_resource_recording
+from .page_settle import PageSettler, settle_page
+from .dom_treeSt import BoundingBox
 from setup_logger import setup_logger
+from utils.scan_metrics import span
 logger = setup_logger("playwright_helpers")
 
 # Retry settings
 MAX_RETRIES = 3
 RETRY_DELAY_SECONDS = 2
 
+# 画像の縮小・エンコードを行うワーカースレッド数 (Pillow は処理中にGILを解放するため、イベントループを止めずに並列に処理できる)
+IMAGE_WORKER_COUNT = 2
+_image_executor: Optional[ThreadPoolExecutor] = None
+
+# 出力形式 -> (Pillow の形式名, 拡張子)
+IMAGE_FORMATS = {
+    "png": ("PNG", ".png"),
+    "jpeg": ("JPEG", ".jpg"),
+    "webp": ("WEBP", ".webp"),
+}
+RESAMPLING_FILTERS = {
+    "nearest": Image.Resampling.NEAREST,
+    "box": Image.Resampling.BOX,
+    "bilinear": Image.Resampling.BILINEAR,
+    "hamming": Image.Resampling.HAMMING,
+    "bicubic": Image.Resampling.BICUBIC,
+    "lanczos": Image.Resampling.LANCZOS,
+}
+# 大きく縮小する場合に、まず整数倍の縮小 (高速) を行ってから指定のフィルタで仕上げる (Image.thumbnail と同じ手法)
+THUMBNAIL_REDUCING_GAP = 3.0
+
+# スキャン時の周辺画像 (ビューポート1画面分) の大きさと、メインコンテンツより上に含める余白 (ピクセル)
+CONTEXT_SHOT_WIDTH = 1920
+CONTEXT_SHOT_HEIGHT = 1080
+CONTEXT_SHOT_MARGIN = 200
+
 async def setup_page(url : str,
-                     browser : Browser
+                     browser : Browser,
+                     record_resources : bool = False,
+                     settler : Optional[PageSettler] = None
                      ):
     """
     指定されたURLのページを準備し、Pageオブジェクトを返します。
-    ページの読み込みとネットワークの安定を待ちます。
+    ページの読み込み後、DOMの変化が止まるまで待ちます (settler の設定、省略時は既定値)。
+    record_resources が True の場合、読み込み前からDOM変更の記録を開始します (リソース許可リストの学習用)。
     """
     context = None
     page = None
     try:
         context = await browser.new_context(viewport={'width': 1920, 'height': 1080})
+        if record_resources:
+            await start_resource_recording(context)
         page = await context.new_page()
-        await page.goto(url, wait_until='domcontentloaded', timeout=10000)
-        await page.wait_for_selector('body', state='attached', timeout=10000)
-        try:
-            await page.wait_for_load_state('networkidle', timeout=15000)
-        except PlaywrightTimeoutError:
-            logger.warning("ネットワークが15秒以内にアイドル状態になりませんでした。処理を続行します。")
+        with span("goto"):
+            await page.goto(url, wait_until='domcontentloaded', timeout=10000)
+            await page.wait_for_selector('body', state='attached', timeout=10000)
+        settle = await settle_page(page, url, settler, stage="load")
+        if not settle.settled:
+            logger.warning(f"DOMが{settle.waited_ms:.0f}ms以内に静止しませんでした。処理を続行します。")
         return page
     except PlaywrightTimeoutError as e:
         logger.error(f"ページのセットアップ中にタイムアウトが発生しました: {url} - {e}")
@@ -50,9 +89,17 @@ async def setup_page(url : str,
         elif context:
             await context.close()
         return None
+    except asyncio.CancelledError:
+        # URLごとの制限時間による中断。ページを返せないため、ここでコンテキストごと閉じる
+        if context:
+            await context.close()
+        raise
 
-async def adjust_page_view(page: Page) -> dict:
-    """ページのサイズを調整し、スクロールを実行"""
+async def adjust_page_view(page: Page,
+                           settler: Optional[PageSettler] = None,
+                           url: Optional[str] = None
+                           ) -> dict:
+    """ページのサイズを調整し、スクロールして遅延読み込みされる要素のDOM変更が止まるまで待つ"""
     dimensions = await page.evaluate('''() => {
         return {
             width: Math.max(document.body.scrollWidth, document.body.offsetWidth,
@@ -66,10 +113,86 @@ async def adjust_page_view(page: Page) -> dict:
 
     await page.set_viewport_size({"width": dimensions['width'], "height": dimensions['height']})
     await page.evaluate('window.scrollTo(0, document.body.scrollHeight)')
-    await page.wait_for_timeout(2000)
+    await settle_page(page, url or page.url, settler, stage="scroll")
 
     return dimensions
 
+# 全セレクタのマッチ数を1回のページ内評価で数えるスクリプト。
+# 構文エラーなどで評価できないセレクタは -1 を返す。
+SELECTOR_COUNT_SCRIPT = """selectors => selectors.map(selector => {
+    try {
+        return document.querySelectorAll(selector).length;
+    } catch (e) {
+        return -1;
+    }
+})"""
+
+# 最優先のセレクタがマッチした時点で真になる待機条件。
+# 構文エラーなどで評価できないセレクタは待っても変わらないため、すぐに真を返す。
+PRIMARY_SELECTOR_SETTLED_SCRIPT = """selector => {
+    try {
+        return document.querySelector(selector) !== null;
+    } catch (e) {
+        return true;
+    }
+}"""
+
+
+@dataclass
+class SelectorProbeResult:
+    """probe_selectors の結果"""
+    # 各セレクタのマッチ数 (-1 は無効なセレクタ)
+    counts: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def live_selectors(self) -> List[str]:
+        """1件以上マッチしたセレクタ (元の順序を保持)"""
+        return [selector for selector, count in self.counts.items() if count > 0]
+
+    @property
+    def first_live(self) -> Optional[str]:
+        live = self.live_selectors
+        return live[0] if live else None
+
+    def reorder(self, selectors: List[str], preferred: Optional[str] = None) -> List[str]:
+        """
+        プローブ結果に基づいてセレクタリストを並べ替えます。
+        preferred (実際に抽出に成功したセレクタ) → その他のマッチしたセレクタ → マッチなし → 無効 の順。
+        同じ区分内では元の順序を保ちます。
+        """
+        def rank(selector: str) -> int:
+            if selector == preferred:
+                return 0
+            count = self.counts.get(selector, 0)
+            if count > 0:
+                return 1
+            return 2 if count == 0 else 3
+        return sorted(selectors, key=rank)
+
+
+async def probe_selectors(page: Page,
+                          selectors: List[str],
+                          timeout: int = 5000
+                          ) -> SelectorProbeResult:
+    """
+    保存済みのセレクタ群をページ内で一括判定します。
+    セレクタごとに順番に待機するのではなく、最優先 (先頭) のセレクタがマッチするまで待ち、
+    その後1回の評価で全セレクタのマッチ数を取得します。
+    下位のセレクタが先にマッチしても待機を打ち切らないため、読み込みの遅い先頭のセレクタを
+    マッチなしと誤判定して順位を下げることはありません。
+    """
+    if not selectors:
+        return SelectorProbeResult()
+
+    try:
+        await page.wait_for_function(PRIMARY_SELECTOR_SETTLED_SCRIPT, arg=selectors[0], timeout=timeout)
+    except PlaywrightTimeoutError:
+        logger.debug(f"Primary selector '{selectors[0]}' did not become attached within {timeout}ms.")
+
+    counts = await page.evaluate(SELECTOR_COUNT_SCRIPT, selectors)
+    return SelectorProbeResult(counts=dict(zip(selectors, counts)))
+
+
 async def fetch_robots_txt(url):
     """対象ウェブサイトからrobots.txtの内容を取得します。"""
     parsed_url = urlparse(url)
@@ -101,6 +224,14 @@ def is_scraping_allowed(robots_txt : str,
     return robot_parser.can_fetch("*", target_path)
 
 
+def _resize_in_place(filepath: str, width: int, height: Optional[int]) -> None:
+    with Image.open(filepath) as img:
+        aspect_ratio = img.height / img.width
+        new_height = height if height else int(width * aspect_ratio)
+        resized_img = img.resize((width, new_height))
+        resized_img.save(filepath)
+
+
 async def save_screenshot(browser: Browser,
                           url_list: list,
                           save_dir="temp",
@@ -136,11 +267,7 @@ async def save_screenshot(browser: Browser,
                 await page.goto(url, wait_until='load', timeout=30000)
                 await page.screenshot(path=filepath, full_page=True)
 
-                with Image.open(filepath) as img:
-                    aspect_ratio = img.height / img.width
-                    new_height = height if height else int(width * aspect_ratio)
-                    resized_img = img.resize((width, new_height))
-                    resized_img.save(filepath)
+                await run_image_job(_resize_in_place, filepath, width, height)
 
                 screenshot_paths.append(filepath)
                 logger.info(f"スクリーンショットを保存しました: {filepath}")
@@ -168,6 +295,197 @@ async def save_screenshot(browser: Browser,
 
     return screenshot_paths
 
+@dataclass
+class ScreenshotOutput:
+    """1回の撮影から書き出す画像の保存先・サイズ・形式"""
+    save_dir: str
+    width: int
+    # 省略時は元画像の縦横比を保つ
+    height: Optional[int] = None
+    # "png" / "jpeg" / "webp"
+    format: str = "png"
+    # jpeg / webp の品質 (1-100)
+    quality: int = 85
+    # 縮小に使うフィルタ (RESAMPLING_FILTERS のキー)
+    resample: str = "lanczos"
+
+    @classmethod
+    def from_config(cls, config: Optional[dict], save_dir: str, width: int) -> "ScreenshotOutput":
+        """config.yaml の出力設定 ({format, quality, resample}) から作成する"""
+        config = config or {}
+        return cls(
+            save_dir=save_dir,
+            width=width,
+            format=str(config.get("format", "png")).lower(),
+            quality=int(config.get("quality", 85)),
+            resample=str(config.get("resample", "lanczos")).lower(),
+        )
+
+    def filename_for(self, filename: str) -> str:
+        """出力形式に合わせて拡張子を付け替えたファイル名"""
+        extension = IMAGE_FORMATS.get(self.format, IMAGE_FORMATS["png"])[1]
+        return os.path.splitext(filename)[0] + extension
+
+
+def _get_image_executor() -> ThreadPoolExecutor:
+    global _image_executor
+    if _image_executor is None:
+        _image_executor = ThreadPoolExecutor(max_workers=IMAGE_WORKER_COUNT, thread_name_prefix="image")
+    return _image_executor
+
+
+async def run_image_job(func, *args):
+    """画像の縮小・エンコードなどの重い同期処理をワーカースレッドで実行する"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_image_executor(), func, *args)
+
+
+def _save_resized(img: Image.Image, filepath: str, output: ScreenshotOutput) -> None:
+    # 要素だけを切り出した画像など、元画像より大きくはしない
+    width = min(output.width, img.width)
+    new_height = output.height if output.height else max(1, int(width * img.height / img.width))
+    resample = RESAMPLING_FILTERS.get(output.resample, Image.Resampling.LANCZOS)
+    resized = img.resize((width, new_height), resample, reducing_gap=THUMBNAIL_REDUCING_GAP)
+
+    pil_format = IMAGE_FORMATS.get(output.format, IMAGE_FORMATS["png"])[0]
+    if pil_format == "PNG":
+        resized.save(filepath, format=pil_format, optimize=True)
+        return
+    if pil_format == "JPEG" and resized.mode != "RGB":
+        resized = resized.convert("RGB")
+    resized.save(filepath, format=pil_format, quality=output.quality)
+
+
+def write_screenshot_outputs(image_bytes: bytes,
+                             filename: str,
+                             outputs: Dict[str, ScreenshotOutput]
+                             ) -> Dict[str, str]:
+    """
+    撮影した画像を、出力ごとのサイズ・形式に変換してそれぞれの保存先に書き出し、出力名ごとのパスを返します。
+    同期処理のため、イベントループからは encode_screenshot_outputs() で呼び出します。
+    """
+    paths = {}
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        img.load()
+        for name, output in outputs.items():
+            os.makedirs(output.save_dir, exist_ok=True)
+            filepath = os.path.join(output.save_dir, output.filename_for(filename))
+            _save_resized(img, filepath, output)
+            paths[name] = filepath
+    return paths
+
+
+async def encode_screenshot_outputs(image_bytes: bytes,
+                                    filename: str,
+                                    outputs: Dict[str, ScreenshotOutput]
+                                    ) -> Dict[str, str]:
+    """write_screenshot_outputs をワーカースレッドで実行する (イベントループを止めない)"""
+    return await run_image_job(write_screenshot_outputs, image_bytes, filename, outputs)
+
+
+async def capture_screenshot(browser: Browser,
+                             url: str,
+                             outputs: Dict[str, ScreenshotOutput]
+                             ) -> Dict[str, Optional[str]]:
+    """
+    URLを1回だけ描画してページ全体を撮影し、その画像から outputs の各サイズを書き出します。
+    出力名ごとのファイルパス (失敗した場合は None) を返します。
+    """
+    parsed_url = urlparse(url)
+    if not parsed_url.scheme or not parsed_url.netloc:
+        logger.warning(f"無効なURLのためスキップ: {url}")
+        return {name: None for name in outputs}
+
+    filename = generate_filename(url)
+    for attempt in range(MAX_RETRIES):
+        context = None
+        try:
+            context = await browser.new_context(viewport={'width': 1920, 'height': 1080})
+            page = await context.new_page()
+            await page.goto(url, wait_until='load', timeout=30000)
+            image_bytes = await page.screenshot(full_page=True)
+            paths = await encode_screenshot_outputs(image_bytes, filename, outputs)
+            logger.info(f"スクリーンショットを保存しました: {url} -> {list(paths.values())}")
+            return paths
+        except Exception as e:
+            if isinstance(e, (PlaywrightTimeoutError, IOError)):
+                logger.warning(f"{url} のスクリーンショット処理で既知のエラー (試行 {attempt + 1}/{MAX_RETRIES}): {type(e).__name__} - {e}")
+            else:
+                logger.error(f"{url} のスクリーンショット処理中に予期せぬエラー (試行 {attempt + 1}/{MAX_RETRIES}): {e}")
+                traceback.print_exc()
+
+            if attempt < MAX_RETRIES - 1:
+                await asyncio.sleep(RETRY_DELAY_SECONDS)
+            else:
+                logger.error(f"{url} のスクリーンショット処理が最大試行回数 ({MAX_RETRIES}) を超えても成功しませんでした。")
+        finally:
+            if context:
+                await context.close()
+    return {name: None for name in outputs}
+
+
+async def capture_screenshots(pool: BrowserPool,
+                              url_list: List[str],
+                              outputs: Dict[str, ScreenshotOutput],
+                              concurrency: int = 2
+                              ) -> Dict[str, Dict[str, Optional[str]]]:
+    """
+    複数URLのスクリーンショットを、ブラウザプールから借りたブラウザの個別コンテキストで最大 concurrency 件ずつ並列に撮影します。
+    各URLは1回だけ描画し、outputs のすべてのサイズをその1枚から作成します。
+
+    Returns:
+        URLをキーとした、出力名ごとのファイルパス (失敗した場合は None) の辞書
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def _capture(url: str) -> Dict[str, Optional[str]]:
+        async with semaphore:
+            async with pool.acquire() as browser:
+                return await capture_screenshot(browser, url, outputs)
+
+    results = await asyncio.gather(*(_capture(url) for url in url_list))
+    return dict(zip(url_list, results))
+
+
+async def capture_main_content(page: Page,
+                               rect: BoundingBox,
+                               filename: str,
+                               outputs: Dict[str, ScreenshotOutput],
+                               context_outputs: Optional[Dict[str, ScreenshotOutput]] = None
+                               ) -> Dict[str, Optional[str]]:
+    """
+    読み込み済みのページから、メインコンテンツの矩形 (make_tree 時点のビューポート座標) を切り出して撮影し、
+    outputs の各サイズを書き出します。context_outputs を指定した場合は、メインコンテンツの上端付近から
+    ビューポート1画面分の周辺画像も撮影し、ファイル名に "_context" を付けて書き出します。
+
+    ページを読み込み直さないため、スキャン中に変更を検知した時点で呼び出します。
+    出力名ごとのファイルパス (失敗した場合は None) を返します。
+    """
+    names = list(outputs) + list(context_outputs or {})
+    if rect is None or rect.width <= 0 or rect.height <= 0:
+        logger.warning(f"メインコンテンツの矩形が空のため撮影できません: {page.url}")
+        return {name: None for name in names}
+    try:
+        scroll_x, scroll_y = await page.evaluate("() => [window.scrollX, window.scrollY]")
+        x = max(0.0, rect.x + scroll_x)
+        y = max(0.0, rect.y + scroll_y)
+        clip = {"x": x, "y": y, "width": rect.width, "height": rect.height}
+        paths: Dict[str, Optional[str]] = await encode_screenshot_outputs(
+            await page.screenshot(clip=clip, full_page=True), filename, outputs)
+
+        if context_outputs:
+            context_clip = {"x": 0, "y": max(0.0, y - CONTEXT_SHOT_MARGIN),
+                            "width": CONTEXT_SHOT_WIDTH, "height": CONTEXT_SHOT_HEIGHT}
+            root, ext = os.path.splitext(filename)
+            paths.update(await encode_screenshot_outputs(
+                await page.screenshot(clip=context_clip, full_page=True), f"{root}_context{ext}", context_outputs))
+        logger.info(f"メインコンテンツのスクリーンショットを保存しました: {page.url} -> {list(paths.values())}")
+        return paths
+    except Exception as e:
+        logger.warning(f"メインコンテンツのスクリーンショットに失敗しました: {page.url} - {type(e).__name__}: {e}")
+        return {name: None for name in names}
+
+
 def generate_filename(url: str) -> str:
     """URL から一意なファイル名を生成"""
     parsed_url = urlparse(url)
@@ -175,5 +493,8 @@ def generate_filename(url: str) -> str:
     path = parsed_url.path.rstrip("/")
     last_part = path.rsplit("/", 1)[-1] if "/" in path else "index"
     # ファイル名が長くなりすぎるのを防ぐためにハッシュを追加
+    # クエリだけが異なるURLを並列に撮影しても同じファイルに書き込まないよう、クエリもハッシュに含める
+    if parsed_url.query:
+        path = f"{path}?{parsed_url.query}"
     path_hash = hashlib.md5(path.encode()).hexdigest()[:8]
     return f"{domain}_{last_part}_{path_hash}.png"
\ No newline at end of file
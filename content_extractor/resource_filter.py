@@ -0,0 +1,192 @@
+import json
+import os
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, FrozenSet, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+from playwright.async_api import BrowserContext, Page, Route
+
+from setup_logger import setup_logger
+logger = setup_logger("resource_filter")
+
+DEFAULT_ALLOWLIST_PATH = os.path.join("data", "resource_allowlist.json")
+
+# メインコンテンツのリンク抽出に影響しないため、学習結果に関係なく常に遮断するリソース種別
+BLOCKED_RESOURCE_TYPES = frozenset({"image", "media", "font"})
+# レイアウト (描画ボックスの有無) に影響するため、常に読み込むリソース種別
+ALWAYS_ALLOWED_RESOURCE_TYPES = frozenset({"stylesheet"})
+
+# ページ内のDOM変更を時刻付きで記録する初期化スクリプト (Fullスキャンでの学習用)。
+# ページのスクリプトより先に実行されるため、パーサーによる挿入も含めてすべての変更を記録する。
+# 時刻は performance.now() で、Resource Timing の responseEnd と同じ基準で比較できる。
+MUTATION_RECORDER_SCRIPT = """(() => {
+    if (window.__wcMutationLog) return;
+    const log = window.__wcMutationLog = { entries: [], overflow: false };
+    const LIMIT = 20000;
+    try { performance.setResourceTimingBufferSize(5000); } catch (e) {}
+    new MutationObserver(records => {
+        const now = performance.now();
+        for (const record of records) {
+            if (log.entries.length >= LIMIT) {
+                log.overflow = true;
+                return;
+            }
+            log.entries.push([now, record.target, Array.from(record.addedNodes)]);
+        }
+    }).observe(document, { childList: true, subtree: true, attributes: true, characterData: true });
+})()"""
+
+# メインコンテンツ要素が最後に変更された時刻までに読み込みを終えたスクリプト・通信のURLを返すスクリプト。
+# それより後に完了したリクエストはメインコンテンツのDOMに影響し得ないため、許可リストから除外できる。
+LEARN_RESOURCES_SCRIPT = """selector => {
+    const log = window.__wcMutationLog;
+    const el = document.querySelector(selector);
+    if (!log || !el) return null;
+    let settled = 0;
+    if (log.overflow) {
+        settled = performance.now();
+    } else {
+        for (const [time, target, added] of log.entries) {
+            if (time > settled && (el.contains(target) || added.some(node => node.contains(el)))) {
+                settled = time;
+            }
+        }
+    }
+    const types = ['script', 'xmlhttprequest', 'fetch'];
+    const urls = performance.getEntriesByType('resource')
+        .filter(entry => types.includes(entry.initiatorType) && entry.responseEnd <= settled)
+        .map(entry => entry.name);
+    return { settled: settled, urls: urls };
+}"""
+
+
+def resource_key(url: str) -> str:
+    """許可リストの照合に使うキー。キャッシュ回避用のクエリ文字列に左右されないよう、scheme://host/path とする"""
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return url
+    return f"{parts.scheme}://{parts.netloc}{parts.path}"
+
+
+@dataclass(frozen=True)
+class RequestFilter:
+    """
+    Quickスキャンで読み込むリクエストを選別するフィルタ。
+    画像・メディア・フォントは常に遮断し、allowed が指定されている場合は
+    メインフレームの文書とスタイルシート以外で許可リストにないリクエストも遮断します。
+    """
+    # 学習済みの許可リスト (resource_key の集合)。None の場合はスクリプト・通信を制限しない
+    allowed: Optional[FrozenSet[str]] = None
+
+    def should_block(self, resource_type: str, url: str, main_frame: bool = True) -> bool:
+        if resource_type in BLOCKED_RESOURCE_TYPES:
+            return True
+        if self.allowed is None:
+            return False
+        if resource_type == "document":
+            # 広告などの iframe は読み込まない
+            return not main_frame
+        if resource_type in ALWAYS_ALLOWED_RESOURCE_TYPES:
+            return False
+        return resource_key(url) not in self.allowed
+
+    async def install(self, target: BrowserContext | Page) -> None:
+        """コンテキスト (またはページ) の全リクエストにフィルタを適用する"""
+        async def handle(route: Route) -> None:
+            request = route.request
+            try:
+                main_frame = request.frame.parent_frame is None
+            except Exception:
+                main_frame = True  # Service Worker などフレームに属さないリクエスト
+            if self.should_block(request.resource_type, request.url, main_frame):
+                await route.abort()
+            else:
+                await route.continue_()
+
+        await target.route("**/*", handle)
+
+
+async def start_resource_recording(target: BrowserContext | Page) -> None:
+    """ページ読み込み前に呼び出し、学習用にDOM変更の記録を開始する"""
+    await target.add_init_script(MUTATION_RECORDER_SCRIPT)
+
+
+async def learn_main_content_resources(page: Page, selector: str) -> Optional[List[str]]:
+    """
+    メインコンテンツのDOMに影響し得たスクリプト・通信のURLを返す。
+    記録が開始されていない、またはセレクタが見つからない場合は None。
+    """
+    if not selector:
+        return None
+    try:
+        result = await page.evaluate(LEARN_RESOURCES_SCRIPT, selector)
+    except Exception as e:
+        logger.warning(f"Could not learn resources for selector '{selector}': {e}")
+        return None
+    if not result:
+        return None
+    logger.debug(f"Main content settled at {result['settled']:.0f}ms with {len(result['urls'])} resources")
+    return result["urls"]
+
+
+class ResourceAllowlist:
+    """
+    URLごとに、メインコンテンツの描画に必要なスクリプト・通信の許可リストを学習して保存します。
+
+    - Fullスキャンで learn() し、Quickスキャンでは filter_for() のフィルタで不要なリクエストを遮断します。
+    - 遮断した状態でセレクタが見つからず、遮断せずに読み込み直して見つかった場合は record_fallback() で
+      許可リストを無効にし、次回のFullスキャンで学習し直すまで遮断しません (画像等の遮断は続けます)。
+    """
+
+    def __init__(self, state_path: str = DEFAULT_ALLOWLIST_PATH):
+        self.state_path = state_path
+        self.state: Dict[str, Dict] = {}
+        self.load()
+
+    def load(self) -> None:
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                self.state = json.load(f)
+        except FileNotFoundError:
+            self.state = {}
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning(f"Could not load resource allowlist '{self.state_path}': {e}")
+            self.state = {}
+
+    def save(self) -> None:
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def learn(self, url: str, resource_urls: Iterable[str]) -> None:
+        """Fullスキャンで得た、メインコンテンツに影響し得たリクエストを許可リストとして記録する"""
+        resources = sorted({resource_key(resource_url) for resource_url in resource_urls})
+        previous = self.state.get(url, {})
+        self.state[url] = {
+            "resources": resources,
+            "learned": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+            "disabled": False,
+            "fallbacks": previous.get("fallbacks", 0),
+        }
+        logger.info(f"Learned {len(resources)} allowed resources for {url}")
+
+    def filter_for(self, url: str) -> RequestFilter:
+        entry = self.state.get(url)
+        if not entry or entry.get("disabled"):
+            return RequestFilter()
+        return RequestFilter(allowed=frozenset(entry.get("resources", [])))
+
+    def record_fallback(self, url: str) -> None:
+        """許可リストでは内容を取得できなかったことを記録し、学習し直すまで許可リストを使わない"""
+        entry = self.state.get(url)
+        if entry is None:
+            return
+        entry["disabled"] = True
+        entry["fallbacks"] = entry.get("fallbacks", 0) + 1
+        logger.warning(f"Resource allowlist for {url} was insufficient; disabled until the next full scan")
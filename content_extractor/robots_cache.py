@@ -0,0 +1,165 @@
+import asyncio
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+import aiohttp
+
+from setup_logger import setup_logger
+logger = setup_logger("robots_cache")
+
+# 取得したrobots.txtを再利用する時間 (秒)
+DEFAULT_ROBOTS_TTL_SECONDS = 24 * 60 * 60
+# 取得に失敗した (ネットワークエラー・5xx) ホストを再試行するまでの時間 (秒)
+ERROR_TTL_SECONDS = 10 * 60
+ROBOTS_FETCH_TIMEOUT_SECONDS = 10
+# 共有セッションのDNSキャッシュの有効期間 (秒)
+DNS_CACHE_TTL_SECONDS = 300
+
+
+def create_http_session(limit: int = 100, dns_ttl: int = DNS_CACHE_TTL_SECONDS) -> aiohttp.ClientSession:
+    """接続をプールし、DNSの解決結果をキャッシュする共有HTTPセッションを作成する (呼び出し側が閉じる)"""
+    return aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=limit, ttl_dns_cache=dns_ttl))
+
+
+def robots_key(url: str) -> str:
+    """robots.txt はスキーム・ホスト・ポートの組ごとに適用される"""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}".lower()
+
+
+def parse_robots(robots_txt: Optional[str]) -> RobotFileParser:
+    parser = RobotFileParser()
+    parser.parse((robots_txt or "").splitlines())
+    return parser
+
+
+@dataclass
+class RobotsEntry:
+    # robots.txt の内容。None は robots.txt がない (または取得できなかった) ことを表し、すべて許可する
+    text: Optional[str]
+    fetched_at: float
+    ttl: float
+    parser: Optional[RobotFileParser] = None
+
+    def expired(self, now: float) -> bool:
+        return now - self.fetched_at >= self.ttl
+
+    def can_fetch(self, url: str, user_agent: str) -> bool:
+        if self.text is None:
+            return True
+        if self.parser is None:
+            self.parser = parse_robots(self.text)
+        return self.parser.can_fetch(user_agent, url)
+
+
+class RobotsCache:
+    """
+    ホストごとにrobots.txtを1度だけ取得し、解析済みの RobotFileParser を ttl 秒の間再利用します。
+
+    - 同じホストへの同時の問い合わせは1回の取得にまとめます。
+    - session を指定した場合はそのセッション (接続プール・DNSキャッシュ) で取得し、
+      省略時は create_http_session() で作成したセッションを close() で閉じます。
+    - state_path を指定した場合は取得結果をファイルに保存し、次回の起動時に有効期間内のものは取得を省略します。
+    """
+
+    def __init__(self,
+                 ttl_seconds: float = DEFAULT_ROBOTS_TTL_SECONDS,
+                 state_path: Optional[str] = None,
+                 session: Optional[aiohttp.ClientSession] = None):
+        self.ttl_seconds = ttl_seconds
+        self.state_path = state_path
+        self.session = session
+        self._owns_session = session is None
+        self.entries: Dict[str, RobotsEntry] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        if state_path:
+            self.load()
+
+    async def __aenter__(self) -> "RobotsCache":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        if self._owns_session and self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def can_fetch(self, url: str, user_agent: str = "*") -> bool:
+        """robots.txt に従い、URLの取得が許可されているかを返す"""
+        entry = await self.entry_for(url)
+        return entry.can_fetch(url, user_agent)
+
+    async def entry_for(self, url: str) -> RobotsEntry:
+        key = robots_key(url)
+        entry = self.entries.get(key)
+        if entry is not None and not entry.expired(time.time()):
+            return entry
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            # 待っている間に他のタスクが取得済みの場合
+            entry = self.entries.get(key)
+            if entry is None or entry.expired(time.time()):
+                entry = await self._fetch(key)
+                self.entries[key] = entry
+        return entry
+
+    async def _fetch(self, key: str) -> RobotsEntry:
+        robots_url = f"{key}/robots.txt"
+        if self.session is None:
+            self.session = create_http_session()
+            self._owns_session = True
+        try:
+            timeout = aiohttp.ClientTimeout(total=ROBOTS_FETCH_TIMEOUT_SECONDS)
+            async with self.session.get(robots_url, timeout=timeout) as response:
+                if response.status == 200:
+                    # charset の指定がない・誤っている robots.txt でも失敗させない (読めない文字は置き換える)
+                    body = await response.read()
+                    text = body.decode(response.charset or "utf-8", errors="replace")
+                    logger.debug(f"Fetched {robots_url} ({len(text)} chars)")
+                    return RobotsEntry(text=text, fetched_at=time.time(), ttl=self.ttl_seconds)
+                if response.status >= 500:
+                    logger.warning(f"robots.txtの取得に失敗しました: {robots_url} - HTTP {response.status}")
+                    return RobotsEntry(text=None, fetched_at=time.time(), ttl=ERROR_TTL_SECONDS)
+                # 4xx は robots.txt なしとして扱う
+                return RobotsEntry(text=None, fetched_at=time.time(), ttl=self.ttl_seconds)
+        except (aiohttp.ClientError, asyncio.TimeoutError, UnicodeDecodeError, LookupError, ValueError) as e:
+            # 取得・解釈できない場合はすべて許可し、短い間隔で取得し直す
+            logger.error(f"robots.txtの取得中にエラーが発生: {robots_url} - {e}")
+            return RobotsEntry(text=None, fetched_at=time.time(), ttl=ERROR_TTL_SECONDS)
+
+    def load(self) -> None:
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning(f"Could not load robots.txt cache '{self.state_path}': {e}")
+            return
+        now = time.time()
+        for key, value in state.items():
+            entry = RobotsEntry(text=value.get("text"), fetched_at=float(value.get("fetched_at", 0)),
+                                ttl=float(value.get("ttl", self.ttl_seconds)))
+            if not entry.expired(now):
+                self.entries[key] = entry
+
+    def save(self) -> None:
+        if not self.state_path:
+            return
+        now = time.time()
+        state = {key: {"text": entry.text, "fetched_at": entry.fetched_at, "ttl": entry.ttl}
+                 for key, entry in self.entries.items() if not entry.expired(now)}
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.state_path)
@@ -1,9 +1,115 @@
 import math
+from collections import deque
+from dataclasses import dataclass
 from typing import Dict, List, Any, Union , Optional
+import numpy as np
 from scipy import stats
 
 from .dom_treeSt import DOMTreeSt, BoundingBox
 
+# スコアリングの計算方式
+# scalar: ノードごとにscipyの確率分布を評価する従来方式
+# numpy : 全ノードの特徴量を配列にまとめ、閉形式のpdfで一括計算する方式
+SCORING_BACKEND_SCALAR = "scalar"
+SCORING_BACKEND_NUMPY = "numpy"
+SCORING_BACKENDS = (SCORING_BACKEND_SCALAR, SCORING_BACKEND_NUMPY)
+
+# is_valid_element で除外するタグ (大文字)
+INVALID_CANDIDATE_TAGS = frozenset([
+    "NAV",      # ナビゲーション
+    "ASIDE",    # サイドバー
+    "HEADER",   # ヘッダー
+    "FOOTER",   # フッター
+    "MENU",     # メニュー
+    "BODY",     # body全体を候補にしない
+    "HTML",     # html全体を候補にしない
+])
+
+
+@dataclass
+class NodeFeatures:
+    """ベクトル化スコアリング用に、ノード群の特徴量を列ごとの配列にまとめたもの"""
+    x: np.ndarray
+    y: np.ndarray
+    width: np.ndarray
+    height: np.ndarray
+    text_length: np.ndarray
+    link_length: np.ndarray
+    depth: np.ndarray
+    is_main: np.ndarray
+    is_valid: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    def take(self, indices) -> "NodeFeatures":
+        """指定したインデックス（またはスライス）の行だけを持つ NodeFeatures を返す"""
+        return NodeFeatures(**{name: getattr(self, name)[indices] for name in self.__dataclass_fields__})
+
+
+def extract_node_features(nodes: List[DOMTreeSt]) -> NodeFeatures:
+    """
+    ノードのリストから、スコアリングに必要な特徴量を NumPy 配列として抽出します。
+    rect/text/links が欠損・不正な場合の扱いはスカラー版のスコア関数に合わせています。
+    """
+    count = len(nodes)
+    rects = np.zeros((count, 4), dtype=np.float64)
+    text_length = np.zeros(count, dtype=np.float64)
+    link_length = np.zeros(count, dtype=np.float64)
+    depth = np.zeros(count, dtype=np.float64)
+    is_main = np.zeros(count, dtype=bool)
+    is_valid = np.zeros(count, dtype=bool)
+
+    for i, node in enumerate(nodes):
+        rect = node.rect
+        if rect:
+            rects[i] = (rect.x, rect.y, rect.width, rect.height)
+        text_length[i] = len(node.text) if isinstance(node.text, str) else 0
+        link_length[i] = len(node.links) if isinstance(node.links, list) else 0
+        depth[i] = node.depth
+        is_main[i] = is_main_element(node)
+        is_valid[i] = bool(node.tag) and node.tag.upper() not in INVALID_CANDIDATE_TAGS
+
+    is_valid &= rects[:, 2] * rects[:, 3] >= 0.05
+
+    return NodeFeatures(
+        x=rects[:, 0], y=rects[:, 1], width=rects[:, 2], height=rects[:, 3],
+        text_length=text_length, link_length=link_length, depth=depth,
+        is_main=is_main, is_valid=is_valid,
+    )
+
+
+def _norm_pdf(values: np.ndarray, mean: float, std: float) -> np.ndarray:
+    """正規分布の確率密度関数（閉形式）"""
+    return np.exp(-0.5 * ((values - mean) / std) ** 2) / (std * math.sqrt(2 * math.pi))
+
+
+def _gamma_pdf(values: np.ndarray, shape: float, scale: float) -> np.ndarray:
+    """ガンマ分布の確率密度関数（閉形式）。定義域外 (x <= 0) は0を返す。"""
+    result = np.zeros_like(values, dtype=np.float64)
+    positive = values > 0
+    x = values[positive]
+    log_pdf = (shape - 1) * np.log(x) - x / scale - math.lgamma(shape) - shape * math.log(scale)
+    result[positive] = np.exp(log_pdf)
+    return result
+
+
+def _piecewise_gaussian(values: np.ndarray, mean: float, std_low: float, std_high: float) -> np.ndarray:
+    """平均の左右で標準偏差が異なるガウス関数"""
+    std = np.where(values <= mean, std_low, std_high)
+    return np.exp(-0.5 * ((values - mean) / std) ** 2)
+
+
+def iter_nodes_breadth_first(roots: List[DOMTreeSt]) -> List[DOMTreeSt]:
+    """ルートのリストから幅優先でノードを列挙します（入力リストは変更しません）。"""
+    queue = deque(roots)
+    ordered = []
+    while queue:
+        node = queue.popleft()
+        ordered.append(node)
+        queue.extend(node.children)
+    return ordered
+
 class MainContentScorer:
     """
     DOMツリーを受け取り、各ノードがメインコンテンツである可能性をスコアリングします。
@@ -47,15 +153,19 @@ class MainContentScorer:
     def __init__(self,
                  tree: list[DOMTreeSt],
                  width: int,
-                 height: int
+                 height: int,
+                 backend: str = SCORING_BACKEND_SCALAR
                  ):
         if isinstance(tree, list):
             self.tree = tree
         else:
             raise TypeError("tree must be a list of dicts")
+        if backend not in SCORING_BACKENDS:
+            raise ValueError(f"Unknown scoring backend: {backend}")
 
         self.width = width
         self.height = height
+        self.backend = backend
 
     def _calculate_screen_occupancy_multiplier(self,
                                                occupancy_rate: float,
@@ -149,6 +259,59 @@ class MainContentScorer:
 
         return score * link_density_score * text_score
 
+    def _calculate_base_scores(self, features: NodeFeatures) -> np.ndarray:
+        """
+        `_calculate_base_score` のベクトル化版。全ノードのベーススコアを1回の配列演算で算出します。
+        scipyの凍結分布は呼び出しごとのオーバーヘッドが大きいため、pdfは閉形式で評価します。
+        """
+        # 1. 画面占有率
+        page_area = self.width * self.height if self.width * self.height > 0 else 1
+        occupancy_rate = np.maximum(0.0, features.width * features.height / page_area)
+        score = np.exp(-0.5 * ((occupancy_rate - 0.8) / 0.3) ** 2)
+
+        # 2. 位置とサイズ
+        if self.width > 0:
+            x = (features.x + features.width / 2) / self.width
+            w = features.width / self.width
+        else:
+            x = w = np.zeros(len(features))
+        if self.height > 0:
+            y = features.y / self.height
+            h = features.height / self.height
+        else:
+            y = h = np.zeros(len(features))
+
+        x_score = _norm_pdf(x, self.X_DIST.mean(), self.X_DIST.std()) ** self.Weights.X
+        y_score = _norm_pdf(y, self.Y_DIST.mean(), self.Y_DIST.std()) ** self.Weights.Y
+        # ガンマ分布のパラメータは平均と分散から復元する (mean = k*θ, var = k*θ^2)
+        width_scale = self.WIDTH_DIST.var() / self.WIDTH_DIST.mean()
+        width_shape = self.WIDTH_DIST.mean() / width_scale
+        w_score = _gamma_pdf(w, width_shape, width_scale) ** self.Weights.WIDTH
+        h_score = np.clip(h, 0.0, self.Weights.MAX_NORMALIZED_HEIGHT) ** self.Weights.HEIGHT
+        score = score * x_score * y_score * w_score * h_score
+
+        # 3. リンク密度とテキスト量
+        link_score = np.where(
+            features.link_length == 0,
+            0.1,
+            _piecewise_gaussian(features.link_length, self.LinkScoring.MEAN, self.LinkScoring.STD_LOW, self.LinkScoring.STD_HIGH),
+        ) ** self.Weights.LINK_LENGTH_WEIGHT
+        text_score = np.where(
+            features.text_length == 0,
+            0.0,
+            _piecewise_gaussian(features.text_length, self.TextScoring.MEAN, self.TextScoring.STD_LOW, self.TextScoring.STD_HIGH),
+        ) ** self.Weights.TEXT_LENGTH_WEIGHT
+
+        return score * link_score * text_score
+
+    def _candidacy_scores(self, features: NodeFeatures) -> np.ndarray:
+        """`_score_for_candidacy` のベクトル化版"""
+        return self._calculate_base_scores(features) + np.where(features.is_main, self.Weights.MAIN_TAG_BONUS, 0.0)
+
+    def refinement_scores(self, features: NodeFeatures, depth_diff: int) -> np.ndarray:
+        """`_score_for_refinement` のベクトル化版。TreeIndex のスライスからも直接呼び出されます。"""
+        return self._calculate_base_scores(features) * calculate_depth_weights(features.depth - depth_diff)
+
     def _score_for_candidacy(self, node: DOMTreeSt):
         """
         第一段階: メインコンテンツ候補を大まかに見つけるためのスコアリング。
@@ -175,30 +338,35 @@ class MainContentScorer:
 
         node.score = score
 
-    def find_candidates(self) -> List[DOMTreeSt]:
+    def find_candidates(self, top_k: Optional[int] = None) -> List[DOMTreeSt]:
         """
         DOMツリー全体をスキャンし、メインコンテンツの候補となりうる要素をリストアップします。
         `_score_for_candidacy` を用いて、大まかなスコアリングを行います。
         返り値はスコアの高い順にソートされた候補ノードのリストです。
+        top_k を指定した場合は上位 top_k 件のみを返します。
         """
         if not self.tree:
             return []
 
-        nodes = self.tree
-        candidates = []
-        while nodes :
-            node = nodes.pop(0)
+        nodes = iter_nodes_breadth_first(self.tree)
 
+        if self.backend == SCORING_BACKEND_NUMPY:
+            features = extract_node_features(nodes)
+            scores = self._candidacy_scores(features)
+            assign_scores(nodes, scores)
+            candidate_indices = np.flatnonzero(features.is_valid)
+            return [nodes[i] for i in top_indices(scores, candidate_indices, top_k)]
+
+        candidates = []
+        for node in nodes:
             if is_valid_element(node):
                 candidates.append(node)
 
             self._score_for_candidacy(node)
 
-            nodes.extend(node.children)
-
         candidates.sort(key=lambda x: x.score, reverse=True)
 
-        return candidates
+        return candidates[:top_k] if top_k is not None else candidates
 
     def score_parent_and_children(self) -> list[DOMTreeSt]:
         """
@@ -212,19 +380,47 @@ class MainContentScorer:
         # ツリーの最上位の深さを基準(0)とするための差分
         depth_diff = self.tree[0].depth
 
-        scored_nodes: List[DOMTreeSt] = []
-        nodes_to_score = list(self.tree)  # Make a copy to iterate over
+        scored_nodes = iter_nodes_breadth_first(self.tree)
 
-        while nodes_to_score:
-            node = nodes_to_score.pop(0) # Corrected line
+        if self.backend == SCORING_BACKEND_NUMPY:
+            features = extract_node_features(scored_nodes)
+            scores = self.refinement_scores(features, depth_diff)
+            assign_scores(scored_nodes, scores)
+            return [scored_nodes[i] for i in top_indices(scores, np.arange(len(scored_nodes)), None)]
+
+        for node in scored_nodes:
             self._score_for_refinement(node, depth_diff=depth_diff)
-            scored_nodes.append(node)
-            nodes_to_score.extend(node.children)
 
         scored_nodes.sort(key=lambda x: x.score, reverse=True)
 
         return scored_nodes
 
+
+def assign_scores(nodes: List[DOMTreeSt], scores: np.ndarray) -> None:
+    """ベクトル計算したスコアを各ノードに書き戻す"""
+    for node, score in zip(nodes, scores.tolist()):
+        node.score = score
+
+
+def top_indices(scores: np.ndarray, indices: np.ndarray, top_k: Optional[int]) -> List[int]:
+    """
+    indices のうちスコア上位のものを降順で返します。
+    同点の場合は元の順序を保ちます（list.sort(reverse=True) と同じ並び）。
+    top_k を指定した場合は argpartition による部分ソートで上位のみを選びます。
+    """
+    if len(indices) == 0:
+        return []
+    candidate_scores = scores[indices]
+    if top_k is not None and top_k < len(indices):
+        if top_k <= 0:
+            return []
+        selected = np.argpartition(-candidate_scores, top_k - 1)[:top_k]
+        order = selected[np.lexsort((selected, -candidate_scores[selected]))]
+    else:
+        order = np.argsort(-candidate_scores, kind="stable")
+    return indices[order].tolist()
+
+
 def calculate_depth_weight(current_depth : int ,
                            max_depth : int = 5,
                            base_weight :float =1.0 ,
@@ -239,6 +435,14 @@ def calculate_depth_weight(current_depth : int ,
     weight = base_weight * (weight_factor ** depth_ratio)
     return weight
 
+def calculate_depth_weights(depths: np.ndarray,
+                            max_depth: int = 5,
+                            base_weight: float = 1.0,
+                            weight_factor: float = 4.0) -> np.ndarray:
+    """`calculate_depth_weight` のベクトル化版"""
+    depth_ratio = np.maximum(0, depths) / max_depth
+    return base_weight * (weight_factor ** depth_ratio)
+
 def is_main_element(node: DOMTreeSt) -> bool:
     """
     ノードが<main>タグか、idに"main"を含むなど、
@@ -292,16 +496,7 @@ def is_valid_element(node: DOMTreeSt) -> bool:
     # テキスト要素(P, Hxなど)を直接の候補から除外するアプローチから、
     # 非コンテナ要素を明示的に除外するアプローチに変更。
     # 現在は、主要な非コンテンツ領域タグのみを除外対象とする。
-    invalid_tags = [
-        "NAV",      # ナビゲーション
-        "ASIDE",    # サイドバー
-        "HEADER",   # ヘッダー
-        "FOOTER",   # フッター
-        "MENU",     # メニュー
-        "BODY",     # body全体を候補にしない
-        "HTML",     # html全体を候補にしない
-    ]
-    if tag in invalid_tags:
+    if tag in INVALID_CANDIDATE_TAGS:
         return False
 
     # 画面に対して極端に小さい要素は除外
@@ -0,0 +1,262 @@
+import asyncio
+import json
+import os
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit, quote
+
+import aiohttp
+
+from .dom_treeSt import DOMTreeSt, SCAN_MODE_QUICK
+from setup_logger import setup_logger
+logger = setup_logger("static_scan")
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:  # selectolax が未インストールの場合、静的エンジンは無効になる
+    LexborHTMLParser = None
+
+# Quickスキャンエンジンの種類
+QUICK_ENGINE_AUTO = "auto"
+QUICK_ENGINE_STATIC = "static"
+QUICK_ENGINE_BROWSER = "browser"
+# auto 時に静的/ブラウザ両方で取得して結果を照合するモード
+QUICK_ENGINE_VERIFY = "verify"
+
+STATIC_FETCH_TIMEOUT_SECONDS = 15
+DEFAULT_ENGINE_STATE_PATH = os.path.join("data", "quick_engine_state.json")
+
+# WHATWG URL Standard のパーセントエンコード対象に合わせた「エンコードしない文字」
+# (ブラウザの a.href と同じ正規化結果を得るため)
+_PRINTABLE_ASCII = "".join(chr(c) for c in range(0x21, 0x7F))
+_PATH_SAFE = "".join(c for c in _PRINTABLE_ASCII if c not in '"#<>?`{}')
+_QUERY_SAFE = "".join(c for c in _PRINTABLE_ASCII if c not in "\"#<>'")
+_FRAGMENT_SAFE = "".join(c for c in _PRINTABLE_ASCII if c not in '"<>`')
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def is_static_engine_available() -> bool:
+    return LexborHTMLParser is not None
+
+
+def normalize_href(base_url: str, href: str) -> str:
+    """
+    ブラウザの `a.href` と同等になるよう、href を絶対URLへ解決して正規化します。
+    (スキーム・ホストの小文字化、既定ポートの除去、非ASCII文字のパーセントエンコードなど)
+    """
+    resolved = urljoin(base_url, href.strip())
+    try:
+        parts = urlsplit(resolved)
+    except ValueError:
+        return resolved
+    scheme = parts.scheme.lower()
+    if scheme not in _DEFAULT_PORTS:
+        return resolved
+
+    hostname = parts.hostname or ""
+    try:
+        hostname = hostname.encode("idna").decode("ascii")
+    except UnicodeError:
+        pass
+    netloc = hostname
+    if parts.username is not None:
+        userinfo = parts.username + (f":{parts.password}" if parts.password is not None else "")
+        netloc = f"{userinfo}@{netloc}"
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    if port is not None and port != _DEFAULT_PORTS[scheme]:
+        netloc = f"{netloc}:{port}"
+
+    # 絶対URL同士では urljoin がドットセグメントを解決しないため、パスだけを解決し直す
+    path = urlsplit(urljoin(f"{scheme}://{netloc}/", parts.path or "/")).path
+    path = quote(path, safe=_PATH_SAFE)
+    normalized = f"{scheme}://{netloc}{path}"
+    # 空のクエリ/フラグメントでも区切り文字はブラウザ同様に残す
+    without_fragment, has_fragment, _ = resolved.partition("#")
+    if "?" in without_fragment:
+        normalized += "?" + quote(parts.query, safe=_QUERY_SAFE)
+    if has_fragment:
+        normalized += "#" + quote(parts.fragment, safe=_FRAGMENT_SAFE)
+    return normalized
+
+
+def extract_static_content(html: str,
+                           page_url: str,
+                           css_selector_list: List[str]
+                           ) -> Optional[Tuple[str, DOMTreeSt]]:
+    """
+    取得済みのHTMLに保存済みセレクタを順に適用し、最初にマッチした要素を DOMTreeSt として返します。
+    links はブラウザ版と同じく要素配下の全 `a` のhrefを絶対URL化してソートしたものです。
+    描画情報 (rect) は取得できないため既定値のままです。
+
+    Returns:
+        (マッチしたセレクタ, DOMTreeSt) のタプル。どのセレクタもマッチしない場合は None。
+    """
+    if LexborHTMLParser is None:
+        return None
+
+    tree = LexborHTMLParser(html)
+    base_url = page_url
+    base_node = tree.css_first("base[href]")
+    if base_node is not None:
+        base_url = urljoin(page_url, base_node.attributes.get("href") or "")
+
+    for selector in css_selector_list:
+        try:
+            root = tree.css_first(selector)
+        except Exception as e:
+            logger.debug(f"Static engine could not evaluate selector '{selector}': {e}")
+            continue
+        if root is None:
+            continue
+
+        links = []
+        for anchor in root.css("a"):
+            if anchor == root:
+                continue
+            href = anchor.attributes.get("href")
+            if href is None:
+                continue
+            resolved = normalize_href(base_url, href)
+            if resolved:
+                links.append(resolved)
+        links.sort()
+
+        attributes = {key: (value or "") for key, value in root.attributes.items()}
+        node = DOMTreeSt(
+            tag=root.tag,
+            id=attributes.get("id", ""),
+            attributes=attributes,
+            text=root.text(separator=" ", strip=True),
+            css_selector=selector,
+            links=links,
+        )
+        return selector, node
+
+    return None
+
+
+async def fetch_html(url: str,
+                     session: aiohttp.ClientSession,
+                     timeout: int = STATIC_FETCH_TIMEOUT_SECONDS
+                     ) -> Optional[Tuple[str, str]]:
+    """URLのHTMLを取得し、(リダイレクト後の最終URL, HTML) を返します。失敗時は None。"""
+    try:
+        async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            if response.status != 200:
+                logger.debug(f"Static fetch returned HTTP {response.status}: {url}")
+                return None
+            content_type = response.headers.get("Content-Type", "")
+            if content_type and "html" not in content_type:
+                logger.debug(f"Static fetch skipped non-HTML content ({content_type}): {url}")
+                return None
+            return str(response.url), await response.text(errors="replace")
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.debug(f"Static fetch failed: {url} - {e}")
+        return None
+
+
+async def static_quick_extract(url: str,
+                               session: aiohttp.ClientSession,
+                               css_selector_list: List[str],
+                               webtype_str: str
+                               ) -> Optional[DOMTreeSt]:
+    """
+    ブラウザを使わずにQuickスキャンを行います。
+    aiohttpで取得した初期HTMLに保存済みセレクタを適用し、ブラウザ版と同じ形式の DOMTreeSt を返します。
+    """
+    if not is_static_engine_available() or not css_selector_list:
+        return None
+
+    fetched = await fetch_html(url, session)
+    if not fetched:
+        return None
+    final_url, html = fetched
+
+    extracted = extract_static_content(html, final_url, css_selector_list)
+    if not extracted:
+        logger.debug(f"Static engine found none of the stored selectors: {url}")
+        return None
+    selector, node = extracted
+
+    css_selector_list.remove(selector)
+    css_selector_list.insert(0, selector)
+    node.css_selector_list = css_selector_list
+    node.url = url
+    node.web_type = webtype_str
+    node.scan_mode = SCAN_MODE_QUICK
+    return node
+
+
+class QuickEngineSelector:
+    """
+    URLごとに静的エンジンとブラウザの結果が一致したかを記録し、次回以降のQuickスキャンエンジンを選択します。
+
+    - 未検証のURLは両方で取得して照合します (verify)。
+    - `promote_after` 回連続で一致したURLは静的エンジンのみで処理します。
+    - 一致しなかった、または静的エンジンで取得できなかったURLはブラウザで処理します。
+    - どちらの場合も `reverify_interval` 回ごとに再照合し、サイト側の変化に追従します。
+    """
+
+    def __init__(self,
+                 state_path: str = DEFAULT_ENGINE_STATE_PATH,
+                 promote_after: int = 2,
+                 reverify_interval: int = 10
+                 ):
+        self.state_path = state_path
+        self.promote_after = promote_after
+        self.reverify_interval = reverify_interval
+        self.state: Dict[str, Dict] = {}
+        self.load()
+
+    def load(self) -> None:
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                self.state = json.load(f)
+        except FileNotFoundError:
+            self.state = {}
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning(f"Could not load quick engine state '{self.state_path}': {e}")
+            self.state = {}
+
+    def save(self) -> None:
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def choose(self, url: str) -> str:
+        """URLに対して使用するエンジン (static / browser / verify) を返します。"""
+        if not is_static_engine_available():
+            return QUICK_ENGINE_BROWSER
+
+        entry = self.state.get(url)
+        if entry is None:
+            return QUICK_ENGINE_VERIFY
+
+        entry["runs_since_verify"] = entry.get("runs_since_verify", 0) + 1
+        if entry["runs_since_verify"] >= self.reverify_interval:
+            return QUICK_ENGINE_VERIFY
+        return entry.get("engine", QUICK_ENGINE_BROWSER)
+
+    def record(self, url: str, matched: bool) -> None:
+        """静的エンジンの結果がブラウザ版と一致したかを記録します。"""
+        entry = self.state.setdefault(url, {"engine": QUICK_ENGINE_BROWSER, "consecutive_matches": 0,
+                                            "matches": 0, "mismatches": 0})
+        if matched:
+            entry["matches"] = entry.get("matches", 0) + 1
+            entry["consecutive_matches"] = entry.get("consecutive_matches", 0) + 1
+            if entry["consecutive_matches"] >= self.promote_after:
+                entry["engine"] = QUICK_ENGINE_STATIC
+        else:
+            entry["mismatches"] = entry.get("mismatches", 0) + 1
+            entry["consecutive_matches"] = 0
+            entry["engine"] = QUICK_ENGINE_BROWSER
+        entry["runs_since_verify"] = 0
+        entry["last_verified"] = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+        logger.info(f"Quick engine for {url}: {entry['engine']} (static matched: {matched})")
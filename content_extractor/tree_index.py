@@ -0,0 +1,65 @@
+from typing import Dict, List
+
+import numpy as np
+
+from .dom_treeSt import DOMTreeSt
+from .scorer import NodeFeatures, extract_node_features
+
+
+class TreeIndex:
+    """
+    DOMツリーを先行順(pre-order)に並べた平坦なインデックス。
+
+    各ノードについて親の位置・ルートからの階層・部分木の終端位置を保持するため、
+    任意ノードの部分木は `nodes[start:end]` のスライスとして再帰なしで取得できます。
+    スコアリング用の特徴量 (`NodeFeatures`) も同じ並びで1度だけ抽出しておきます。
+    """
+
+    def __init__(self, root: DOMTreeSt):
+        nodes: List[DOMTreeSt] = []
+        parents: List[int] = []
+        levels: List[int] = []
+
+        # 再帰を使わずに先行順で列挙する (深いDOMでも RecursionError にならない)
+        stack = [(root, -1, 0)]
+        while stack:
+            node, parent, level = stack.pop()
+            position = len(nodes)
+            nodes.append(node)
+            parents.append(parent)
+            levels.append(level)
+            for child in reversed(node.children):
+                stack.append((child, position, level + 1))
+
+        # 部分木の終端: 後ろから走査し、子の終端を親へ伝播させる
+        ends = np.arange(1, len(nodes) + 1, dtype=np.int64)
+        for position in range(len(nodes) - 1, 0, -1):
+            parent = parents[position]
+            if ends[position] > ends[parent]:
+                ends[parent] = ends[position]
+
+        self.nodes = nodes
+        self.parent = np.asarray(parents, dtype=np.int64)
+        self.level = np.asarray(levels, dtype=np.int64)
+        self.end = ends
+        self.features: NodeFeatures = extract_node_features(nodes)
+        self._positions: Dict[int, int] = {id(node): i for i, node in enumerate(nodes)}
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def __contains__(self, node: DOMTreeSt) -> bool:
+        return id(node) in self._positions
+
+    def position(self, node: DOMTreeSt) -> int:
+        """ノードの先行順での位置を返す。インデックスに含まれない場合は KeyError。"""
+        return self._positions[id(node)]
+
+    def subtree_slice(self, node: DOMTreeSt) -> slice:
+        """ノード自身とその全子孫を表すスライスを返す"""
+        start = self.position(node)
+        return slice(start, int(self.end[start]))
+
+    def subtree(self, node: DOMTreeSt) -> List[DOMTreeSt]:
+        """ノード自身とその全子孫を先行順のリストで返す"""
+        return self.nodes[self.subtree_slice(node)]
@@ -1 +1,2 @@
-from .test_send_mail import send_email 
\ No newline at end of file
+from .test_send_mail import send_email 
+from .dispatcher import NotificationDispatcher, SmtpSettings, build_message
@@ -0,0 +1,222 @@
+import asyncio
+import os
+import smtplib
+import ssl
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from email import message_from_bytes, policy
+from email.message import Message
+from email.mime.image import MIMEImage
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Callable, List, Optional
+
+from setup_logger import setup_logger
+logger = setup_logger("mail_dispatcher")
+
+# スプールしたメールの再送を試みる回数の上限 (超えたものは .failed として残す)
+DEFAULT_MAX_ATTEMPTS = 5
+SPOOL_SUFFIX = ".eml"
+FAILED_SUFFIX = ".failed"
+
+
+def _parse_spool_name(path: str):
+    name = os.path.basename(path)[:-len(SPOOL_SUFFIX)]
+    message_id, _, attempts = name.partition(".")
+    return message_id, int(attempts) if attempts.isdigit() else 1
+
+
+def build_message(sender: str,
+                  receiver: str,
+                  body: str,
+                  body_type: str = "plain",
+                  image_list: Optional[List[Optional[str]]] = None,
+                  subject: str = "") -> MIMEMultipart:
+    """本文と画像 (Content-ID: image_<番号>) を添付したメールを作成する"""
+    message = MIMEMultipart()
+    message["From"] = sender
+    message["To"] = receiver
+    message["Subject"] = subject
+
+    # メール本文の追加
+    message.attach(MIMEText(body, body_type))
+
+    # 画像を添付
+    for i, image_path in enumerate(image_list or []):
+        if not image_path:
+            continue
+        ext = os.path.splitext(image_path)[1].lower()[1:]
+        if ext == "jpg":
+            ext = "jpeg"  # MIMEサブタイプは image/jpeg
+        with open(image_path, "rb") as img_file:
+            img = MIMEImage(img_file.read(), _subtype=f'{ext}')
+            img.add_header("Content-ID", f"<image_{i}>")
+            message.attach(img)
+    return message
+
+
+@dataclass
+class SmtpSettings:
+    account: str
+    password: str = ""
+    host: str = "smtp.gmail.com"
+    port: int = 587
+    # True の場合 STARTTLS で暗号化してからログインする (ローカルのテスト用サーバーでは False)
+    starttls: bool = True
+    timeout: float = 30.0
+
+    @classmethod
+    def from_config(cls, mail_config: dict, smtp_config: Optional[dict] = None) -> "SmtpSettings":
+        """mail.yaml の gmail セクション (account, password) と config.yaml の notification.smtp から作成する"""
+        smtp_config = smtp_config or {}
+        gmail = mail_config.get("gmail", {})
+        return cls(
+            account=gmail.get("account", ""),
+            password=gmail.get("password", ""),
+            host=smtp_config.get("host", "smtp.gmail.com"),
+            port=int(smtp_config.get("port", 587)),
+            starttls=smtp_config.get("starttls", True),
+            timeout=float(smtp_config.get("timeout", 30)),
+        )
+
+
+class NotificationDispatcher:
+    """
+    メールの送信をイベントループの外 (専用のワーカースレッド) で行い、1回の実行の間は
+    ログイン済みのSMTP接続を使い回します。
+
+    - send() は送信に失敗したメールをスプールディレクトリに保存し、flush_spool() で再送します。
+    - close() (または async with の終了) で接続を閉じます。
+    - smtp_factory を差し替えると、ローカルのテスト用SMTPサーバー (aiosmtpd など) やモックに送信できます。
+    """
+
+    def __init__(self,
+                 settings: SmtpSettings,
+                 spool_dir: str,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                 smtp_factory: Callable[..., smtplib.SMTP] = smtplib.SMTP):
+        self.settings = settings
+        self.spool_dir = spool_dir
+        self.max_attempts = max(1, max_attempts)
+        self.smtp_factory = smtp_factory
+        self._smtp: Optional[smtplib.SMTP] = None
+        # 1本の接続を順番に使うため、ワーカーは1つ
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="smtp")
+
+    async def __aenter__(self) -> "NotificationDispatcher":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    # --- ワーカースレッドで実行する処理 ---
+
+    def _connect(self) -> smtplib.SMTP:
+        if self._smtp is not None:
+            return self._smtp
+        settings = self.settings
+        smtp = self.smtp_factory(settings.host, settings.port, timeout=settings.timeout)
+        try:
+            smtp.ehlo()
+            if settings.starttls:
+                smtp.starttls(context=ssl.create_default_context())
+                smtp.ehlo()
+            if settings.password:
+                smtp.login(settings.account, settings.password)
+        except Exception:
+            smtp.close()
+            raise
+        logger.debug(f"Connected to SMTP server {settings.host}:{settings.port}")
+        self._smtp = smtp
+        return smtp
+
+    def _disconnect(self) -> None:
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except smtplib.SMTPException:
+            self._smtp.close()
+        except OSError:
+            pass
+        self._smtp = None
+
+    def _deliver(self, message: Message) -> None:
+        try:
+            self._connect().send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            # 使い回していた接続がサーバー側で切断された場合は、古いソケットを閉じて1度だけ接続し直す
+            self._disconnect()
+            self._connect().send_message(message)
+
+    def _spool(self, message: Message, attempts: int = 1) -> str:
+        os.makedirs(self.spool_dir, exist_ok=True)
+        path = os.path.join(self.spool_dir, f"{uuid.uuid4().hex}.{attempts}{SPOOL_SUFFIX}")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(message.as_bytes())
+        os.replace(tmp_path, path)
+        return path
+
+    # --- 公開API ---
+
+    async def send(self, message: Message) -> bool:
+        """メールを送信する。失敗した場合はスプールに保存して False を返す"""
+        try:
+            await self._run(self._deliver, message)
+            logger.info(f"Mail sent: {message['Subject']!r} to {message['To']}")
+            return True
+        except (smtplib.SMTPException, OSError) as e:
+            await self._run(self._disconnect)
+            path = await self._run(self._spool, message)
+            logger.error(f"Mail delivery failed ({type(e).__name__}: {e}); spooled to {path}")
+            return False
+
+    def spooled(self) -> List[str]:
+        if not os.path.isdir(self.spool_dir):
+            return []
+        return sorted(os.path.join(self.spool_dir, name) for name in os.listdir(self.spool_dir)
+                      if name.endswith(SPOOL_SUFFIX))
+
+    async def flush_spool(self) -> int:
+        """スプールしたメールを再送し、送信できた件数を返す"""
+        return await self._run(self._flush_spool)
+
+    def _flush_spool(self) -> int:
+        sent = 0
+        for path in self.spooled():
+            with open(path, "rb") as f:
+                message = message_from_bytes(f.read(), policy=policy.SMTP)
+            try:
+                self._deliver(message)
+            except (smtplib.SMTPException, OSError) as e:
+                self._disconnect()
+                # ファイル名: <ID>.<試行回数>.eml
+                message_id, attempts = _parse_spool_name(path)
+                attempts += 1
+                if attempts >= self.max_attempts:
+                    failed_path = os.path.join(self.spool_dir, f"{message_id}{FAILED_SUFFIX}")
+                    os.replace(path, failed_path)
+                    logger.error(f"Giving up on spooled mail after {attempts} attempts: {failed_path} ({e})")
+                else:
+                    os.replace(path, os.path.join(self.spool_dir, f"{message_id}.{attempts}{SPOOL_SUFFIX}"))
+                    logger.warning(f"Retry of spooled mail failed ({attempts}/{self.max_attempts}): {e}")
+                continue
+            os.remove(path)
+            sent += 1
+        if sent:
+            logger.info(f"Re-sent {sent} spooled mails")
+        return sent
+
+    async def release(self) -> None:
+        """SMTP接続を閉じる (次の送信で接続し直す)。常駐モードではサイクルごとに呼び出す"""
+        await self._run(self._disconnect)
+
+    async def close(self) -> None:
+        await self.release()
+        self._executor.shutdown(wait=True)
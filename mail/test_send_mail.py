@@ -6,6 +6,8 @@ from email.mime.multipart import MIMEMultipart
 from email.mime.image import MIMEImage
 import yaml
 import os
+
+from .dispatcher import build_message
 # Gmail認証に必要
 # from googleapiclient.discovery import build
 # from httplib2                  import Http
@@ -26,24 +28,7 @@ def send_email(config_file,
                port = 465 # port number
                ):
     # メールの構築
-    message = MIMEMultipart()
-    message["From"] = config_file["gmail"]["account"]
-    message["To"] = receiver_email
-    message["Subject"] = subject
-
-    # メール本文の追加
-    message.attach(MIMEText(body, body_type))
-
-    # 画像を添付
-    for i, image_path in enumerate(image_list):
-        if not image_path:
-            continue
-        file_ext = os.path.splitext(image_path)[1].lower()
-        ext = file_ext[1:]
-        with open(image_path, "rb") as img_file:
-            img = MIMEImage(img_file.read(), _subtype=f'{ext}')
-            img.add_header("Content-ID", f"<image_{i}>")
-            message.attach(img)
+    message = build_message(config_file["gmail"]["account"], receiver_email, body, body_type, image_list, subject)
 
     # SMTPサーバーの設定
     smtp_server = smtp_server
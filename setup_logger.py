@@ -1,8 +1,11 @@
+import atexit
 import logging
 import copy
+import queue
 import sys
 import os
-from logging.handlers import RotatingFileHandler
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 # # カスタムログレベルを追加
 # NOTICE_LEVEL = logging.INFO + 2
@@ -43,6 +46,78 @@ class ColoredFormatter(logging.Formatter):
         colored_record.levelname = f"{seq}{levelname}{self.COLORS['RESET']}"
         return super().format(colored_record)
 
+# すべてのモジュールのロガーが共有するログファイル (プロセスごとに新しいファイルは作らず、サイズでローテーションする)
+DEFAULT_LOG_FILE = "./log/web-chk.log"
+# ファイルに書き出すレベル (DEBUG にするとノードの全情報などの大きなメッセージも組み立てるため、調査時のみ)
+DEFAULT_FILE_LEVEL = "INFO"
+
+LOG_FORMAT = "[%(filename)s:%(lineno)d %(funcName)s]%(asctime)s[%(levelname)s] - %(message)s"
+DATE_FORMAT = "%H:%M:%S"
+
+# ロガーはレコードをキューに入れるだけで、出力 (標準出力・ファイル書き込み) はリスナーのスレッドで行う
+_log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+_queue_handler = QueueHandler(_log_queue)
+_queue_handler.setLevel(logging.INFO)
+_stream_handler: logging.Handler = None
+_file_handlers: dict = {}
+_listener: QueueListener = None
+_loggers: dict = {}
+_lock = threading.Lock()
+
+
+def _level_of(level: str) -> int:
+    return getattr(logging, str(level).upper(), logging.INFO)
+
+
+def _restart_listener() -> None:
+    """共有ハンドラーの構成が変わったときにリスナーを作り直す (キューに残ったレコードは停止時に書き出される)"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+    handlers = [h for h in [_stream_handler, *_file_handlers.values()] if h is not None]
+    # 出力先のいずれかが受け付けるレベルのレコードだけを作成する。
+    # ロガー自体のレベルも揃えるため、無効なレベルの呼び出しはレコードもメッセージも作らずに戻る
+    min_level = min((h.level for h in handlers), default=logging.INFO)
+    _queue_handler.setLevel(min_level)
+    for logger in _loggers.values():
+        logger.setLevel(min_level)
+    _listener = QueueListener(_log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def set_file_log_level(level: str) -> None:
+    """ファイル出力のレベルを変更する (config.yaml の logging.file_level)"""
+    with _lock:
+        for handler in _file_handlers.values():
+            handler.setLevel(_level_of(level))
+        if _listener is not None:
+            _restart_listener()
+
+
+def flush_logging() -> None:
+    """キューに溜まっているログをすべて書き出す"""
+    with _lock:
+        if _listener is not None:
+            _restart_listener()
+
+
+def shutdown_logging() -> None:
+    """リスナーを止めてキューを書き出し、ファイルを閉じる (終了時に自動で呼び出される)"""
+    global _listener, _stream_handler
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+        for handler in [_stream_handler, *_file_handlers.values()]:
+            if handler is not None:
+                handler.close()
+        _stream_handler = None
+        _file_handlers.clear()
+
+
+atexit.register(shutdown_logging)
+
+
 def setup_logger(
     name: str ,
     level: str = "INFO",
@@ -50,11 +125,16 @@ def setup_logger(
     log_file: str = None,
     max_bytes: int = 10 * 1024 * 1024,  # 10MB
     backup_count: int = 5,
+    file_level: str = DEFAULT_FILE_LEVEL,
     # custom_levels: dict = None,
 ) -> logging.Logger:
     """
     汎用的なロガー設定関数
 
+    すべてのロガーは1つの QueueHandler を共有し、標準出力とファイルへの出力は
+    バックグラウンドのスレッド (QueueListener) で行う。
+    ファイルハンドラーは同じパスにつき1つだけ作成し、すべてのロガーの出力を書き込む。
+
     Args:
         name (str): ロガー名 (デフォルト: "DefaultLogger")
         level (str): ログレベル (デフォルト: "INFO")
@@ -62,11 +142,13 @@ def setup_logger(
         log_file (str, optional): ファイル出力のパス (デフォルト: None)
         max_bytes (int, optional): 1ファイルの最大サイズ (デフォルト: 10MB)
         backup_count (int, optional): ログの世代数 (デフォルト: 5)
+        file_level (str, optional): ファイルに書き出すレベル (デフォルト: "INFO")。そのパスのファイルを最初に開くときに使う
         # custom_levels (dict, optional): カスタムログレベルの追加 (例: {"STATUS": logging.INFO + 5})
 
     Returns:
         logging.Logger: 設定済みのロガー
     """
+    global _stream_handler
     logger = logging.getLogger(name)
     logger.propagate = False
 
@@ -77,35 +159,36 @@ def setup_logger(
 
     # 文字列のログレベルを数値に変換
     level = getattr(logging, level.upper(), logging.DEBUG)
-    logger.setLevel(logging.DEBUG)
-
-    # すでにハンドラーがある場合は再設定しない
-    if logger.handlers:
-        return logger
-
-    # フォーマット設定
-    log_format = "[%(filename)s:%(lineno)d %(funcName)s]%(asctime)s[%(levelname)s] - %(message)s"
-    date_format = "%H:%M:%S"
-
-    # 標準出力のハンドラー
-    stream_handler = logging.StreamHandler(sys.stdout)
-    formatter = ColoredFormatter(log_format, datefmt=date_format) if use_colors else logging.Formatter(log_format, datefmt=date_format)
-    stream_handler.setFormatter(formatter)
-
-    stream_handler.setLevel(logging.INFO)
-
-    logger.addHandler(stream_handler)
-
-    # ファイル出力を追加（必要な場合）
-    if log_file:
-        log_file = os.path.abspath(log_file)
-        log_dir = os.path.dirname(log_file)
-        os.makedirs(log_dir, exist_ok=True)  # ディレクトリ作成
-        file_handler = RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
-        file_handler.setFormatter(logging.Formatter(log_format, datefmt=date_format))
-
-        file_handler.setLevel(logging.DEBUG)
 
-        logger.addHandler(file_handler)
+    with _lock:
+        changed = _listener is None
+        _loggers[name] = logger
+        logger.setLevel(_queue_handler.level)
+
+        # 標準出力のハンドラー (最初の呼び出しの設定で1つだけ作成する)
+        if _stream_handler is None:
+            _stream_handler = logging.StreamHandler(sys.stdout)
+            formatter = ColoredFormatter(LOG_FORMAT, datefmt=DATE_FORMAT) if use_colors else logging.Formatter(LOG_FORMAT, datefmt=DATE_FORMAT)
+            _stream_handler.setFormatter(formatter)
+            _stream_handler.setLevel(logging.INFO)
+            changed = True
+
+        # ファイル出力を追加（必要な場合）
+        if log_file:
+            log_file = os.path.abspath(log_file)
+            if log_file not in _file_handlers:
+                log_dir = os.path.dirname(log_file)
+                os.makedirs(log_dir, exist_ok=True)  # ディレクトリ作成
+                file_handler = RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+                file_handler.setFormatter(logging.Formatter(LOG_FORMAT, datefmt=DATE_FORMAT))
+                file_handler.setLevel(_level_of(file_level))
+                _file_handlers[log_file] = file_handler
+                changed = True
+
+        if changed:
+            _restart_listener()
+
+        if _queue_handler not in logger.handlers:
+            logger.addHandler(_queue_handler)
 
     return logger
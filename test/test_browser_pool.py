@@ -0,0 +1,119 @@
+import pytest
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+from content_extractor.browser_pool import BrowserPool
+from content_extractor.dom_treeSt import DOMTreeSt
+
+# =================================================================
+# browser_pool.py のテスト
+# =================================================================
+
+@pytest.fixture
+def mock_playwright(mocker):
+    """async_playwright() をモック化し、launchごとに新しいブラウザモックを返す。"""
+    playwright = MagicMock()
+
+    def _new_browser(*args, **kwargs):
+        browser = AsyncMock()
+        browser.is_connected = MagicMock(return_value=True)
+        return browser
+
+    playwright.chromium.launch = AsyncMock(side_effect=_new_browser)
+
+    playwright_cm = MagicMock()
+    playwright_cm.start = AsyncMock(return_value=playwright)
+    playwright_cm.__aexit__ = AsyncMock(return_value=None)
+    mocker.patch('content_extractor.browser_pool.async_playwright', return_value=playwright_cm)
+    return playwright
+
+
+@pytest.mark.asyncio
+async def test_browser_is_launched_lazily_and_reused(mock_playwright):
+    """ブラウザは初回貸し出し時にのみ起動され、以降は再利用される。"""
+    async with BrowserPool(size=1, max_pages_per_browser=10) as pool:
+        assert mock_playwright.chromium.launch.await_count == 0
+
+        async with pool.acquire() as first:
+            pass
+        async with pool.acquire() as second:
+            pass
+
+    assert first is second
+    assert mock_playwright.chromium.launch.await_count == 1
+    first.close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_browser_is_recycled_after_max_pages(mock_playwright):
+    """max_pages_per_browser回利用されたブラウザは次回の貸し出しで再起動される。"""
+    async with BrowserPool(size=1, max_pages_per_browser=2) as pool:
+        browsers = []
+        for _ in range(3):
+            async with pool.acquire() as browser:
+                browsers.append(browser)
+
+    assert browsers[0] is browsers[1]
+    assert browsers[2] is not browsers[0]
+    browsers[0].close.assert_awaited_once()
+    assert pool.launch_count == 2
+
+
+@pytest.mark.asyncio
+async def test_disconnected_browser_is_relaunched(mock_playwright):
+    """クラッシュ等で切断されたブラウザは再起動される。"""
+    async with BrowserPool(size=1) as pool:
+        async with pool.acquire() as crashed:
+            crashed.is_connected.return_value = False
+        async with pool.acquire() as relaunched:
+            pass
+
+    assert relaunched is not crashed
+    assert mock_playwright.chromium.launch.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_acquire_waits_for_free_slot(mock_playwright):
+    """プールサイズを超える同時貸し出しは、返却されるまで待機する。"""
+    in_use = 0
+    max_in_use = 0
+
+    async with BrowserPool(size=2) as pool:
+        async def worker():
+            nonlocal in_use, max_in_use
+            async with pool.acquire():
+                in_use += 1
+                max_in_use = max(max_in_use, in_use)
+                await asyncio.sleep(0.01)
+                in_use -= 1
+
+        await asyncio.gather(*(worker() for _ in range(6)))
+
+    assert max_in_use == 2
+    assert mock_playwright.chromium.launch.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_acquire_before_start_raises():
+    pool = BrowserPool(size=1)
+    with pytest.raises(RuntimeError):
+        async with pool.acquire():
+            pass
+
+
+@pytest.mark.asyncio
+async def test_run_full_scan_uses_pooled_browser(mocker, mock_playwright):
+    """run_full_scanがプールのブラウザでextract_main_contentを呼び出す。"""
+    from content_extractor.core import run_full_scan
+
+    expected = DOMTreeSt(tag='div')
+    mock_extract = mocker.patch('content_extractor.core.extract_main_content', new_callable=AsyncMock, return_value=expected)
+
+    async with BrowserPool(size=1) as pool:
+        result = await run_full_scan("http://example.com", pool, arg_webtype="plane")
+        result_again = await run_full_scan("http://example.com", pool)
+
+    assert result is expected and result_again is expected
+    assert mock_playwright.chromium.launch.await_count == 1
+    browser = mock_extract.call_args_list[0].args[1]
+    assert mock_extract.call_args_list[1].args[1] is browser
@@ -0,0 +1,82 @@
+import pytest
+import math
+from datetime import datetime, timedelta, timezone
+
+from utils.change_rate import (
+    ChangeRatePolicy,
+    SECONDS_PER_DAY,
+    change_probability,
+    estimate_change_rate,
+)
+
+# =================================================================
+# change_rate.py のテスト
+# =================================================================
+
+NOW = datetime(2025, 1, 8, tzinfo=timezone.utc)
+
+
+def test_estimate_change_rate_prior_only():
+    """履歴がない場合は事前分布 (1日1回) の変化率になる。"""
+    assert estimate_change_rate(0, 0) * SECONDS_PER_DAY == pytest.approx(1.0)
+
+def test_estimate_change_rate_converges_to_observed_rate():
+    # 70日間で10回 (週1回) 変化したURL
+    rate_per_day = estimate_change_rate(10, 70 * SECONDS_PER_DAY) * SECONDS_PER_DAY
+    assert rate_per_day == pytest.approx(11 / 71)
+
+def test_change_probability():
+    assert change_probability(0.0, 1000) == 0.0
+    assert change_probability(1 / SECONDS_PER_DAY, SECONDS_PER_DAY) == pytest.approx(1 - 2.718281828 ** -1)
+    assert change_probability(1.0, -5) == 0.0
+
+
+def test_policy_checks_never_checked_url():
+    decision = ChangeRatePolicy().decide(None, 0, 0, now=NOW)
+    assert decision.check
+    assert decision.reason == "never checked"
+
+def test_policy_skips_rarely_changing_url():
+    """週1回程度しか変化しないURLを1時間後に再確認する必要はない。"""
+    policy = ChangeRatePolicy(threshold=0.1, max_staleness_hours=24)
+    decision = policy.decide(NOW - timedelta(hours=1), change_count=10, observed_seconds=70 * SECONDS_PER_DAY, now=NOW)
+
+    assert not decision.check
+    assert decision.probability < 0.1
+    assert decision.elapsed_hours == pytest.approx(1.0)
+
+def test_policy_checks_frequently_changing_url():
+    policy = ChangeRatePolicy(threshold=0.1, max_staleness_hours=24)
+    decision = policy.decide(NOW - timedelta(hours=1), change_count=60, observed_seconds=10 * SECONDS_PER_DAY, now=NOW)
+    assert decision.check
+
+def test_policy_max_staleness_guarantee():
+    """変化しないURLでも max_staleness_hours を超えたら必ず確認する。"""
+    policy = ChangeRatePolicy(threshold=0.99, max_staleness_hours=24)
+    decision = policy.decide(NOW - timedelta(hours=25), change_count=0, observed_seconds=365 * SECONDS_PER_DAY, now=NOW)
+
+    assert decision.check
+    assert decision.reason.startswith("max staleness")
+
+def test_policy_disabled_always_checks():
+    policy = ChangeRatePolicy(enabled=False)
+    assert policy.decide(NOW, 0, 365 * SECONDS_PER_DAY, now=NOW).check
+
+def test_policy_from_config():
+    policy = ChangeRatePolicy.from_config({
+        "enabled": False,
+        "change_probability_threshold": 0.2,
+        "max_staleness_hours": 48,
+        "prior_changes": 2,
+        "prior_days": 7,
+    })
+    assert policy == ChangeRatePolicy(False, 0.2, 48, 2, 7 * SECONDS_PER_DAY)
+    assert ChangeRatePolicy.from_config(None) == ChangeRatePolicy()
+
+def test_next_check_delay():
+    policy = ChangeRatePolicy(threshold=0.1, max_staleness_hours=24)
+    # 週1回変化するURLは、変化確率が 0.1 に達するまで約16時間
+    delay = policy.next_check_delay(change_count=1000, observed_seconds=7000 * SECONDS_PER_DAY)
+    assert delay / 3600 == pytest.approx(-math.log(0.9) * 7 * 24, rel=1e-2)
+    # 変化しないURLでも max_staleness_hours を超えない
+    assert policy.next_check_delay(0, 10_000 * SECONDS_PER_DAY) == 24 * 3600
@@ -1,9 +1,13 @@
 import pytest
-from unittest.mock import MagicMock, AsyncMock, patch
+from unittest.mock import MagicMock, AsyncMock, patch, ANY, call
 import sys
 
 from content_extractor.dom_treeSt import DOMTreeSt, BoundingBox
-from content_extractor.core import extract_main_content
+from content_extractor.core import extract_main_content, quick_extract_content
+from content_extractor.playwright_helpers import SelectorProbeResult
+from content_extractor.tree_index import TreeIndex
+from utils.scan_metrics import ScanMetrics
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 
 # =================================================================
 # core.py のテスト
@@ -106,11 +110,55 @@ async def test_extract_main_content_refinement_loop(mocker, mock_browser, dom_tr
 
     # モックの呼び出し回数などを検証
     assert mock_rescore.call_count == 3
-    mock_rescore.assert_any_call(wrapper_node)
-    mock_rescore.assert_any_call(article_node)
+    mock_rescore.assert_any_call(wrapper_node, ANY)
+    mock_rescore.assert_any_call(article_node, ANY)
     
     # 3回目の呼び出しは、2回目の勝者であるp_nodeに対して行われる
-    mock_rescore.assert_any_call(p_node)
+    mock_rescore.assert_any_call(p_node, ANY)
+
+    # 再評価には同じ先行順インデックスが使い回される
+    indexes = {id(c.args[1]) for c in mock_rescore.call_args_list}
+    assert len(indexes) == 1
+    assert isinstance(mock_rescore.call_args_list[0].args[1], TreeIndex)
+
+
+@pytest.mark.asyncio
+async def test_extract_main_content_records_stage_spans(mocker, mock_browser, dom_tree_fixture):
+    """スキャンの計測中は、Fullスキャンの各段階の所要時間がURLごとに記録される"""
+    mocker.patch('content_extractor.core.fetch_robots_txt', new_callable=AsyncMock, return_value=None)
+    mocker.patch('content_extractor.core.setup_page', new_callable=AsyncMock, return_value=AsyncMock())
+    mocker.patch('content_extractor.core.adjust_page_view', new_callable=AsyncMock, return_value={'width': 1920, 'height': 1080})
+    mocker.patch('content_extractor.core.make_tree', new_callable=AsyncMock, return_value=dom_tree_fixture[0])
+    mocker.patch('content_extractor.core.save_json')
+    wrapper_node = dom_tree_fixture[0].children[0]
+    mocker.patch('content_extractor.core.MainContentScorer').return_value.find_candidates.return_value = [wrapper_node]
+    mocker.patch('content_extractor.core.rescore_main_content_with_children', return_value=[])
+
+    metrics = ScanMetrics()
+    with metrics.scan("http://mock.url"):
+        assert await extract_main_content(url="http://mock.url", browser=mock_browser) is not None
+
+    stages = metrics.urls["http://mock.url"].stages
+    assert {"total", "robots", "adjust_page_view", "make_tree", "find_candidates", "rescore", "save_json"} <= set(stages)
+
+
+@pytest.mark.asyncio
+async def test_extract_main_content_does_not_wait_for_networkidle(mocker, mock_browser, dom_tree_fixture):
+    """ページの静止は settle_page で待機済みのため、ツリーの取得では networkidle を待たない"""
+    mocker.patch('content_extractor.core.fetch_robots_txt', new_callable=AsyncMock, return_value=None)
+    mock_page = AsyncMock()
+    mocker.patch('content_extractor.core.setup_page', new_callable=AsyncMock, return_value=mock_page)
+    mocker.patch('content_extractor.core.adjust_page_view', new_callable=AsyncMock, return_value={'width': 1920, 'height': 1080})
+    mock_make_tree = mocker.patch('content_extractor.core.make_tree', new_callable=AsyncMock, return_value=dom_tree_fixture[0])
+    mocker.patch('content_extractor.core.save_json')
+    wrapper_node = dom_tree_fixture[0].children[0]
+    mocker.patch('content_extractor.core.MainContentScorer').return_value.find_candidates.return_value = [wrapper_node]
+    mocker.patch('content_extractor.core.rescore_main_content_with_children', return_value=[])
+
+    assert await extract_main_content(url="http://mock.url", browser=mock_browser) is not None
+
+    mock_make_tree.assert_awaited_once_with(mock_page, wait_for_load=False)
+    mock_page.wait_for_load_state.assert_not_called()
 
 
 @pytest.mark.asyncio
@@ -123,6 +171,21 @@ async def test_extract_main_content_robots_disallowed(mocker, mock_browser):
     
     assert result is None
 
+@pytest.mark.asyncio
+async def test_extract_main_content_uses_robots_cache(mocker, mock_browser):
+    """robots_cache を渡した場合はrobots.txtを取得し直さず、キャッシュで確認する。"""
+    mock_fetch = mocker.patch('content_extractor.core.fetch_robots_txt', new_callable=AsyncMock)
+    mock_setup_page = mocker.patch('content_extractor.core.setup_page', new_callable=AsyncMock)
+    robots_cache = MagicMock()
+    robots_cache.can_fetch = AsyncMock(return_value=False)
+
+    result = await extract_main_content(url="http://mock.url/some/path", browser=mock_browser, robots_cache=robots_cache)
+
+    assert result is None
+    robots_cache.can_fetch.assert_awaited_once_with("http://mock.url/some/path")
+    mock_fetch.assert_not_called()
+    mock_setup_page.assert_not_called()
+
 @pytest.mark.asyncio
 async def test_extract_main_content_setup_page_fails(mocker, mock_browser):
     """Test that extract_main_content returns None if setup_page fails."""
@@ -168,8 +231,8 @@ async def test_extract_main_content_no_candidates(mocker, mock_browser, dom_tree
 @pytest.mark.asyncio
 async def test_extract_main_content_recursive_call(mocker, mock_browser, dom_tree_fixture):
     """Test that extract_main_content calls itself recursively if a new watch_url is found."""
-    # This test checks recursion by asserting that a dependency (`setup_page`) is called
-    # with the new URL during the recursive call.
+    # The recursive call must reuse the already loaded page: it navigates that page to the new URL
+    # instead of calling `setup_page` (a new context) again.
 
     # Mock dependencies
     mocker.patch('content_extractor.core.fetch_robots_txt', new_callable=AsyncMock, return_value=None)
@@ -200,14 +263,17 @@ async def test_extract_main_content_recursive_call(mocker, mock_browser, dom_tre
     await extract_main_content(url="http://mock.url/page/1", browser=mock_browser)
 
     # --- Assertions ---
-    assert mock_setup_page.call_count == 2
-    
-    # Check that setup_page was called with the initial URL, then the new one.
-    first_call_args = mock_setup_page.call_args_list[0].args
-    second_call_args = mock_setup_page.call_args_list[1].args
-    
-    assert first_call_args[0] == "http://mock.url/page/1"
-    assert second_call_args[0] == "http://mock.url/page/2"
+    # 遷移先は新しいコンテキストを作らず、読み込み済みのページで開く
+    assert mock_setup_page.call_count == 1
+    assert mock_setup_page.call_args_list[0].args[0] == "http://mock.url/page/1"
+    page = mock_setup_page.return_value
+    page.goto.assert_awaited_once_with("http://mock.url/page/2", wait_until='domcontentloaded', timeout=10000)
+    # 遷移前にビューポートを新しいコンテキストと同じ大きさに戻す
+    page.set_viewport_size.assert_awaited_once_with({'width': 1920, 'height': 1080})
+    assert page.method_calls.index(call.set_viewport_size({'width': 1920, 'height': 1080})) < \
+        page.method_calls.index(call.goto("http://mock.url/page/2", wait_until='domcontentloaded', timeout=10000))
+    # ページは最初の呼び出しが1度だけ閉じる
+    page.context.close.assert_awaited_once()
 
 @pytest.mark.asyncio
 async def test_extract_main_content_rescore_no_improvement(mocker, mock_browser, dom_tree_fixture):
@@ -292,4 +358,411 @@ async def test_extract_main_content_selector_generation(mocker, mock_browser):
     # `selector_candidates` takes from current_best_children[1:4], so `img_node`'s selector will be picked.
     # Then `final_content.css_selector` is inserted at the front.
     assert final_content.css_selector_list == ['div#main-article > p.content']
-    assert len(final_content.css_selector_list) == 1
\ No newline at end of file
+    assert len(final_content.css_selector_list) == 1
+
+# -----------------------------------------------------------------
+# `quick_extract_content` のセレクタプローブ
+# -----------------------------------------------------------------
+
+@pytest.fixture
+def quick_scan_browser():
+    """new_context().new_page() がページのモックを返すブラウザのモック。"""
+    browser = AsyncMock()
+    context = AsyncMock()
+    page = AsyncMock()
+    browser.new_context.return_value = context
+    context.new_page.return_value = page
+    return browser, context, page
+
+
+@pytest.mark.asyncio
+async def test_quick_extract_skips_stale_selectors_without_waiting(mocker, quick_scan_browser):
+    """古いセレクタを順に待たず、プローブでマッチしたセレクタだけを試す。"""
+    browser, context, page = quick_scan_browser
+    probe = SelectorProbeResult(counts={'div.stale': 0, 'section.old': 0, 'main.content': 1})
+    mock_probe = mocker.patch('content_extractor.core.probe_selectors', new_callable=AsyncMock, return_value=probe)
+    found = DOMTreeSt(tag='main')
+    mock_make_tree = mocker.patch('content_extractor.core.make_tree', new_callable=AsyncMock, return_value=found)
+
+    selectors = ['div.stale', 'section.old', 'main.content']
+    result = await quick_extract_content("http://mock.url", browser, selectors, "plane")
+
+    assert result is found
+    mock_probe.assert_awaited_once()
+    page.wait_for_selector.assert_not_called()
+    # DOMの静止は settle_page で待つため、networkidle は待たない
+    mock_make_tree.assert_awaited_once_with(page, selector='main.content', wait_for_load=False)
+    assert result.css_selector == 'main.content'
+    assert result.css_selector_list == ['main.content', 'div.stale', 'section.old']
+    assert selectors == ['main.content', 'div.stale', 'section.old']
+    context.close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_quick_extract_tries_next_live_selector(mocker, quick_scan_browser):
+    """マッチしたが描画ボックスがないセレクタの次のライブセレクタを試す。"""
+    browser, context, page = quick_scan_browser
+    probe = SelectorProbeResult(counts={'div.hidden': 1, 'div.dead': 0, 'div.visible': 2})
+    mocker.patch('content_extractor.core.probe_selectors', new_callable=AsyncMock, return_value=probe)
+    found = DOMTreeSt(tag='div')
+    mocker.patch('content_extractor.core.make_tree', new_callable=AsyncMock, side_effect=[None, found])
+
+    result = await quick_extract_content("http://mock.url", browser, ['div.hidden', 'div.dead', 'div.visible'], "plane")
+
+    assert result.css_selector == 'div.visible'
+    assert result.css_selector_list == ['div.visible', 'div.hidden', 'div.dead']
+
+
+@pytest.mark.asyncio
+async def test_quick_extract_returns_none_when_no_selector_matches(mocker, quick_scan_browser):
+    browser, context, page = quick_scan_browser
+    probe = SelectorProbeResult(counts={'div.a': 0, 'div.b': 0})
+    mocker.patch('content_extractor.core.probe_selectors', new_callable=AsyncMock, return_value=probe)
+    mock_make_tree = mocker.patch('content_extractor.core.make_tree', new_callable=AsyncMock)
+
+    result = await quick_extract_content("http://mock.url", browser, ['div.a', 'div.b'], "plane")
+
+    assert result is None
+    mock_make_tree.assert_not_called()
+
+
+# -----------------------------------------------------------------
+# `run_quick_scan_with_engine` のエンジン選択
+# -----------------------------------------------------------------
+
+@pytest.mark.asyncio
+async def test_quick_scan_engine_verify_records_match(mocker):
+    """未検証のURLでは両エンジンで取得し、リンク一覧が一致したかを記録する。"""
+    from content_extractor.core import run_quick_scan_with_engine
+
+    static_node = DOMTreeSt(tag='div', links=['http://a/1'])
+    browser_node = DOMTreeSt(tag='div', links=['http://a/1'])
+    mocker.patch('content_extractor.core.static_quick_extract', new_callable=AsyncMock, return_value=static_node)
+    mock_browser_scan = mocker.patch('content_extractor.core.run_quick_scan', new_callable=AsyncMock, return_value=browser_node)
+    engine_selector = MagicMock()
+    engine_selector.choose.return_value = "verify"
+
+    result = await run_quick_scan_with_engine("http://mock.url", MagicMock(), MagicMock(), ['div'], "plane",
+                                              engine_selector=engine_selector)
+
+    assert result is browser_node
+    mock_browser_scan.assert_awaited_once()
+    engine_selector.record.assert_called_once_with("http://mock.url", matched=True)
+
+
+@pytest.mark.asyncio
+async def test_quick_scan_engine_static_skips_browser(mocker):
+    from content_extractor.core import run_quick_scan_with_engine
+
+    static_node = DOMTreeSt(tag='div', links=['http://a/1'])
+    mocker.patch('content_extractor.core.static_quick_extract', new_callable=AsyncMock, return_value=static_node)
+    mock_browser_scan = mocker.patch('content_extractor.core.run_quick_scan', new_callable=AsyncMock)
+    engine_selector = MagicMock()
+    engine_selector.choose.return_value = "static"
+
+    result = await run_quick_scan_with_engine("http://mock.url", MagicMock(), MagicMock(), ['div'], "plane",
+                                              engine_selector=engine_selector)
+
+    assert result is static_node
+    mock_browser_scan.assert_not_called()
+    engine_selector.record.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_quick_scan_engine_static_failure_falls_back(mocker):
+    from content_extractor.core import run_quick_scan_with_engine
+
+    browser_node = DOMTreeSt(tag='div')
+    mocker.patch('content_extractor.core.static_quick_extract', new_callable=AsyncMock, return_value=None)
+    mock_browser_scan = mocker.patch('content_extractor.core.run_quick_scan', new_callable=AsyncMock, return_value=browser_node)
+    engine_selector = MagicMock()
+    engine_selector.choose.return_value = "static"
+
+    result = await run_quick_scan_with_engine("http://mock.url", MagicMock(), MagicMock(), ['div'], "plane",
+                                              engine_selector=engine_selector)
+
+    assert result is browser_node
+    mock_browser_scan.assert_awaited_once()
+    engine_selector.record.assert_called_once_with("http://mock.url", matched=False)
+
+
+@pytest.mark.asyncio
+async def test_quick_scan_engine_page_changer_always_uses_browser(mocker):
+    from content_extractor.core import run_quick_scan_with_engine
+
+    mock_static = mocker.patch('content_extractor.core.static_quick_extract', new_callable=AsyncMock)
+    mocker.patch('content_extractor.core.run_quick_scan', new_callable=AsyncMock, return_value=None)
+    engine_selector = MagicMock()
+
+    await run_quick_scan_with_engine("http://mock.url/page/2", MagicMock(), MagicMock(), ['div'], "page_changer",
+                                     engine_selector=engine_selector)
+
+    mock_static.assert_not_called()
+    engine_selector.choose.assert_not_called()
+
+
+# -----------------------------------------------------------------
+# リソース許可リストによる遮断とフォールバック
+# -----------------------------------------------------------------
+
+@pytest.mark.asyncio
+async def test_quick_extract_falls_back_to_unblocked_load(mocker, quick_scan_browser, tmp_path):
+    """遮断した読み込みでセレクタが見つからない場合、遮断せずに読み込み直して許可リストを無効にする。"""
+    from content_extractor.resource_filter import ResourceAllowlist
+
+    browser, context, page = quick_scan_browser
+    allowlist = ResourceAllowlist(str(tmp_path / "allowlist.json"))
+    allowlist.learn("http://mock.url", ["http://mock.url/app.js"])
+    mocker.patch('content_extractor.core.probe_selectors', new_callable=AsyncMock, side_effect=[
+        SelectorProbeResult(counts={'main.content': 0}),
+        SelectorProbeResult(counts={'main.content': 1}),
+    ])
+    found = DOMTreeSt(tag='main')
+    mocker.patch('content_extractor.core.make_tree', new_callable=AsyncMock, return_value=found)
+
+    result = await quick_extract_content("http://mock.url", browser, ['main.content'], "plane", allowlist)
+
+    assert result is found
+    assert browser.new_context.await_count == 2
+    # 1回目のコンテキストのみにフィルタを設定する
+    context.route.assert_awaited_once()
+    assert allowlist.filter_for("http://mock.url").allowed is None
+
+
+@pytest.mark.asyncio
+async def test_quick_extract_with_allowlist_loads_once_on_success(mocker, quick_scan_browser, tmp_path):
+    from content_extractor.resource_filter import ResourceAllowlist
+
+    browser, context, page = quick_scan_browser
+    allowlist = ResourceAllowlist(str(tmp_path / "allowlist.json"))
+    allowlist.learn("http://mock.url", [])
+    mocker.patch('content_extractor.core.probe_selectors', new_callable=AsyncMock,
+                 return_value=SelectorProbeResult(counts={'main.content': 1}))
+    mocker.patch('content_extractor.core.make_tree', new_callable=AsyncMock, return_value=DOMTreeSt(tag='main'))
+
+    result = await quick_extract_content("http://mock.url", browser, ['main.content'], "plane", allowlist)
+
+    assert result is not None
+    assert browser.new_context.await_count == 1
+    context.route.assert_awaited_once()
+    assert allowlist.filter_for("http://mock.url").allowed == frozenset()
+
+
+@pytest.mark.asyncio
+async def test_extract_main_content_learns_resources(mocker, mock_browser, tmp_path):
+    """Fullスキャンでは記録を有効にしてページを開き、選ばれたメインコンテンツについて許可リストを学習する。"""
+    from content_extractor.resource_filter import ResourceAllowlist
+
+    allowlist = ResourceAllowlist(str(tmp_path / "allowlist.json"))
+    mock_page = AsyncMock()
+    mocker.patch('content_extractor.core.fetch_robots_txt', new_callable=AsyncMock, return_value=None)
+    mock_setup_page = mocker.patch('content_extractor.core.setup_page', new_callable=AsyncMock, return_value=mock_page)
+    mocker.patch('content_extractor.core.adjust_page_view', new_callable=AsyncMock, return_value={'width': 1920, 'height': 1080})
+    mocker.patch('content_extractor.core.save_json')
+    body = DOMTreeSt(tag='body', css_selector='body')
+    main = DOMTreeSt(tag='main', css_selector='main#content', score=10)
+    body.children = [main]
+    mocker.patch('content_extractor.core.make_tree', new_callable=AsyncMock, return_value=body)
+    mock_webtype = MagicMock()
+    mock_webtype.webtype_chk.return_value = "plane"
+    mock_webtype.next_url = None
+    mocker.patch('content_extractor.core.WebTypeCHK', return_value=mock_webtype)
+    mock_scorer = MagicMock()
+    mock_scorer.find_candidates.return_value = [main]
+    mocker.patch('content_extractor.core.MainContentScorer', return_value=mock_scorer)
+    mocker.patch('content_extractor.core.rescore_main_content_with_children', return_value=[])
+    mock_learn = mocker.patch('content_extractor.core.learn_main_content_resources', new_callable=AsyncMock,
+                              return_value=["http://mock.url/app.js?v=1"])
+
+    result = await extract_main_content("http://mock.url", mock_browser, resource_allowlist=allowlist)
+
+    assert result is main
+    assert mock_setup_page.await_args.kwargs["record_resources"] is True
+    mock_learn.assert_awaited_once_with(mock_page, 'main#content')
+    assert allowlist.filter_for("http://mock.url").allowed == frozenset({"http://mock.url/app.js"})
+
+
+@pytest.mark.asyncio
+async def test_quick_extract_waits_for_selector_subtree_to_settle(mocker, quick_scan_browser):
+    """Quickスキャンでは、マッチしたセレクタのサブツリーが静止してからツリーを取得する。"""
+    browser, context, page = quick_scan_browser
+    mocker.patch('content_extractor.core.probe_selectors', new_callable=AsyncMock,
+                 return_value=SelectorProbeResult(counts={'main.content': 1}))
+    mocker.patch('content_extractor.core.make_tree', new_callable=AsyncMock, return_value=DOMTreeSt(tag='main'))
+    mock_settle = mocker.patch('content_extractor.core.settle_page', new_callable=AsyncMock)
+    settler = MagicMock()
+
+    await quick_extract_content("http://mock.url", browser, ['main.content'], "plane", page_settler=settler)
+
+    mock_settle.assert_awaited_once_with(page, "http://mock.url", settler, selector='main.content', stage="quick")
+
+
+# -----------------------------------------------------------------
+# URLごとの制限時間によるキャンセル
+# -----------------------------------------------------------------
+
+@pytest.mark.asyncio
+async def test_extract_main_content_closes_context_when_cancelled(mocker, mock_browser):
+    """制限時間で中断された場合も、setup_page が作成したコンテキストを閉じる。"""
+    import asyncio
+
+    mock_page = AsyncMock()
+    mocker.patch('content_extractor.core.fetch_robots_txt', new_callable=AsyncMock, return_value=None)
+    mocker.patch('content_extractor.core.setup_page', new_callable=AsyncMock, return_value=mock_page)
+
+    async def hang(*args, **kwargs):
+        await asyncio.Event().wait()
+
+    mocker.patch('content_extractor.core.adjust_page_view', side_effect=hang)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(extract_main_content("http://mock.url", mock_browser), timeout=0.05)
+
+    mock_page.context.close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_quick_extract_closes_context_when_cancelled(mocker, quick_scan_browser):
+    import asyncio
+
+    browser, context, page = quick_scan_browser
+
+    async def hang(*args, **kwargs):
+        await asyncio.Event().wait()
+
+    page.goto.side_effect = hang
+
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(quick_extract_content("http://mock.url", browser, ['main'], "plane"), timeout=0.05)
+
+    context.close.assert_awaited_once()
+
+
+# -----------------------------------------------------------------
+# Quickスキャン失敗時のFullスキャンへの引き継ぎ
+# -----------------------------------------------------------------
+
+@pytest.mark.asyncio
+async def test_quick_extract_hands_loaded_page_to_full_scan(mocker, quick_scan_browser):
+    """セレクタが見つからない場合、読み込み済みのページでFullスキャンし、ページを読み込み直さない。"""
+    browser, context, page = quick_scan_browser
+    mocker.patch('content_extractor.core.probe_selectors', new_callable=AsyncMock,
+                 return_value=SelectorProbeResult(counts={'div.gone': 0}))
+    full_result = DOMTreeSt(tag='main', scan_mode='full')
+    mock_full = mocker.patch('content_extractor.core.extract_main_content', new_callable=AsyncMock,
+                             return_value=full_result)
+
+    result = await quick_extract_content("http://mock.url", browser, ['div.gone'], "plane", full_scan_fallback=True)
+
+    assert result is full_result
+    browser.new_context.assert_awaited_once()
+    page.goto.assert_awaited_once()
+    assert mock_full.await_args.kwargs["page"] is page
+    assert mock_full.await_args.kwargs["arg_webtype"] == "plane"
+    context.close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_quick_extract_runs_fresh_full_scan_when_page_load_fails(mocker, quick_scan_browser):
+    browser, context, page = quick_scan_browser
+    page.goto.side_effect = PlaywrightTimeoutError("timeout")
+    mock_full = mocker.patch('content_extractor.core.extract_main_content', new_callable=AsyncMock,
+                             return_value=DOMTreeSt(tag='main', scan_mode='full'))
+
+    result = await quick_extract_content("http://mock.url", browser, ['main'], "plane", full_scan_fallback=True)
+
+    assert result.scan_mode == 'full'
+    mock_full.assert_awaited_once()
+    assert "page" not in mock_full.await_args.kwargs
+
+
+@pytest.mark.asyncio
+async def test_quick_extract_without_fallback_returns_none(mocker, quick_scan_browser):
+    browser, context, page = quick_scan_browser
+    mocker.patch('content_extractor.core.probe_selectors', new_callable=AsyncMock,
+                 return_value=SelectorProbeResult(counts={'div.gone': 0}))
+    mock_full = mocker.patch('content_extractor.core.extract_main_content', new_callable=AsyncMock)
+
+    assert await quick_extract_content("http://mock.url", browser, ['div.gone'], "plane") is None
+    mock_full.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_extract_main_content_reuses_given_page(mocker, mock_browser):
+    """読み込み済みのページを渡した場合は setup_page を呼ばず、ページも閉じない (呼び出し側が閉じる)。"""
+    mock_page = AsyncMock()
+    mocker.patch('content_extractor.core.fetch_robots_txt', new_callable=AsyncMock, return_value=None)
+    mock_setup_page = mocker.patch('content_extractor.core.setup_page', new_callable=AsyncMock)
+    mock_settle = mocker.patch('content_extractor.core.settle_page', new_callable=AsyncMock)
+    mocker.patch('content_extractor.core.adjust_page_view', new_callable=AsyncMock, return_value={'width': 1920, 'height': 1080})
+    mocker.patch('content_extractor.core.make_tree', new_callable=AsyncMock, return_value=None)
+
+    await extract_main_content("http://mock.url", mock_browser, page=mock_page)
+
+    mock_setup_page.assert_not_called()
+    mock_settle.assert_awaited_once()
+    mock_page.context.close.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_quick_extract_calls_result_hook_before_closing_page(mocker, quick_scan_browser):
+    """on_result は抽出した結果と読み込み済みのページで、コンテキストを閉じる前に呼び出す。"""
+    browser, context, page = quick_scan_browser
+    mocker.patch('content_extractor.core.probe_selectors', new_callable=AsyncMock,
+                 return_value=SelectorProbeResult(counts={'main.content': 1}))
+    found = DOMTreeSt(tag='main')
+    mocker.patch('content_extractor.core.make_tree', new_callable=AsyncMock, return_value=found)
+    calls = []
+
+    async def on_result(hook_page, node):
+        calls.append((hook_page, node, context.close.await_count))
+
+    result = await quick_extract_content("http://mock.url", browser, ['main.content'], "plane", on_result=on_result)
+
+    assert result is found
+    assert calls == [(page, found, 0)]
+    context.close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_quick_extract_skips_result_hook_on_blocked_load(mocker, quick_scan_browser, tmp_path):
+    """画像などを遮断して読み込んだページでは on_result を呼ばない。"""
+    from content_extractor.resource_filter import ResourceAllowlist
+
+    browser, context, page = quick_scan_browser
+    mocker.patch('content_extractor.core.probe_selectors', new_callable=AsyncMock,
+                 return_value=SelectorProbeResult(counts={'main.content': 1}))
+    mocker.patch('content_extractor.core.make_tree', new_callable=AsyncMock, return_value=DOMTreeSt(tag='main'))
+    on_result = AsyncMock()
+
+    result = await quick_extract_content("http://mock.url", browser, ['main.content'], "plane",
+                                         ResourceAllowlist(str(tmp_path / "allowlist.json")), on_result=on_result)
+
+    assert result is not None
+    on_result.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_extract_main_content_result_hook_failure_keeps_result(mocker, mock_browser):
+    mock_page = AsyncMock()
+    mocker.patch('content_extractor.core.fetch_robots_txt', new_callable=AsyncMock, return_value=None)
+    mocker.patch('content_extractor.core.setup_page', new_callable=AsyncMock, return_value=mock_page)
+    mocker.patch('content_extractor.core.adjust_page_view', new_callable=AsyncMock, return_value={'width': 1920, 'height': 1080})
+    mocker.patch('content_extractor.core.save_json')
+    main = DOMTreeSt(tag='main', css_selector='main#content', score=10)
+    mocker.patch('content_extractor.core.make_tree', new_callable=AsyncMock, return_value=DOMTreeSt(tag='body'))
+    mock_webtype = MagicMock()
+    mock_webtype.webtype_chk.return_value = "plane"
+    mock_webtype.next_url = None
+    mocker.patch('content_extractor.core.WebTypeCHK', return_value=mock_webtype)
+    mock_scorer = MagicMock()
+    mock_scorer.find_candidates.return_value = [main]
+    mocker.patch('content_extractor.core.MainContentScorer', return_value=mock_scorer)
+    mocker.patch('content_extractor.core.rescore_main_content_with_children', return_value=[])
+    on_result = AsyncMock(side_effect=Exception("screenshot failed"))
+
+    result = await extract_main_content("http://mock.url", mock_browser, on_result=on_result)
+
+    assert result is main
+    on_result.assert_awaited_once_with(mock_page, main)
+    mock_page.context.close.assert_awaited_once()
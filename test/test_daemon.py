@@ -0,0 +1,88 @@
+import pytest
+import json
+import aiohttp
+
+from utils.daemon import DueQueue, DaemonStatus
+
+# =================================================================
+# daemon.py のテスト
+# =================================================================
+
+# --- Tests for DueQueue ---
+
+def test_due_queue_pops_in_due_order():
+    queue = DueQueue()
+    queue.push(0, 30.0)
+    queue.push(1, 10.0)
+    queue.push(2, 20.0)
+
+    assert queue.next_due() == 10.0
+    assert queue.due_count(25.0) == 2
+    assert queue.pop_due(25.0) == [1, 2]
+    assert len(queue) == 1
+    assert queue.pop_due(25.0) == []
+    assert queue.next_due() == 30.0
+
+def test_due_queue_reschedule_replaces_previous_time():
+    queue = DueQueue()
+    queue.push(0, 10.0)
+    queue.push(0, 50.0)
+
+    assert len(queue) == 1
+    assert queue.pop_due(20.0) == []
+    assert queue.next_due() == 50.0
+    assert queue.pop_due(60.0) == [0]
+    assert queue.next_due() is None
+    assert 0 not in queue
+
+def test_due_queue_pop_limit():
+    queue = DueQueue()
+    for index in range(5):
+        queue.push(index, float(index))
+    assert queue.pop_due(10.0, limit=2) == [0, 1]
+    assert len(queue) == 3
+
+
+# --- Tests for DaemonStatus ---
+
+def test_status_snapshot_and_write(tmp_path):
+    queue = DueQueue()
+    queue.push(0, 0.0)
+    queue.push(1, 4_000_000_000.0)
+    path = tmp_path / "status" / "daemon_status.json"
+    status = DaemonStatus(queue, str(path))
+    status.in_flight.add("http://a.example/")
+    status.record_cycle({"targets": 2, "scanned": 1})
+
+    status.write()
+
+    written = json.loads(path.read_text(encoding="utf-8"))
+    assert written["queue_depth"] == 2
+    assert written["due_now"] == 1
+    assert written["in_flight"] == ["http://a.example/"]
+    assert written["in_flight_count"] == 1
+    assert written["cycles"] == 1
+    assert written["last_cycle"] == {"targets": 2, "scanned": 1}
+    assert written["next_due_at"] == "1970-01-01T00:00:00Z"
+
+def test_status_without_path_does_not_write(tmp_path):
+    DaemonStatus(DueQueue()).write()
+    assert list(tmp_path.iterdir()) == []
+
+@pytest.mark.asyncio
+async def test_status_endpoint(unused_tcp_port):
+    queue = DueQueue()
+    queue.push(3, 0.0)
+    status = DaemonStatus(queue)
+    status.state = "running"
+
+    runner = await status.start_server(port=unused_tcp_port)
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f"http://127.0.0.1:{unused_tcp_port}/status") as response:
+                body = await response.json()
+    finally:
+        await runner.cleanup()
+
+    assert body["state"] == "running"
+    assert body["queue_depth"] == 1
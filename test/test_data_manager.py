@@ -0,0 +1,125 @@
+import importlib.util
+import json
+import os
+
+import pytest
+
+from content_extractor.dom_treeSt import DOMTreeSt
+from utils.sqlite_store import open_sqlite_data_manager
+
+# =================================================================
+# web-cheackerV3.py の DataManager (スナップショット + ジャーナル) のテスト
+# =================================================================
+
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "web-cheackerV3.py")
+
+
+@pytest.fixture(scope="module")
+def web_checker():
+    # ファイル名にハイフンを含むため、パスを指定して読み込む
+    spec = importlib.util.spec_from_file_location("web_cheacker_v3", SCRIPT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def json_path(tmp_path):
+    path = tmp_path / "cheacker_url.json"
+    path.write_text(json.dumps([
+        {"url": "http://a.example/", "result_vl": "a0"},
+        {"url": "http://b.example/", "result_vl": "b0"},
+    ]), encoding="utf-8")
+    return str(path)
+
+
+def _journal_path(json_path):
+    return os.path.splitext(json_path)[0] + ".journal.jsonl"
+
+
+def _dom_tree(url, *links):
+    dom_tree = DOMTreeSt(tag="div", links=list(links), css_selector_list=["div#main"])
+    dom_tree.url = url
+    dom_tree.web_type = "plane"
+    return dom_tree
+
+
+def test_replay_after_crash_restores_updates_and_diff(web_checker, json_path):
+    """save_data() の前に終了しても、次回の起動でジャーナルから更新と未通知の差分が戻る"""
+    crashed = web_checker.DataManager(json_path)
+    crashed.update_scan_result(1, _dom_tree("http://b.example/", "http://b.example/new"))
+    new_hash = crashed.df.at[1, "result_vl"]
+
+    restarted = web_checker.DataManager(json_path)
+
+    assert restarted.df.at[1, "result_vl"] == new_hash
+    assert restarted.get_record_as_dict(1)["css_selector_list"] == ["div#main"]
+    assert restarted.chk_diff() == ["http://b.example/"]
+
+
+def test_replayed_baseline_hides_notified_changes(web_checker, json_path):
+    """reset_baseline() 以降に終了した場合は、通知済みの変更を再検出しない"""
+    crashed = web_checker.DataManager(json_path)
+    crashed.update_scan_result(0, _dom_tree("http://a.example/", "http://a.example/1"))
+    crashed.reset_baseline()
+    crashed.update_scan_result(1, _dom_tree("http://b.example/", "http://b.example/1"))
+
+    restarted = web_checker.DataManager(json_path)
+
+    assert restarted.chk_diff() == ["http://b.example/"]
+
+
+def test_compaction_keeps_pending_changes(web_checker, json_path):
+    """ジャーナルをまとめた後も、未通知の変更は次回の起動で差分として検出される"""
+    manager = web_checker.DataManager(json_path)
+    manager.update_scan_result(0, _dom_tree("http://a.example/", "http://a.example/1"))
+    manager.save_data()
+
+    with open(_journal_path(json_path), encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f]
+    assert entries == [{"op": "pending", "result_vl": {"0": "a0"}, "urls": {"0": "http://a.example/"}}]
+
+    restarted = web_checker.DataManager(json_path)
+    assert restarted.df.at[0, "result_vl"] == manager.df.at[0, "result_vl"]
+    assert restarted.chk_diff() == ["http://a.example/"]
+
+
+def test_truncated_last_line_is_skipped(web_checker, json_path):
+    """書き込み途中で終了した最終行は読み飛ばし、それ以前の更新は適用する"""
+    manager = web_checker.DataManager(json_path)
+    manager.record_timeout(0)
+    with open(_journal_path(json_path), "a", encoding="utf-8") as f:
+        f.write('{"op": "set", "index": 1, "url": "http://b.exa')
+
+    restarted = web_checker.DataManager(json_path)
+
+    assert restarted.df.at[0, "timeout_count"] == 1
+    assert restarted.df.at[1, "timeout_count"] == 0
+
+
+def test_entries_for_moved_index_are_skipped(web_checker, json_path):
+    """クラッシュ後にスナップショットが編集され、行番号が別のURLを指す場合は適用しない"""
+    manager = web_checker.DataManager(json_path)
+    manager.update_scan_result(1, _dom_tree("http://b.example/", "http://b.example/1"))
+    # 先頭のURLを削除し、b が行番号 0 に移動する
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump([{"url": "http://b.example/", "result_vl": "b0"},
+                   {"url": "http://c.example/", "result_vl": "c0"}], f)
+
+    restarted = web_checker.DataManager(json_path)
+
+    assert restarted.df.at[1, "url"] == "http://c.example/"
+    assert restarted.df.at[1, "result_vl"] == "c0"
+    assert restarted.chk_diff() == []
+
+
+def test_sqlite_import_includes_journal_updates(web_checker, json_path, tmp_path):
+    """SQLiteへの初回取り込みでは、スナップショットにまとめる前のジャーナルの更新も取り込む"""
+    crashed = web_checker.DataManager(json_path)
+    crashed.update_scan_result(1, _dom_tree("http://b.example/", "http://b.example/new"))
+
+    manager = open_sqlite_data_manager(str(tmp_path / "store.sqlite3"), json_path=json_path,
+                                       prepare_json=lambda path: web_checker.DataManager(path).save_data())
+
+    assert manager.get_record_as_dict(1)["result_vl"] == crashed.df.at[1, "result_vl"]
+    manager.close()
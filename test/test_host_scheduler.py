@@ -0,0 +1,138 @@
+import pytest
+import asyncio
+from collections import defaultdict
+
+from utils.host_scheduler import HostScheduler, HostLimit, host_of
+
+# =================================================================
+# host_scheduler.py のテスト
+# =================================================================
+
+class RecordingHandler:
+    """ホストごとの同時実行数と処理開始時刻を記録するハンドラ。"""
+
+    def __init__(self, duration: float = 0.02):
+        self.duration = duration
+        self.active = defaultdict(int)
+        self.max_active = defaultdict(int)
+        self.total_active = 0
+        self.max_total_active = 0
+        self.starts = defaultdict(list)
+        self.order = []
+
+    async def __call__(self, url: str):
+        host = host_of(url)
+        self.order.append(url)
+        self.starts[host].append(asyncio.get_running_loop().time())
+        self.active[host] += 1
+        self.total_active += 1
+        self.max_active[host] = max(self.max_active[host], self.active[host])
+        self.max_total_active = max(self.max_total_active, self.total_active)
+        await asyncio.sleep(self.duration)
+        self.active[host] -= 1
+        self.total_active -= 1
+
+
+def test_host_of():
+    assert host_of("https://WWW.Example.com:8080/path") == "www.example.com"
+    assert host_of("not a url") == ""
+
+
+def test_limit_for_matches_parent_domain():
+    scheduler = HostScheduler(2, host_limits={"Example.com": HostLimit(3, 0.5)})
+    assert scheduler.limit_for("www.example.com") == HostLimit(3, 0.5)
+    assert scheduler.limit_for("example.com") == HostLimit(3, 0.5)
+    assert scheduler.limit_for("other.org") == scheduler.default_limit
+
+
+def test_from_config():
+    scheduler = HostScheduler.from_config(4, {
+        "per_host_concurrency": 2,
+        "min_interval": 0.2,
+        "hosts": {"slow.example": {"min_interval": 5}, "fast.example": None},
+    })
+    assert scheduler.concurrency == 4
+    assert scheduler.default_limit == HostLimit(2, 0.2)
+    assert scheduler.limit_for("slow.example") == HostLimit(2, 5)
+    assert scheduler.limit_for("fast.example") == HostLimit(2, 0.2)
+
+
+@pytest.mark.asyncio
+async def test_per_host_concurrency_and_global_limit():
+    urls = [f"http://a.example/{i}" for i in range(4)] + [f"http://b.example/{i}" for i in range(4)] \
+        + [f"http://c.example/{i}" for i in range(4)]
+    handler = RecordingHandler()
+
+    await HostScheduler(concurrency=2, per_host_concurrency=1, min_interval=0).run(urls, handler)
+
+    assert sorted(handler.order) == sorted(urls)
+    assert all(value == 1 for value in handler.max_active.values())
+    assert handler.max_total_active == 2
+
+
+@pytest.mark.asyncio
+async def test_hosts_are_interleaved():
+    """同一ホストのURLが連続していても、ホストをまたいで交互に処理される。"""
+    urls = [f"http://a.example/{i}" for i in range(3)] + [f"http://b.example/{i}" for i in range(3)]
+    handler = RecordingHandler(duration=0)
+
+    await HostScheduler(concurrency=1, min_interval=0).run(urls, handler)
+
+    assert [host_of(url) for url in handler.order] == ["a.example", "b.example"] * 3
+
+
+@pytest.mark.asyncio
+async def test_min_interval_between_requests_to_one_host():
+    urls = [f"http://a.example/{i}" for i in range(3)] + ["http://b.example/0"]
+    handler = RecordingHandler(duration=0)
+
+    await HostScheduler(concurrency=4, per_host_concurrency=2, min_interval=0.05).run(urls, handler)
+
+    starts = handler.starts["a.example"]
+    gaps = [later - earlier for earlier, later in zip(starts, starts[1:])]
+    assert all(gap >= 0.045 for gap in gaps)
+    # 間隔待ちのホストがあっても他のホストは待たされない
+    assert handler.starts["b.example"][0] - starts[0] < 0.04
+
+
+@pytest.mark.asyncio
+async def test_handler_errors_do_not_stop_other_items():
+    processed = []
+
+    async def handler(url):
+        if url.endswith("/bad"):
+            raise RuntimeError("boom")
+        processed.append(url)
+
+    urls = ["http://a.example/bad", "http://a.example/ok", "http://b.example/ok"]
+    await HostScheduler(concurrency=2, min_interval=0).run(urls, handler)
+
+    assert sorted(processed) == ["http://a.example/ok", "http://b.example/ok"]
+
+
+@pytest.mark.asyncio
+async def test_run_with_items_and_url_getter():
+    seen = []
+
+    async def handler(item):
+        seen.append(item[0])
+
+    await HostScheduler(concurrency=2, min_interval=0).run(
+        [(0, "http://a.example/"), (1, "http://b.example/")], handler, url_of=lambda item: item[1])
+    await HostScheduler(concurrency=2).run([], handler)
+
+    assert sorted(seen) == [0, 1]
+
+
+@pytest.mark.asyncio
+async def test_priority_defers_low_priority_items():
+    """priority_of の値が大きいアイテム (前回タイムアウトしたURLなど) は後回しにする。"""
+    handler = RecordingHandler(duration=0)
+    urls = ["http://slow.example/1", "http://a.example/1", "http://a.example/slow", "http://a.example/2"]
+    deferred = {"http://slow.example/1", "http://a.example/slow"}
+
+    await HostScheduler(concurrency=1, min_interval=0).run(
+        urls, handler, priority_of=lambda url: 1 if url in deferred else 0)
+
+    assert handler.order[:2] == ["http://a.example/1", "http://a.example/2"]
+    assert set(handler.order[2:]) == deferred
@@ -0,0 +1,150 @@
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from utils.http_precheck import (
+    HttpValidators,
+    is_not_modified,
+    precheck_urls,
+)
+
+# =================================================================
+# http_precheck.py のテスト
+# =================================================================
+
+ETAG = '"v1"'
+LAST_MODIFIED = "Wed, 21 Oct 2015 07:28:00 GMT"
+
+
+@pytest_asyncio.fixture
+async def precheck_server():
+    """ETag / Last-Modified による条件付きGETに応答するテスト用サーバー。"""
+    requests = []
+
+    async def etag_page(request):
+        requests.append(dict(request.headers))
+        if request.headers.get("If-None-Match") == ETAG:
+            return web.Response(status=304, headers={"ETag": ETAG})
+        return web.Response(text="<html>etag</html>", headers={"ETag": ETAG})
+
+    async def last_modified_page(request):
+        requests.append(dict(request.headers))
+        if request.headers.get("If-Modified-Since") == LAST_MODIFIED:
+            return web.Response(status=304)
+        return web.Response(text="<html>lm</html>", headers={"Last-Modified": LAST_MODIFIED})
+
+    async def ignores_conditionals(request):
+        requests.append(dict(request.headers))
+        return web.Response(text="<html>always 200</html>", headers={"ETag": ETAG})
+
+    async def no_validators(request):
+        requests.append(dict(request.headers))
+        return web.Response(text="<html>plain</html>")
+
+    app = web.Application()
+    app.router.add_get("/etag", etag_page)
+    app.router.add_get("/lm", last_modified_page)
+    app.router.add_get("/always", ignores_conditionals)
+    app.router.add_get("/plain", no_validators)
+
+    server = TestServer(app)
+    await server.start_server()
+    server.requests = requests
+    yield server
+    await server.close()
+
+
+# --- Tests for HttpValidators ---
+
+def test_validators_record_round_trip():
+    validators = HttpValidators(etag=ETAG, last_modified=LAST_MODIFIED, content_length="120")
+    assert HttpValidators.from_record(validators.to_record()) == validators
+
+def test_validators_from_record_handles_missing_and_numeric_values():
+    validators = HttpValidators.from_record({"etag": None, "content_length": 120})
+    assert validators == HttpValidators(etag="", last_modified="", content_length="120")
+    assert not validators.is_empty()
+    assert HttpValidators.from_record({}).is_empty()
+
+def test_conditional_headers():
+    assert HttpValidators().conditional_headers() == {}
+    assert HttpValidators(etag=ETAG, last_modified=LAST_MODIFIED).conditional_headers() == {
+        "If-None-Match": ETAG,
+        "If-Modified-Since": LAST_MODIFIED,
+    }
+
+
+# --- Tests for is_not_modified ---
+
+@pytest.mark.parametrize("status, stored, current, trust_length, expected", [
+    (304, HttpValidators(), HttpValidators(), False, True),
+    (200, HttpValidators(etag=ETAG), HttpValidators(etag=ETAG), False, True),
+    (200, HttpValidators(etag=ETAG), HttpValidators(etag='"v2"'), False, False),
+    (200, HttpValidators(last_modified=LAST_MODIFIED), HttpValidators(last_modified=LAST_MODIFIED), False, True),
+    (200, HttpValidators(content_length="10"), HttpValidators(content_length="10"), False, False),
+    (200, HttpValidators(content_length="10"), HttpValidators(content_length="10"), True, True),
+    (200, HttpValidators(), HttpValidators(etag=ETAG), False, False),
+    (404, HttpValidators(etag=ETAG), HttpValidators(etag=ETAG), False, False),
+])
+def test_is_not_modified(status, stored, current, trust_length, expected):
+    assert is_not_modified(status, stored, current, trust_length) is expected
+
+
+# --- Tests for precheck_urls ---
+
+@pytest.mark.asyncio
+async def test_precheck_detects_not_modified(precheck_server):
+    etag_url = str(precheck_server.make_url("/etag"))
+    lm_url = str(precheck_server.make_url("/lm"))
+
+    results = await precheck_urls([
+        (etag_url, HttpValidators(etag=ETAG)),
+        (lm_url, HttpValidators(last_modified=LAST_MODIFIED)),
+    ], concurrency=2)
+
+    assert results[etag_url].not_modified and results[etag_url].status == 304
+    assert results[etag_url].validators.etag == ETAG
+    assert results[lm_url].not_modified
+    # 304 で省略されたヘッダは前回の値を引き継ぐ
+    assert results[lm_url].validators.last_modified == LAST_MODIFIED
+
+@pytest.mark.asyncio
+async def test_precheck_first_run_collects_validators(precheck_server):
+    """検証用ヘッダが未保存のURLは「変更あり」となり、今回のヘッダが返される。"""
+    url = str(precheck_server.make_url("/etag"))
+
+    results = await precheck_urls([(url, HttpValidators())])
+
+    assert not results[url].not_modified
+    assert results[url].status == 200
+    assert results[url].validators.etag == ETAG
+    assert "If-None-Match" not in precheck_server.requests[-1]
+
+@pytest.mark.asyncio
+async def test_precheck_server_ignoring_conditionals(precheck_server):
+    url = str(precheck_server.make_url("/always"))
+    results = await precheck_urls([(url, HttpValidators(etag=ETAG))])
+    assert results[url].not_modified and results[url].status == 200
+
+@pytest.mark.asyncio
+async def test_precheck_without_validators_is_modified(precheck_server):
+    url = str(precheck_server.make_url("/plain"))
+    results = await precheck_urls([(url, HttpValidators(content_length="18"))])
+    assert not results[url].not_modified
+    assert results[url].validators.content_length == "18"
+
+@pytest.mark.asyncio
+async def test_precheck_connection_error_is_treated_as_modified():
+    url = "http://127.0.0.1:9/unreachable"
+    stored = HttpValidators(etag=ETAG)
+
+    results = await precheck_urls([(url, stored)], timeout=2)
+
+    assert not results[url].not_modified
+    assert results[url].error
+    assert results[url].validators == stored
+
+@pytest.mark.asyncio
+async def test_precheck_empty_targets():
+    assert await precheck_urls([]) == {}
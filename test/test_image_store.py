@@ -0,0 +1,92 @@
+import json
+import os
+
+from utils.image_store import ImageStore
+
+
+def _write(path, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    return str(path)
+
+
+def _store(tmp_path, **kwargs):
+    return ImageStore(str(tmp_path / "images"), str(tmp_path / "image_store.json"), **kwargs)
+
+
+def test_put_moves_image_to_content_addressed_object(tmp_path):
+    store = _store(tmp_path)
+    staged = _write(tmp_path / "temp" / "example_com_page.webp", b"image-a")
+
+    object_path = store.put("https://a/page", staged)
+
+    name = os.path.basename(object_path)
+    assert name.endswith(".webp") and len(name) == 64 + len(".webp")
+    assert os.path.dirname(object_path) == str(tmp_path / "images")
+    assert not os.path.exists(staged)
+    with open(object_path, "rb") as f:
+        assert f.read() == b"image-a"
+    assert store.latest("https://a/page") == object_path
+
+
+def test_identical_captures_are_deduplicated(tmp_path):
+    store = _store(tmp_path)
+    first = store.put("https://a/page", _write(tmp_path / "temp" / "1.png", b"same"))
+    second = store.put("https://a/page", _write(tmp_path / "temp" / "2.png", b"same"))
+    other_url = store.put("https://b/page", _write(tmp_path / "temp" / "3.png", b"same"))
+
+    assert first == second == other_url
+    assert len(os.listdir(tmp_path / "images")) == 1
+    assert len(store.history["https://a/page"]) == 1
+
+
+def test_gc_keeps_last_n_per_url_and_removes_unreferenced(tmp_path):
+    store = _store(tmp_path, keep_per_url=2)
+    paths = [store.put("https://a/page", _write(tmp_path / "temp" / f"{i}.png", f"image-{i}".encode()))
+             for i in range(4)]
+    legacy = _write(tmp_path / "images" / "a_page_1234.png", b"legacy")
+
+    result = store.gc()
+    store.save()
+
+    assert result["removed"] == 2
+    assert [os.path.exists(path) for path in paths] == [False, False, True, True]
+    assert os.path.exists(legacy)  # 以前のファイル名規則の画像は削除しない
+    index = json.loads((tmp_path / "image_store.json").read_text(encoding="utf-8"))
+    assert [entry["object"] for entry in index["urls"]["https://a/page"]] == [os.path.basename(p) for p in paths[2:]]
+
+
+def test_gc_enforces_byte_cap_but_keeps_latest_per_url(tmp_path):
+    store = _store(tmp_path, keep_per_url=5, max_bytes=25)
+    a_old = store.put("https://a/page", _write(tmp_path / "temp" / "a1.png", b"a" * 10))
+    b_old = store.put("https://b/page", _write(tmp_path / "temp" / "b1.png", b"b" * 10))
+    a_new = store.put("https://a/page", _write(tmp_path / "temp" / "a2.png", b"A" * 10))
+    b_new = store.put("https://b/page", _write(tmp_path / "temp" / "b2.png", b"B" * 10))
+    # 保存日時の順序を固定する
+    store.history["https://a/page"][0]["stored"] = "2024-01-01T00:00:00Z"
+    store.history["https://b/page"][0]["stored"] = "2024-01-02T00:00:00Z"
+
+    result = store.gc()
+
+    assert result["bytes"] == 20
+    assert not os.path.exists(a_old) and not os.path.exists(b_old)
+    assert os.path.exists(a_new) and os.path.exists(b_new)
+
+
+def test_put_records_context_shot_with_the_main_image(tmp_path):
+    store = _store(tmp_path, keep_per_url=1)
+    store.put("https://a/page", _write(tmp_path / "temp" / "1.png", b"main-1"),
+              context_path=_write(tmp_path / "temp" / "1_context.png", b"context-1"))
+    store.put("https://a/page", _write(tmp_path / "temp" / "2.png", b"main-2"),
+              context_path=_write(tmp_path / "temp" / "2_context.png", b"context-2"))
+
+    store.gc()
+
+    entry = store.history["https://a/page"][-1]
+    assert sorted(os.listdir(tmp_path / "images")) == sorted([entry["object"], entry["context"]])
+
+
+def test_broken_index_is_ignored(tmp_path):
+    (tmp_path / "image_store.json").write_text("{broken", encoding="utf-8")
+    assert _store(tmp_path).history == {}
@@ -0,0 +1,153 @@
+import os
+import smtplib
+import socket
+
+import pytest
+
+from mail.dispatcher import NotificationDispatcher, SmtpSettings, build_message
+
+
+class FakeSMTP:
+    """接続とコマンドを記録する smtplib.SMTP の代わり。fail_sends 回目までの送信は失敗する"""
+
+    connections = []
+
+    def __init__(self, host, port, timeout=None, fail_sends=0):
+        self.host = host
+        self.port = port
+        self.calls = []
+        self.sent = []
+        self.fail_sends = fail_sends
+        FakeSMTP.connections.append(self)
+
+    def ehlo(self):
+        self.calls.append("ehlo")
+
+    def starttls(self, context=None):
+        self.calls.append("starttls")
+
+    def login(self, user, password):
+        self.calls.append("login")
+
+    def send_message(self, message):
+        if self.fail_sends:
+            self.fail_sends -= 1
+            raise smtplib.SMTPServerDisconnected("connection lost")
+        self.sent.append(message)
+
+    def quit(self):
+        self.calls.append("quit")
+
+    def close(self):
+        self.calls.append("close")
+
+
+@pytest.fixture(autouse=True)
+def reset_connections():
+    FakeSMTP.connections = []
+
+
+def _settings(**kwargs):
+    return SmtpSettings(account="sender@example.com", password="secret", **kwargs)
+
+
+def _message(subject="update"):
+    return build_message("sender@example.com", "receiver@example.com", "<p>body</p>", "html", subject=subject)
+
+
+def test_smtp_settings_from_config():
+    settings = SmtpSettings.from_config(
+        {"gmail": {"account": "a@example.com", "password": "pw"}},
+        {"host": "localhost", "port": "8025", "starttls": False},
+    )
+    assert (settings.account, settings.host, settings.port, settings.starttls) == ("a@example.com", "localhost", 8025, False)
+
+
+@pytest.mark.asyncio
+async def test_one_connection_is_reused_for_the_run(tmp_path):
+    async with NotificationDispatcher(_settings(), str(tmp_path / "spool"), smtp_factory=FakeSMTP) as dispatcher:
+        assert await dispatcher.send(_message("update")) is True
+        assert await dispatcher.send(_message("error")) is True
+
+    assert len(FakeSMTP.connections) == 1
+    smtp = FakeSMTP.connections[0]
+    assert smtp.calls == ["ehlo", "starttls", "ehlo", "login", "quit"]
+    assert [m["Subject"] for m in smtp.sent] == ["update", "error"]
+
+
+@pytest.mark.asyncio
+async def test_failed_send_is_spooled_and_flushed_later(tmp_path):
+    spool_dir = tmp_path / "spool"
+    failing = lambda host, port, timeout=None: FakeSMTP(host, port, timeout, fail_sends=2)
+    dispatcher = NotificationDispatcher(_settings(), str(spool_dir), smtp_factory=failing)
+
+    assert await dispatcher.send(_message("update")) is False
+    assert [os.path.basename(p).split(".", 1)[1] for p in dispatcher.spooled()] == ["1.eml"]
+
+    dispatcher.smtp_factory = FakeSMTP
+    assert await dispatcher.flush_spool() == 1
+    await dispatcher.close()
+
+    assert dispatcher.spooled() == []
+    assert FakeSMTP.connections[-1].sent[0]["Subject"] == "update"
+
+
+@pytest.mark.asyncio
+async def test_spooled_mail_is_given_up_after_max_attempts(tmp_path):
+    spool_dir = tmp_path / "spool"
+    always_failing = lambda host, port, timeout=None: FakeSMTP(host, port, timeout, fail_sends=100)
+    dispatcher = NotificationDispatcher(_settings(), str(spool_dir), max_attempts=3, smtp_factory=always_failing)
+
+    await dispatcher.send(_message())
+    assert await dispatcher.flush_spool() == 0
+    assert len(dispatcher.spooled()) == 1
+    assert await dispatcher.flush_spool() == 0
+    await dispatcher.close()
+
+    assert dispatcher.spooled() == []
+    assert [name.endswith(".failed") for name in os.listdir(spool_dir)] == [True]
+
+
+@pytest.mark.asyncio
+async def test_delivers_to_local_smtp_server(tmp_path):
+    aiosmtpd_controller = pytest.importorskip("aiosmtpd.controller")
+    from aiosmtpd.handlers import Sink
+
+    class Recorder(Sink):
+        def __init__(self):
+            self.envelopes = []
+
+        async def handle_DATA(self, server, session, envelope):
+            self.envelopes.append(envelope)
+            return "250 OK"
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    handler = Recorder()
+    controller = aiosmtpd_controller.Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    try:
+        settings = SmtpSettings(account="sender@example.com", host="127.0.0.1", port=port, starttls=False)
+        async with NotificationDispatcher(settings, str(tmp_path / "spool")) as dispatcher:
+            assert await dispatcher.send(_message("first")) is True
+            assert await dispatcher.send(_message("second")) is True
+    finally:
+        controller.stop()
+
+    assert len(handler.envelopes) == 2
+    assert handler.envelopes[0].rcpt_tos == ["receiver@example.com"]
+
+
+@pytest.mark.asyncio
+async def test_dropped_connection_is_closed_before_reconnecting(tmp_path):
+    async with NotificationDispatcher(_settings(), str(tmp_path / "spool"), smtp_factory=FakeSMTP) as dispatcher:
+        assert await dispatcher.send(_message("first")) is True
+        # サーバー側で切断された接続
+        FakeSMTP.connections[0].fail_sends = 1
+        assert await dispatcher.send(_message("second")) is True
+
+    dropped, reconnected = FakeSMTP.connections
+    assert dropped.calls[-1] == "quit"
+    assert [m["Subject"] for m in reconnected.sent] == ["second"]
@@ -1,6 +1,6 @@
 import pytest
 from unittest.mock import AsyncMock, MagicMock
-from content_extractor.make_tree import make_tree, make_css_selector
+from content_extractor.make_tree import make_tree, make_css_selector, build_tree_from_snapshot
 from content_extractor.dom_treeSt import DOMTreeSt, BoundingBox
 
 # Fixtures for Playwright mocks
@@ -60,7 +60,7 @@ async def test_make_tree_basic_dom_structure(mock_page, mock_bounding_box_data):
     mock_p_handle.bounding_box.return_value = mock_bounding_box_data
     mock_p_handle.query_selector_all.return_value = [] # children of p
 
-    tree = await make_tree(mock_page, selector="body", wait_for_load=False)
+    tree = await make_tree(mock_page, selector="body", wait_for_load=False, engine="handle")
 
     assert tree is not None
     assert tree.tag == 'body'
@@ -93,7 +93,7 @@ async def test_make_tree_extracts_links(mock_page, mock_bounding_box_data):
     mock_body_handle.bounding_box.return_value = mock_bounding_box_data
     mock_body_handle.query_selector_all.return_value = []
 
-    tree = await make_tree(mock_page, selector="body", wait_for_load=False)
+    tree = await make_tree(mock_page, selector="body", wait_for_load=False, engine="handle")
     assert tree is not None
     assert tree.links == ['http://example.com/link1', 'http://example.com/link2']
 
@@ -117,7 +117,7 @@ async def test_make_tree_skips_elements_without_bounding_box(mock_page, mock_bou
     ]
     mock_child_handle.bounding_box.return_value = None # Child has no bounding box
 
-    tree = await make_tree(mock_page, selector="body", wait_for_load=False)
+    tree = await make_tree(mock_page, selector="body", wait_for_load=False, engine="handle")
     assert tree is not None
     assert tree.tag == 'body'
     assert len(tree.children) == 0 # Child with no bounding box should be skipped
@@ -135,7 +135,7 @@ async def test_make_tree_selector_parameter(mock_page, mock_bounding_box_data):
     mock_target_handle.bounding_box.return_value = mock_bounding_box_data
     mock_target_handle.query_selector_all.return_value = []
 
-    tree = await make_tree(mock_page, selector="#specific-section", wait_for_load=False)
+    tree = await make_tree(mock_page, selector="#specific-section", wait_for_load=False, engine="handle")
     assert tree is not None
     assert tree.tag == 'section'
     assert tree.id == 'specific-section'
@@ -146,7 +146,7 @@ async def test_make_tree_selector_parameter(mock_page, mock_bounding_box_data):
 @pytest.mark.asyncio
 async def test_make_tree_root_element_not_found(mock_page):
     mock_page.query_selector.return_value = None
-    tree = await make_tree(mock_page, selector="#non-existent", wait_for_load=False)
+    tree = await make_tree(mock_page, selector="#non-existent", wait_for_load=False, engine="handle")
     assert tree is None
 
 @pytest.mark.asyncio
@@ -157,7 +157,7 @@ async def test_make_tree_wait_for_load_true(mock_page):
     mock_page.query_selector.return_value.evaluate.return_value = True
     mock_page.query_selector.return_value.bounding_box.return_value = {'x': 0, 'y': 0, 'width': 100, 'height': 100}
 
-    await make_tree(mock_page, selector="body", wait_for_load=True)
+    await make_tree(mock_page, selector="body", wait_for_load=True, engine="handle")
     mock_page.wait_for_load_state.assert_called_once_with('networkidle', timeout=30000)
 
 @pytest.mark.asyncio
@@ -168,10 +168,97 @@ async def test_make_tree_wait_for_load_false(mock_page):
     mock_page.query_selector.return_value.evaluate.return_value = True
     mock_page.query_selector.return_value.bounding_box.return_value = {'x': 0, 'y': 0, 'width': 100, 'height': 100}
 
-    await make_tree(mock_page, selector="body", wait_for_load=False)
+    await make_tree(mock_page, selector="body", wait_for_load=False, engine="handle")
     mock_page.wait_for_load_state.assert_not_called()
 
 
+# --- Tests for the snapshot capture engine ---
+
+@pytest.fixture
+def snapshot_data():
+    """SNAPSHOT_SCRIPT が返す形式の body -> div -> p, body -> span スナップショット。"""
+    return {
+        'found': True,
+        'hrefs': ['http://example.com/a', 'http://example.com/b'],
+        'nodes': [
+            {'parent': -1, 'depth': 1, 'tag': 'body', 'id': '', 'attributes': {},
+             'rect': [0, 0, 1000, 800], 'text': ' Body text ', 'links': [0, 1]},
+            {'parent': 0, 'depth': 2, 'tag': 'div', 'id': 'my-div', 'attributes': {'id': 'my-div', 'class': 'container'},
+             'rect': [10, 20, 300, 400], 'text': 'Div text', 'links': [0, 1]},
+            {'parent': 1, 'depth': 3, 'tag': 'p', 'id': '', 'attributes': {},
+             'rect': [10, 20, 300, 50], 'text': 'Paragraph text', 'links': [1]},
+            {'parent': 0, 'depth': 2, 'tag': 'span', 'id': '', 'attributes': {'class': 'note'},
+             'rect': [0, 700, 100, 20], 'text': '', 'links': []},
+        ],
+    }
+
+@pytest.mark.asyncio
+async def test_make_tree_snapshot_single_round_trip(mock_page, snapshot_data):
+    """snapshot方式は page.evaluate を1回だけ呼び出し、ElementHandleを使用しない。"""
+    mock_page.evaluate.return_value = snapshot_data
+
+    tree = await make_tree(mock_page, selector="body", wait_for_load=False)
+
+    mock_page.evaluate.assert_awaited_once()
+    assert mock_page.evaluate.call_args.args[1] == "body"
+    mock_page.query_selector.assert_not_called()
+
+    assert tree.tag == 'body'
+    assert tree.text == 'Body text'
+    assert tree.depth == 1
+    assert [child.tag for child in tree.children] == ['div', 'span']
+
+    div_node = tree.children[0]
+    assert div_node.css_selector == 'div#my-div'
+    assert div_node.rect == BoundingBox(x=10, y=20, width=300, height=400)
+    assert div_node.links == ['http://example.com/a', 'http://example.com/b']
+    assert div_node.children[0].tag == 'p'
+    assert div_node.children[0].depth == 3
+    assert div_node.children[0].links == ['http://example.com/b']
+    assert tree.children[1].css_selector == 'span.note'
+
+@pytest.mark.asyncio
+async def test_make_tree_snapshot_root_not_found(mock_page):
+    mock_page.evaluate.return_value = {'found': False, 'nodes': [], 'hrefs': []}
+    tree = await make_tree(mock_page, selector="#non-existent", wait_for_load=False)
+    assert tree is None
+
+@pytest.mark.asyncio
+async def test_make_tree_snapshot_falls_back_to_handles(mock_page, mock_bounding_box_data):
+    """snapshot方式の評価が失敗した場合、handle方式で取得し直す。"""
+    mock_page.evaluate.side_effect = Exception("Execution context was destroyed")
+    mock_body_handle = AsyncMock()
+    mock_page.query_selector.return_value = mock_body_handle
+    mock_body_handle.evaluate.side_effect = [
+        True,
+        {'tag': 'body', 'id': '', 'attributes': {}, 'text': 'Body text', 'links': []},
+    ]
+    mock_body_handle.bounding_box.return_value = mock_bounding_box_data
+    mock_body_handle.query_selector_all.return_value = []
+
+    tree = await make_tree(mock_page, selector="body", wait_for_load=False)
+
+    assert tree is not None
+    assert tree.tag == 'body'
+    mock_page.query_selector.assert_awaited_once_with("body")
+
+@pytest.mark.asyncio
+async def test_make_tree_unknown_engine(mock_page):
+    with pytest.raises(ValueError):
+        await make_tree(mock_page, wait_for_load=False, engine="unknown")
+
+def test_build_tree_from_snapshot_matches_handle_output(snapshot_data):
+    """to_dict() の出力が従来方式と同じ形式のフィールドを持つ。"""
+    tree = build_tree_from_snapshot(snapshot_data)
+    data = tree.to_dict()
+    assert data['rect'] == {'x': 0, 'y': 0, 'width': 1000, 'height': 800}
+    assert data['css_selector'] == 'body'
+    assert data['children'][0]['children'][0]['text'] == 'Paragraph text'
+
+def test_build_tree_from_snapshot_empty():
+    assert build_tree_from_snapshot({'found': True, 'nodes': [], 'hrefs': []}) is None
+
+
 # --- Tests for make_css_selector ---
 
 def test_make_css_selector_with_id():
@@ -0,0 +1,106 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock
+
+import pytest
+
+from content_extractor.page_settle import (
+    QUIESCENCE_SCRIPT,
+    PageSettler,
+    SettleResult,
+    SettleWindow,
+    settle_page,
+    wait_for_dom_quiescence,
+)
+
+
+@pytest.mark.asyncio
+async def test_wait_for_dom_quiescence_passes_window_and_parses_result():
+    page = AsyncMock()
+    page.evaluate.return_value = {"settled": True, "settle_ms": 320.5, "waited_ms": 820.5}
+
+    result = await wait_for_dom_quiescence(page, "main#content", quiet_window_ms=500, max_wait_ms=8000)
+
+    assert result == SettleResult(settled=True, settle_ms=320.5, waited_ms=820.5)
+    script, args = page.evaluate.await_args.args
+    assert script == QUIESCENCE_SCRIPT
+    assert args == {"selector": "main#content", "quietMs": 500, "capMs": 8000}
+
+
+@pytest.mark.asyncio
+async def test_wait_for_dom_quiescence_cap_is_never_below_quiet_window():
+    page = AsyncMock()
+    page.evaluate.return_value = {"settled": False, "settle_ms": 0, "waited_ms": 1000}
+
+    await wait_for_dom_quiescence(page, quiet_window_ms=1000, max_wait_ms=200)
+
+    assert page.evaluate.await_args.args[1]["capMs"] == 1000
+
+
+@pytest.mark.asyncio
+async def test_wait_for_dom_quiescence_handles_navigation_errors():
+    page = AsyncMock()
+    page.evaluate.side_effect = Exception("Execution context was destroyed")
+
+    result = await wait_for_dom_quiescence(page)
+
+    assert result.settled is False
+
+
+@pytest.mark.asyncio
+async def test_wait_for_dom_quiescence_gives_up_when_evaluate_hangs(mocker):
+    mocker.patch("content_extractor.page_settle.EVALUATE_GRACE_SECONDS", 0)
+    page = AsyncMock()
+
+    async def hang(*args):
+        await asyncio.Event().wait()
+
+    page.evaluate.side_effect = hang
+
+    result = await wait_for_dom_quiescence(page, max_wait_ms=50)
+
+    assert result.settled is False
+
+
+def test_settler_from_config_applies_host_overrides_to_subdomains():
+    settler = PageSettler.from_config({
+        "quiet_window_ms": 400,
+        "max_wait_ms": 6000,
+        "hosts": {"slow.example": {"quiet_window_ms": 1500}},
+    })
+
+    assert settler.window_for("https://www.slow.example/list") == SettleWindow(1500, 6000)
+    assert settler.window_for("https://fast.example/") == SettleWindow(400, 6000)
+
+
+@pytest.mark.asyncio
+async def test_settler_records_settle_times_per_url_and_stage(tmp_path):
+    path = tmp_path / "settle_times.json"
+    settler = PageSettler(quiet_window_ms=300, max_wait_ms=5000, stats_path=str(path))
+    page = AsyncMock()
+    page.evaluate.side_effect = [
+        {"settled": True, "settle_ms": 200.0, "waited_ms": 500.0},
+        {"settled": False, "settle_ms": 4900.0, "waited_ms": 5000.0},
+        {"settled": True, "settle_ms": 50.0, "waited_ms": 350.0},
+    ]
+
+    await settler.wait(page, "https://a/page", stage="load")
+    await settler.wait(page, "https://a/page", stage="load")
+    await settler.wait(page, "https://a/page", selector="main", stage="quick")
+    settler.save()
+
+    stats = json.loads(path.read_text(encoding="utf-8"))["https://a/page"]
+    assert stats["load"] == {"samples": 2, "mean_ms": 2550.0, "max_ms": 4900.0, "capped": 1, "last_ms": 4900.0}
+    assert stats["quick"]["samples"] == 1
+    assert PageSettler(stats_path=str(path)).stats["https://a/page"]["load"]["samples"] == 2
+
+
+@pytest.mark.asyncio
+async def test_settle_page_without_settler_uses_defaults():
+    page = AsyncMock()
+    page.evaluate.return_value = {"settled": True, "settle_ms": 0.0, "waited_ms": 500.0}
+
+    result = await settle_page(page, "https://a/page")
+
+    assert result.settled is True
+    assert page.evaluate.await_args.args[1]["quietMs"] == 500
@@ -3,6 +3,7 @@ from unittest.mock import AsyncMock, MagicMock, patch, call
 from playwright.async_api import TimeoutError as PlaywrightTimeoutError, Page, Browser, ElementHandle, BrowserContext
 import aiohttp
 import os
+import hashlib
 from PIL import Image
 import asyncio # For patching asyncio.sleep
 
@@ -12,8 +13,17 @@ from content_extractor.playwright_helpers import (
     fetch_robots_txt,
     is_scraping_allowed,
     save_screenshot,
-    generate_filename
+    capture_screenshot,
+    capture_screenshots,
+    capture_main_content,
+    encode_screenshot_outputs,
+    ScreenshotOutput,
+    generate_filename,
+    probe_selectors,
+    SelectorProbeResult,
 )
+from content_extractor.page_settle import QUIESCENCE_SCRIPT
+from content_extractor.dom_treeSt import BoundingBox
 
 # --- Fixtures for Playwright and Aiohttp Mocks ---
 
@@ -62,7 +72,9 @@ async def test_setup_page_normal_operation(mock_browser, mock_context, mock_page
     mock_context.new_page.assert_called_once()
     mock_page.goto.assert_called_once_with(url, wait_until='domcontentloaded', timeout=10000)
     mock_page.wait_for_selector.assert_called_once_with('body', state='attached', timeout=10000)
-    mock_page.wait_for_load_state.assert_called_once_with('networkidle', timeout=15000)
+    # networkidle ではなくDOMの静止を待つ
+    mock_page.wait_for_load_state.assert_not_called()
+    assert mock_page.evaluate.call_args.args[0] == QUIESCENCE_SCRIPT
 
 @pytest.mark.asyncio
 async def test_setup_page_goto_timeout(mock_browser, mock_context, mock_page, mocker):
@@ -80,12 +92,12 @@ async def test_setup_page_goto_timeout(mock_browser, mock_context, mock_page, mo
     mock_context.close.assert_not_called() # Context is not explicitly closed if page was created
 
 @pytest.mark.asyncio
-async def test_setup_page_wait_for_load_state_timeout_warns_but_returns_page(mock_browser, mock_context, mock_page, mocker):
-    """Test Case 3: `wait_for_load_state`でのタイムアウト。"""
+async def test_setup_page_dom_not_settled_warns_but_returns_page(mock_browser, mock_context, mock_page, mocker):
+    """Test Case 3: DOMが上限時間内に静止しない場合。"""
     url = "http://example.com"
     mock_browser.new_context.return_value = mock_context
     mock_context.new_page.return_value = mock_page
-    mock_page.wait_for_load_state.side_effect = PlaywrightTimeoutError("Load state timeout")
+    mock_page.evaluate.return_value = {"settled": False, "settle_ms": 9990.0, "waited_ms": 10000.0}
     
     # Mock logger to check for warning
     mock_logger_warning = mocker.patch('content_extractor.playwright_helpers.logger.warning')
@@ -93,7 +105,6 @@ async def test_setup_page_wait_for_load_state_timeout_warns_but_returns_page(moc
     result_page = await setup_page(url, mock_browser)
     
     assert result_page is mock_page # Page should still be returned
-    mock_page.wait_for_load_state.assert_called_once()
     mock_logger_warning.assert_called_once()
     mock_context.close.assert_not_called() # Context should NOT be closed
 
@@ -127,12 +138,14 @@ async def test_adjust_page_view_correctly_sets_viewport_and_scrolls(mock_page, m
     # Mock page.evaluate to return document dimensions
     mock_page.evaluate.side_effect = [
         {'width': 1000, 'height': 2000, 'scrollWidth': 1000, 'scrollHeight': 3000}, # First call for dimensions
-        None # Second call for scrolling (return value doesn't matter)
+        None, # Second call for scrolling (return value doesn't matter)
+        {'settled': True, 'settle_ms': 120.0, 'waited_ms': 620.0} # Third call waits for lazy-loaded content
     ]
     
     dimensions = await adjust_page_view(mock_page)
     
-    assert mock_page.evaluate.call_count == 2
+    assert mock_page.evaluate.call_count == 3
+    mock_page.wait_for_timeout.assert_not_called()
     mock_page.set_viewport_size.assert_called_once_with({'width': 1000, 'height': 2000})
     mock_page.evaluate.assert_has_calls([
         call('''() => {
@@ -265,6 +278,16 @@ def test_generate_filename_url_with_query_params():
     # Should not contain query params in the readable part
     assert "param" not in filename and "value" not in filename
 
+def test_generate_filename_distinguishes_query_variants():
+    """クエリだけが異なるURLは別のファイル名になる。クエリのないURLの名前は変わらない。"""
+    base = generate_filename("https://example.com/list")
+    page1 = generate_filename("https://example.com/list?page=1")
+    page2 = generate_filename("https://example.com/list?page=2")
+
+    assert len({base, page1, page2}) == 3
+    assert page1.startswith("example_com_list_")
+    assert base == "example_com_list_" + hashlib.md5(b"/list").hexdigest()[:8] + ".png"
+
 def test_generate_filename_url_with_special_characters():
     """Test Case 3: 特殊文字を含むURL"""
     url = "https://example.com/path/with spaces/file!.html"
@@ -467,3 +490,234 @@ async def test_save_screenshot_makedirs_called(mock_image_open, mock_path_join,
 
     await save_screenshot(mock_browser, [url], save_dir="new_temp_dir")
     mock_makedirs.assert_called_once_with("new_temp_dir", exist_ok=True)
+
+
+# --- Tests for capture_screenshot / capture_screenshots ---
+
+def _png_bytes(width, height):
+    import io
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), "white").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+@pytest.mark.asyncio
+async def test_capture_screenshot_renders_once_for_all_outputs(mock_browser, mock_context, mock_page, tmp_path):
+    """1回の撮影から、設定されたすべてのサイズの画像を作成する"""
+    url = "http://example.com/page"
+    mock_page.screenshot.return_value = _png_bytes(2000, 3000)
+    outputs = {
+        "email": ScreenshotOutput(save_dir=str(tmp_path / "email"), width=500),
+        "permanent": ScreenshotOutput(save_dir=str(tmp_path / "perm"), width=1920),
+    }
+
+    paths = await capture_screenshot(mock_browser, url, outputs)
+
+    mock_page.goto.assert_awaited_once_with(url, wait_until='load', timeout=30000)
+    mock_page.screenshot.assert_awaited_once_with(full_page=True)
+    mock_context.close.assert_awaited_once()
+    assert paths["email"] == os.path.join(str(tmp_path / "email"), generate_filename(url))
+    with Image.open(paths["email"]) as img:
+        assert img.size == (500, 750)
+    with Image.open(paths["permanent"]) as img:
+        assert img.size == (1920, 2880)
+
+@pytest.mark.asyncio
+async def test_capture_screenshot_failure_returns_none_per_output(mock_browser, mock_context, mock_page,
+                                                                  mock_asyncio_sleep, tmp_path):
+    mock_page.goto.side_effect = PlaywrightTimeoutError("timeout")
+    outputs = {"email": ScreenshotOutput(save_dir=str(tmp_path), width=500)}
+
+    paths = await capture_screenshot(mock_browser, "http://example.com/fail", outputs)
+
+    assert paths == {"email": None}
+    assert mock_page.goto.call_count == 3
+    assert mock_context.close.await_count == 3
+    assert mock_asyncio_sleep.call_count == 2
+
+@pytest.mark.asyncio
+async def test_capture_screenshots_bounds_parallelism(mocker, tmp_path):
+    """同時に撮影するURLは concurrency 件まで"""
+    from contextlib import asynccontextmanager
+
+    @asynccontextmanager
+    async def acquire():
+        yield MagicMock()
+
+    pool = MagicMock()
+    pool.acquire = acquire
+    active = 0
+    peak = 0
+
+    async def yield_to_loop():
+        # asyncio.sleep はパッチ済みのため、Future で他のタスクに制御を渡す
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        loop.call_soon(future.set_result, None)
+        await future
+
+    async def fake_capture(browser, url, outputs):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        for _ in range(3):
+            await yield_to_loop()
+        active -= 1
+        return {"email": f"{url}.png"}
+
+    mocker.patch("content_extractor.playwright_helpers.capture_screenshot", side_effect=fake_capture)
+    urls = [f"http://example.com/{i}" for i in range(5)]
+    results = await capture_screenshots(pool, urls, {"email": ScreenshotOutput(str(tmp_path), 500)}, concurrency=2)
+
+    assert peak == 2
+    assert results == {url: {"email": f"{url}.png"} for url in urls}
+
+@pytest.mark.asyncio
+async def test_capture_screenshots_query_variants_write_separate_files(mock_browser, mock_page, tmp_path):
+    """クエリだけが異なるURLを並列に撮影しても、それぞれ別のファイルに書き出す"""
+    from contextlib import asynccontextmanager
+
+    @asynccontextmanager
+    async def acquire():
+        yield mock_browser
+
+    pool = MagicMock()
+    pool.acquire = acquire
+    mock_page.screenshot.return_value = _png_bytes(200, 100)
+    urls = ["http://example.com/list?page=1", "http://example.com/list?page=2"]
+
+    results = await capture_screenshots(pool, urls, {"email": ScreenshotOutput(str(tmp_path), 100)}, concurrency=2)
+
+    paths = [results[url]["email"] for url in urls]
+    assert paths[0] != paths[1]
+    assert all(os.path.exists(path) for path in paths)
+
+@pytest.mark.asyncio
+async def test_capture_main_content_clips_to_rect_without_upscaling(mock_page, tmp_path):
+    """スキャン中のページからメインコンテンツの矩形だけを撮影し、元の幅より大きくはしない"""
+    mock_page.url = "http://example.com/list"
+    mock_page.evaluate.return_value = [0, 300]
+    mock_page.screenshot.side_effect = [_png_bytes(800, 400), _png_bytes(1920, 1080)]
+    outputs = {
+        "email": ScreenshotOutput(save_dir=str(tmp_path / "email"), width=500),
+        "permanent": ScreenshotOutput(save_dir=str(tmp_path / "perm"), width=1920),
+    }
+    context_outputs = {"context": ScreenshotOutput(save_dir=str(tmp_path / "perm"), width=1920)}
+
+    paths = await capture_main_content(mock_page, BoundingBox(100, 50, 800, 400), "list.png", outputs, context_outputs)
+
+    clip_call, context_call = mock_page.screenshot.await_args_list
+    assert clip_call.kwargs == {"clip": {"x": 100, "y": 350, "width": 800, "height": 400}, "full_page": True}
+    assert context_call.kwargs["clip"]["y"] == 150
+    with Image.open(paths["email"]) as img:
+        assert img.size == (500, 250)
+    with Image.open(paths["permanent"]) as img:
+        assert img.size == (800, 400)
+    assert paths["context"] == os.path.join(str(tmp_path / "perm"), "list_context.png")
+    mock_page.goto.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_capture_main_content_failure_returns_none(mock_page, tmp_path):
+    mock_page.screenshot.side_effect = Exception("Target closed")
+    mock_page.evaluate.return_value = [0, 0]
+    outputs = {"email": ScreenshotOutput(save_dir=str(tmp_path), width=500)}
+
+    assert await capture_main_content(mock_page, BoundingBox(0, 0, 10, 10), "a.png", outputs) == {"email": None}
+    assert await capture_main_content(mock_page, BoundingBox(0, 0, 0, 0), "a.png", outputs) == {"email": None}
+
+@pytest.mark.asyncio
+async def test_encode_screenshot_outputs_writes_compact_formats(tmp_path):
+    """jpeg / webp では拡張子を付け替え、品質を指定して書き出す"""
+    outputs = {
+        "email": ScreenshotOutput.from_config({"format": "jpeg", "quality": 60, "resample": "bicubic"},
+                                              save_dir=str(tmp_path / "email"), width=500),
+        "permanent": ScreenshotOutput.from_config({"format": "WebP", "quality": 80},
+                                                  save_dir=str(tmp_path / "perm"), width=1000),
+    }
+
+    paths = await encode_screenshot_outputs(_png_bytes(2000, 1000), "example_com_page_abcd.png", outputs)
+
+    assert paths["email"] == os.path.join(str(tmp_path / "email"), "example_com_page_abcd.jpg")
+    assert paths["permanent"] == os.path.join(str(tmp_path / "perm"), "example_com_page_abcd.webp")
+    with Image.open(paths["email"]) as img:
+        assert (img.format, img.size) == ("JPEG", (500, 250))
+    with Image.open(paths["permanent"]) as img:
+        assert (img.format, img.size) == ("WEBP", (1000, 500))
+
+@pytest.mark.asyncio
+async def test_encode_screenshot_outputs_runs_in_worker_thread(mocker, tmp_path):
+    """画像の変換はイベントループのスレッドでは行わない"""
+    import threading
+    import content_extractor.playwright_helpers as helpers
+
+    original = helpers.write_screenshot_outputs
+    threads = []
+
+    def record_thread(*args):
+        threads.append(threading.current_thread())
+        return original(*args)
+
+    mocker.patch.object(helpers, "write_screenshot_outputs", side_effect=record_thread)
+    outputs = {"email": ScreenshotOutput(save_dir=str(tmp_path), width=100)}
+
+    await encode_screenshot_outputs(_png_bytes(200, 100), "a.png", outputs)
+
+    assert threads and threads[0] is not threading.current_thread()
+
+# --- Tests for probe_selectors ---
+
+@pytest.mark.asyncio
+async def test_probe_selectors_single_evaluation(mock_page):
+    """先頭のセレクタを1回待機し、全セレクタを1回の評価で判定する。"""
+    selectors = ["div.stale", "section#gone", "main.content"]
+    mock_page.evaluate.return_value = [0, 0, 3]
+
+    probe = await probe_selectors(mock_page, selectors, timeout=5000)
+
+    mock_page.wait_for_function.assert_awaited_once()
+    assert mock_page.wait_for_function.call_args.kwargs['arg'] == "div.stale"
+    assert mock_page.wait_for_function.call_args.kwargs['timeout'] == 5000
+    mock_page.evaluate.assert_awaited_once()
+    mock_page.wait_for_selector.assert_not_called()
+    assert probe.counts == {"div.stale": 0, "section#gone": 0, "main.content": 3}
+    assert probe.first_live == "main.content"
+
+@pytest.mark.asyncio
+async def test_probe_selectors_timeout_still_reports_counts(mock_page):
+    """どのセレクタもマッチしないまま待機がタイムアウトしてもマッチ数を返す。"""
+    mock_page.wait_for_function.side_effect = PlaywrightTimeoutError("timeout")
+    mock_page.evaluate.return_value = [0, -1]
+
+    probe = await probe_selectors(mock_page, ["div.a", "div[broken"])
+
+    assert probe.first_live is None
+    assert probe.counts == {"div.a": 0, "div[broken": -1}
+
+@pytest.mark.asyncio
+async def test_probe_selectors_waits_for_primary_selector(mock_page):
+    """下位のセレクタが先にマッチしても、先頭のセレクタの待機が終わってからマッチ数を数える。"""
+    attached = set()
+
+    async def wait_for_function(script, arg=None, timeout=None):
+        attached.add("aside.ad")  # 下位のセレクタが先に現れる
+        attached.add(arg)         # 先頭のセレクタは待機の終わりに現れる
+
+    mock_page.wait_for_function.side_effect = wait_for_function
+    mock_page.evaluate.side_effect = lambda script, selectors: [1 if s in attached else 0 for s in selectors]
+
+    probe = await probe_selectors(mock_page, ["main.content", "aside.ad"])
+
+    assert probe.counts == {"main.content": 1, "aside.ad": 1}
+    assert probe.reorder(["main.content", "aside.ad"]) == ["main.content", "aside.ad"]
+
+@pytest.mark.asyncio
+async def test_probe_selectors_empty_list(mock_page):
+    probe = await probe_selectors(mock_page, [])
+    assert probe.counts == {}
+    mock_page.evaluate.assert_not_called()
+
+def test_selector_probe_result_reorder():
+    """成功したセレクタ → その他のマッチ → マッチなし → 無効 の順に並べ替える。"""
+    probe = SelectorProbeResult(counts={"a": 0, "b": 2, "c": -1, "d": 1, "e": 0})
+    assert probe.live_selectors == ["b", "d"]
+    assert probe.reorder(["a", "b", "c", "d", "e"], preferred="d") == ["d", "b", "a", "e", "c"]
+    assert probe.reorder(["a", "b", "c", "d", "e"]) == ["b", "d", "a", "e", "c"]
@@ -0,0 +1,121 @@
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from content_extractor.resource_filter import (
+    RequestFilter,
+    ResourceAllowlist,
+    learn_main_content_resources,
+    resource_key,
+)
+
+
+def test_resource_key_ignores_query_and_fragment():
+    assert resource_key("https://a.example/js/app.js?v=123#x") == "https://a.example/js/app.js"
+    assert resource_key("http://a.example:8080/api") == "http://a.example:8080/api"
+
+
+# --- RequestFilter ---
+
+def test_filter_without_allowlist_blocks_only_heavy_resources():
+    request_filter = RequestFilter()
+    assert request_filter.should_block("image", "https://a/x.png")
+    assert request_filter.should_block("media", "https://a/x.mp4")
+    assert request_filter.should_block("font", "https://a/x.woff2")
+    assert not request_filter.should_block("script", "https://ads.example/tag.js")
+    assert not request_filter.should_block("document", "https://ads.example/frame", main_frame=False)
+
+
+def test_filter_with_allowlist_blocks_unlisted_requests():
+    request_filter = RequestFilter(allowed=frozenset({"https://a/app.js", "https://a/api/items"}))
+    assert not request_filter.should_block("script", "https://a/app.js?v=2")
+    assert not request_filter.should_block("fetch", "https://a/api/items?page=1")
+    assert request_filter.should_block("script", "https://tracker.example/t.js")
+    assert request_filter.should_block("xhr", "https://a/api/recommend")
+    # 文書 (メインフレームのみ) とスタイルシートは常に読み込む
+    assert not request_filter.should_block("document", "https://a/page")
+    assert request_filter.should_block("document", "https://ads.example/frame", main_frame=False)
+    assert not request_filter.should_block("stylesheet", "https://cdn.example/site.css")
+    assert request_filter.should_block("image", "https://a/x.png")
+
+
+@pytest.mark.asyncio
+async def test_filter_install_aborts_or_continues_routes():
+    request_filter = RequestFilter(allowed=frozenset({"https://a/app.js"}))
+    context = AsyncMock()
+    await request_filter.install(context)
+    pattern, handler = context.route.await_args.args
+    assert pattern == "**/*"
+
+    def make_route(resource_type, url):
+        route = AsyncMock()
+        route.request = MagicMock(resource_type=resource_type, url=url)
+        route.request.frame.parent_frame = None
+        return route
+
+    allowed = make_route("script", "https://a/app.js")
+    blocked = make_route("script", "https://tracker.example/t.js")
+    await handler(allowed)
+    await handler(blocked)
+
+    allowed.continue_.assert_awaited_once()
+    allowed.abort.assert_not_called()
+    blocked.abort.assert_awaited_once()
+    blocked.continue_.assert_not_called()
+
+
+# --- 学習 ---
+
+@pytest.mark.asyncio
+async def test_learn_main_content_resources_returns_urls():
+    page = AsyncMock()
+    page.evaluate.return_value = {"settled": 850.0, "urls": ["https://a/app.js", "https://a/api/items"]}
+
+    urls = await learn_main_content_resources(page, "main#content")
+
+    assert urls == ["https://a/app.js", "https://a/api/items"]
+    assert page.evaluate.await_args.args[1] == "main#content"
+
+
+@pytest.mark.asyncio
+async def test_learn_main_content_resources_without_recording():
+    page = AsyncMock()
+    page.evaluate.return_value = None
+    assert await learn_main_content_resources(page, "main") is None
+    assert await learn_main_content_resources(page, "") is None
+
+
+# --- ResourceAllowlist ---
+
+def test_allowlist_learn_save_and_load(tmp_path):
+    path = tmp_path / "allowlist.json"
+    allowlist = ResourceAllowlist(str(path))
+    assert allowlist.filter_for("https://a/page").allowed is None
+
+    allowlist.learn("https://a/page", ["https://a/app.js?v=1", "https://a/app.js?v=2", "https://a/api"])
+    allowlist.save()
+
+    reloaded = ResourceAllowlist(str(path))
+    assert reloaded.filter_for("https://a/page").allowed == frozenset({"https://a/app.js", "https://a/api"})
+    assert json.loads(path.read_text(encoding="utf-8"))["https://a/page"]["resources"] == [
+        "https://a/api", "https://a/app.js"]
+
+
+def test_allowlist_fallback_disables_until_relearned(tmp_path):
+    allowlist = ResourceAllowlist(str(tmp_path / "allowlist.json"))
+    allowlist.learn("https://a/page", ["https://a/app.js"])
+
+    allowlist.record_fallback("https://a/page")
+    assert allowlist.filter_for("https://a/page").allowed is None
+    assert allowlist.state["https://a/page"]["fallbacks"] == 1
+
+    allowlist.learn("https://a/page", ["https://a/app.js", "https://a/lazy.js"])
+    assert allowlist.filter_for("https://a/page").allowed == frozenset({"https://a/app.js", "https://a/lazy.js"})
+    assert allowlist.state["https://a/page"]["fallbacks"] == 1
+
+
+def test_allowlist_ignores_broken_state_file(tmp_path):
+    path = tmp_path / "allowlist.json"
+    path.write_text("{broken", encoding="utf-8")
+    assert ResourceAllowlist(str(path)).state == {}
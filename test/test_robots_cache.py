@@ -0,0 +1,129 @@
+import asyncio
+import json
+
+import aiohttp
+import pytest
+
+from content_extractor.robots_cache import ERROR_TTL_SECONDS, RobotsCache, robots_key
+
+
+class FakeResponse:
+    def __init__(self, status, text="", body=None, charset=None):
+        self.status = status
+        self._body = body if body is not None else text.encode("utf-8")
+        self.charset = charset
+
+    async def read(self):
+        return self._body
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+
+class FakeSession:
+    """host の robots.txt の応答を返し、取得したURLを記録するセッション"""
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.requested = []
+
+    def get(self, url, **kwargs):
+        self.requested.append(url)
+        response = self.responses[url]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def test_robots_key_is_scheme_and_host():
+    assert robots_key("https://Example.com:8443/a/b?c=1") == "https://example.com:8443"
+
+
+@pytest.mark.asyncio
+async def test_fetches_once_per_host_and_reuses_parser():
+    session = FakeSession({
+        "https://a.example/robots.txt": FakeResponse(200, "User-agent: *\nDisallow: /private/"),
+    })
+    cache = RobotsCache(session=session)
+
+    assert await cache.can_fetch("https://a.example/list?page=2") is True
+    assert await cache.can_fetch("https://a.example/private/page") is False
+    assert session.requested == ["https://a.example/robots.txt"]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_lookups_share_one_fetch():
+    session = FakeSession({"https://a.example/robots.txt": FakeResponse(200, "")})
+    cache = RobotsCache(session=session)
+
+    results = await asyncio.gather(*(cache.can_fetch(f"https://a.example/{i}") for i in range(5)))
+
+    assert all(results)
+    assert len(session.requested) == 1
+
+
+@pytest.mark.asyncio
+async def test_missing_or_failed_robots_allows_everything():
+    session = FakeSession({
+        "https://none.example/robots.txt": FakeResponse(404),
+        "https://down.example/robots.txt": aiohttp.ClientConnectionError("refused"),
+    })
+    cache = RobotsCache(session=session)
+
+    assert await cache.can_fetch("https://none.example/any") is True
+    assert await cache.can_fetch("https://down.example/any") is True
+    # 取得に失敗したホストは短い間隔で取得し直す
+    assert cache.entries["https://down.example"].ttl == ERROR_TTL_SECONDS
+
+
+@pytest.mark.asyncio
+async def test_expired_entries_are_refetched(mocker):
+    session = FakeSession({"https://a.example/robots.txt": FakeResponse(200, "")})
+    cache = RobotsCache(ttl_seconds=60, session=session)
+    clock = mocker.patch("content_extractor.robots_cache.time.time", return_value=1000.0)
+
+    await cache.can_fetch("https://a.example/")
+    clock.return_value = 1059.0
+    await cache.can_fetch("https://a.example/")
+    clock.return_value = 1061.0
+    await cache.can_fetch("https://a.example/")
+
+    assert len(session.requested) == 2
+
+
+@pytest.mark.asyncio
+async def test_persisted_cache_skips_fetch_on_cold_start(tmp_path):
+    path = tmp_path / "robots_cache.json"
+    session = FakeSession({"https://a.example/robots.txt": FakeResponse(200, "User-agent: *\nDisallow: /")})
+    cache = RobotsCache(state_path=str(path), session=session)
+    await cache.can_fetch("https://a.example/")
+    cache.save()
+
+    cold_session = FakeSession({})
+    restored = RobotsCache(state_path=str(path), session=cold_session)
+
+    assert await restored.can_fetch("https://a.example/page") is False
+    assert cold_session.requested == []
+    assert "https://a.example" in json.loads(path.read_text(encoding="utf-8"))
+
+
+@pytest.mark.asyncio
+async def test_undecodable_robots_txt_is_cached_and_allows():
+    # charset の指定がない Shift_JIS の robots.txt
+    body = "# ロボット\nUser-agent: *\nDisallow: /private/\n".encode("shift_jis")
+    session = FakeSession({
+        "https://sjis.example/robots.txt": FakeResponse(200, body=body),
+        "https://bad-charset.example/robots.txt": FakeResponse(200, body=b"User-agent: *", charset="x-unknown"),
+    })
+    cache = RobotsCache(session=session)
+
+    assert await cache.can_fetch("https://sjis.example/private/page") is False
+    assert await cache.can_fetch("https://sjis.example/public") is True
+    assert await cache.can_fetch("https://bad-charset.example/any") is True
+    assert cache.entries["https://bad-charset.example"].ttl == ERROR_TTL_SECONDS
+
+    await cache.can_fetch("https://sjis.example/other")
+    assert len(session.requested) == 2
@@ -0,0 +1,74 @@
+import pytest
+
+from utils.run_checkpoint import RunCheckpoint
+
+# =================================================================
+# run_checkpoint.py のテスト
+# =================================================================
+
+TARGETS = [(0, "http://a.example/"), (1, "http://b.example/"), (2, "http://c.example/")]
+
+
+@pytest.fixture
+def checkpoint_path(tmp_path):
+    return str(tmp_path / "user" / "run_checkpoint.jsonl")
+
+
+def test_load_without_file_returns_none(checkpoint_path):
+    assert RunCheckpoint.load(checkpoint_path) is None
+
+def test_progress_survives_reload(checkpoint_path, tmp_path):
+    """中断後に読み込むと、処理済みのURL・撮影済みの画像・通知済みのURLが復元される。"""
+    image = tmp_path / "a.png"
+    image.write_bytes(b"png")
+
+    checkpoint = RunCheckpoint(checkpoint_path)
+    checkpoint.start(TARGETS)
+    checkpoint.mark_done(0)
+    checkpoint.mark_done(2)
+    checkpoint.record_screenshot("http://a.example/", str(image), None)
+    checkpoint.mark_notified(["http://a.example/"])
+
+    resumed = RunCheckpoint.load(checkpoint_path)
+
+    assert resumed.run_id == checkpoint.run_id
+    assert resumed.remaining_targets() == [(1, "http://b.example/")]
+    assert resumed.get_screenshot("http://a.example/") == {"email": str(image), "permanent": None}
+    assert resumed.notified_urls == {"http://a.example/"}
+
+def test_missing_screenshot_file_is_recaptured(checkpoint_path, tmp_path):
+    checkpoint = RunCheckpoint(checkpoint_path)
+    checkpoint.start(TARGETS)
+    checkpoint.record_screenshot("http://a.example/", str(tmp_path / "deleted.png"), None)
+
+    assert RunCheckpoint.load(checkpoint_path).get_screenshot("http://a.example/") is None
+    assert checkpoint.get_screenshot("http://unknown.example/") is None
+
+def test_start_discards_previous_run(checkpoint_path):
+    first = RunCheckpoint(checkpoint_path)
+    first.start(TARGETS)
+    first.mark_done(0)
+
+    second = RunCheckpoint(checkpoint_path)
+    second.start(TARGETS[:1])
+
+    loaded = RunCheckpoint.load(checkpoint_path)
+    assert loaded.targets == [(0, "http://a.example/")]
+    assert loaded.completed == set()
+
+def test_broken_last_line_is_ignored(checkpoint_path):
+    checkpoint = RunCheckpoint(checkpoint_path)
+    checkpoint.start(TARGETS)
+    checkpoint.mark_done(1)
+    with open(checkpoint_path, "a", encoding="utf-8") as f:
+        f.write('{"op": "do')
+
+    assert RunCheckpoint.load(checkpoint_path).completed == {1}
+
+def test_finish_removes_checkpoint(checkpoint_path):
+    checkpoint = RunCheckpoint(checkpoint_path)
+    checkpoint.start(TARGETS)
+    checkpoint.finish()
+    checkpoint.finish()
+
+    assert RunCheckpoint.load(checkpoint_path) is None
@@ -0,0 +1,88 @@
+import asyncio
+import json
+
+import pytest
+
+from utils.scan_metrics import ScanMetrics, percentile, span
+
+
+def test_span_outside_a_scan_records_nothing():
+    metrics = ScanMetrics()
+    with span("goto"):
+        pass
+    assert metrics.urls == {}
+
+
+def test_percentile_uses_nearest_rank():
+    values = [float(v) for v in range(1, 21)]
+    assert percentile(values, 0.5) == 10.0
+    assert percentile(values, 0.95) == 19.0
+    assert percentile([], 0.5) == 0.0
+
+
+@pytest.mark.asyncio
+async def test_spans_are_recorded_per_url_across_tasks():
+    metrics = ScanMetrics()
+
+    async def scan(url, stages):
+        for stage in stages:
+            with span(stage):
+                await asyncio.sleep(0)
+
+    async def worker(url, stages):
+        with metrics.scan(url):
+            # process_url_async と同様に wait_for の中で実行しても、同じURLの記録になる
+            await asyncio.wait_for(scan(url, stages), timeout=5)
+
+    await asyncio.gather(worker("https://a/", ["goto", "make_tree", "make_tree"]),
+                         worker("https://b/", ["goto"]))
+
+    assert set(metrics.urls) == {"https://a/", "https://b/"}
+    assert set(metrics.urls["https://a/"].stages) == {"total", "goto", "make_tree"}
+    assert set(metrics.urls["https://b/"].stages) == {"total", "goto"}
+    assert metrics.summary()["goto"]["count"] == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_stage_is_recorded_as_failed():
+    metrics = ScanMetrics()
+
+    async def slow():
+        with span("goto"):
+            await asyncio.Event().wait()
+
+    with metrics.scan("https://slow/"):
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(slow(), timeout=0.01)
+
+    timings = metrics.urls["https://slow/"]
+    assert timings.failed == ["goto"]
+    assert "total" in timings.stages
+    assert metrics.summary()["goto"]["errors"] == 1
+
+
+def test_write_exports_openmetrics_and_appends_jsonl(tmp_path):
+    metrics = ScanMetrics()
+    for i, seconds in enumerate([0.1, 0.2, 0.3, 0.4]):
+        metrics.record(f"https://site/{i}", "make_tree", seconds)
+    with metrics.cycle_span("precheck"):
+        pass
+    prom_path = tmp_path / "metrics" / "scan_stages.prom"
+    jsonl_path = tmp_path / "metrics" / "scan_stages.jsonl"
+
+    metrics.write(str(prom_path), str(jsonl_path))
+    # .prom は書き換え、JSONL は追記する
+    metrics.write(str(prom_path), str(jsonl_path))
+
+    text = prom_path.read_text(encoding="utf-8")
+    assert 'web_checker_stage_seconds{stage="make_tree",quantile="0.5"} 0.200000' in text
+    assert 'web_checker_stage_seconds{stage="make_tree",quantile="0.95"} 0.400000' in text
+    assert 'web_checker_stage_seconds_count{stage="make_tree"} 4' in text
+    assert 'web_checker_cycle_stage_seconds{stage="precheck"}' in text
+    assert text.endswith("# EOF\n")
+
+    records = [json.loads(line) for line in jsonl_path.read_text(encoding="utf-8").splitlines()]
+    url_records = [r for r in records if "url" in r]
+    assert len(url_records) == 8
+    assert url_records[0]["stages"] == {"make_tree": 0.1}
+    assert all(r["run"] == metrics.run_started for r in url_records)
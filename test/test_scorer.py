@@ -313,4 +313,98 @@ def test_score_parent_and_children_depth_weighting(scorer_instance):
     print(f"Parent score (depth 1): {parent_score}")
     print(f"Child score (depth 2): {child_score}")
 
-    assert child_score > parent_score
\ No newline at end of file
+    assert child_score > parent_score
+
+# -----------------------------------------------------------------
+# NumPy バックエンドのテスト
+#
+# スカラー版と同じスコア・同じ順序になることを確認する。
+# -----------------------------------------------------------------
+def _build_wide_tree():
+    """ランダムな矩形・テキスト・リンク数を持つ比較用の大きめのツリー"""
+    import random
+    rng = random.Random(42)
+    tags = ["div", "section", "article", "p", "nav", "aside", "main", "span", "ul", "li"]
+
+    def make_node(depth):
+        x, y = rng.uniform(0, 1500), rng.uniform(0, 3000)
+        node = DOMTreeSt(
+            tag=rng.choice(tags),
+            attributes={"id": "main-area"} if rng.random() < 0.05 else {},
+            text="a" * rng.choice([0, 5, 50, 300, 2000]),
+            links=[f"http://example.com/{i}" for i in range(rng.choice([0, 3, 6, 20, 80]))],
+            rect=BoundingBox(x, y, rng.uniform(0, 1920 - x if x < 1920 else 10), rng.uniform(0, 1200)),
+            depth=depth,
+        )
+        if depth < 4:
+            node.children = [make_node(depth + 1) for _ in range(rng.randint(0, 4))]
+        return node
+
+    body = DOMTreeSt(tag="body", rect=BoundingBox(0, 0, 1920, 4000), depth=0,
+                     children=[make_node(1) for _ in range(6)])
+    return body
+
+
+def _scores_by_identity(nodes):
+    return {id(node): node.score for node in nodes}
+
+
+@pytest.mark.parametrize("tree_factory", [
+    lambda: _build_wide_tree(),
+    lambda: DOMTreeSt(tag="body", rect=BoundingBox(0, 0, 1000, 1000), depth=0, children=[
+        DOMTreeSt(tag="main", text="a", rect=BoundingBox(100, 100, 800, 600), depth=1),
+        DOMTreeSt(tag="div", rect=None, depth=1),
+        DOMTreeSt(tag="div", text=None, links=None, rect=BoundingBox(0, 0, 0, 0), depth=1),
+    ]),
+])
+def test_numpy_find_candidates_matches_scalar(tree_factory):
+    """NumPyバックエンドの候補スコアと順序がスカラー版と一致する。"""
+    scalar_root, numpy_root = tree_factory(), tree_factory()
+
+    scalar_candidates = MainContentScorer([scalar_root], 1920, 1080).find_candidates()
+    numpy_candidates = MainContentScorer([numpy_root], 1920, 1080, backend="numpy").find_candidates()
+
+    assert [n.score for n in numpy_candidates] == pytest.approx([n.score for n in scalar_candidates], rel=1e-9, abs=1e-12)
+    assert [n.tag for n in numpy_candidates] == [n.tag for n in scalar_candidates]
+
+
+def test_numpy_find_candidates_scores_every_node():
+    """候補外のノード(body/navなど)にもスコアが書き戻される。"""
+    scalar_root, numpy_root = _build_wide_tree(), _build_wide_tree()
+    MainContentScorer([scalar_root], 1920, 1080).find_candidates()
+    MainContentScorer([numpy_root], 1920, 1080, backend="numpy").find_candidates()
+
+    from content_extractor.dom_utils import flatten_dom_tree
+    scalar_scores = [n.score for n in flatten_dom_tree(scalar_root)]
+    numpy_scores = [n.score for n in flatten_dom_tree(numpy_root)]
+    assert numpy_scores == pytest.approx(scalar_scores, rel=1e-9, abs=1e-12)
+
+
+def test_numpy_find_candidates_top_k(sample_dom_tree):
+    """top_k指定時は部分ソートで上位のみを降順に返す。"""
+    full = MainContentScorer(list(sample_dom_tree), 1000, 1000, backend="numpy").find_candidates()
+    top = MainContentScorer(list(sample_dom_tree), 1000, 1000, backend="numpy").find_candidates(top_k=2)
+
+    assert len(top) == 2
+    assert [n.tag for n in top] == [n.tag for n in full[:2]]
+    assert top[0].tag == "main"
+
+
+def test_numpy_score_parent_and_children_matches_scalar():
+    """詳細スコアリングでもスカラー版と一致する。"""
+    scalar_root, numpy_root = _build_wide_tree(), _build_wide_tree()
+    scalar_nodes = MainContentScorer([scalar_root], 1920, 4000).score_parent_and_children()
+    numpy_nodes = MainContentScorer([numpy_root], 1920, 4000, backend="numpy").score_parent_and_children()
+
+    assert [n.score for n in numpy_nodes] == pytest.approx([n.score for n in scalar_nodes], rel=1e-9, abs=1e-12)
+
+
+def test_find_candidates_does_not_consume_input_list(sample_dom_tree):
+    tree = list(sample_dom_tree)
+    MainContentScorer(tree, 1000, 1000).find_candidates()
+    assert tree == sample_dom_tree
+
+
+def test_unknown_backend_raises():
+    with pytest.raises(ValueError):
+        MainContentScorer([], 1000, 1000, backend="gpu")
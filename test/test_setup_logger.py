@@ -0,0 +1,85 @@
+import logging
+import os
+import threading
+
+import pytest
+
+import setup_logger as setup_logger_module
+from setup_logger import flush_logging, set_file_log_level, setup_logger, shutdown_logging
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    yield str(tmp_path / "log" / "app.log")
+    # テスト用のファイルハンドラーを閉じ、標準出力だけの構成に戻す
+    shutdown_logging()
+    setup_logger("test_setup_logger")
+
+
+def test_loggers_share_one_queue_handler_and_file(log_file):
+    first = setup_logger("test_shared_a", log_file=log_file)
+    file_handlers = dict(setup_logger_module._file_handlers)
+    second = setup_logger("test_shared_b", log_file=log_file)
+    other_module = setup_logger("test_shared_c")
+
+    assert first.handlers == second.handlers == other_module.handlers
+    assert len(first.handlers) == 1
+    # 同じパスのファイルは1度だけ開く
+    assert setup_logger_module._file_handlers == file_handlers
+
+    first.info("from a")
+    other_module.info("from c")
+    flush_logging()
+
+    with open(log_file, encoding="utf-8") as f:
+        content = f.read()
+    assert "from a" in content and "from c" in content
+
+
+def test_file_io_runs_on_the_listener_thread(log_file, mocker):
+    logger = setup_logger("test_listener_thread", log_file=log_file)
+    handler = setup_logger_module._file_handlers[os.path.abspath(log_file)]
+    emit = mocker.patch.object(handler, "emit")
+
+    caller = threading.current_thread()
+    threads = []
+    emit.side_effect = lambda record: threads.append(threading.current_thread())
+
+    logger.info("hello")
+    flush_logging()
+
+    assert threads and all(thread is not caller for thread in threads)
+
+
+def test_disabled_levels_are_not_formatted(mocker):
+    shutdown_logging()
+    logger = setup_logger("test_lazy_format")
+    expensive = mocker.MagicMock()
+    expensive.__repr__ = mocker.MagicMock(return_value="expensive")
+
+    # ファイル出力がない場合、DEBUGレコードはキューに入れる前に捨てられる
+    logger.debug("%r", expensive)
+    flush_logging()
+
+    expensive.__repr__.assert_not_called()
+    assert setup_logger_module._queue_handler.level == logging.INFO
+
+
+def test_debug_to_file_is_opt_in(log_file, mocker):
+    logger = setup_logger("test_file_level", log_file=log_file)
+    expensive = mocker.MagicMock()
+    expensive.__repr__ = mocker.MagicMock(return_value="expensive")
+
+    # ファイルの既定のレベルは INFO のため、DEBUGのメッセージは組み立てない
+    assert not logger.isEnabledFor(logging.DEBUG)
+    logger.debug("%r", expensive)
+    flush_logging()
+    expensive.__repr__.assert_not_called()
+
+    set_file_log_level("DEBUG")
+    assert logger.isEnabledFor(logging.DEBUG)
+    logger.debug("%r", expensive)
+    flush_logging()
+
+    with open(log_file, encoding="utf-8") as f:
+        assert "expensive" in f.read()
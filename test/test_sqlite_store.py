@@ -0,0 +1,204 @@
+import pytest
+import json
+import sqlite3
+
+from content_extractor.dom_treeSt import DOMTreeSt
+from utils.change_rate import ChangeRatePolicy
+from utils.http_precheck import HttpValidators
+from utils.sqlite_store import (
+    SQLiteDataManager,
+    import_records_from_csv,
+    import_records_from_json,
+    open_sqlite_data_manager,
+)
+
+# =================================================================
+# sqlite_store.py のテスト
+# =================================================================
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = SQLiteDataManager(str(tmp_path / "data" / "store.sqlite3"))
+    yield manager
+    manager.close()
+
+
+def make_dom_tree(url="http://a.example/", links=("http://a.example/1",)):
+    dom_tree = DOMTreeSt(tag="div", links=list(links), css_selector_list=["div#main"])
+    dom_tree.url = url
+    dom_tree.web_type = "plane"
+    return dom_tree
+
+
+def test_schema_uses_wal_and_url_index(manager):
+    assert manager.conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    indexes = [row["name"] for row in manager.conn.execute("PRAGMA index_list(records)")]
+    assert "idx_records_url" in indexes
+
+def test_add_and_read_record(manager):
+    index = manager.add_record({"url": "http://a.example/", "css_selector_list": ["div", "main"]})
+
+    record = manager.get_record_as_dict(index)
+    assert record["url"] == "http://a.example/"
+    assert record["css_selector_list"] == ["div", "main"]
+    assert record["result_vl"] == "" and record["change_count"] == 0
+    assert manager.url_targets() == [(index, "http://a.example/")]
+    assert manager.get_url(index) == "http://a.example/"
+    with pytest.raises(KeyError):
+        manager.get_record_as_dict(999)
+
+def test_scan_result_is_committed_immediately(manager, tmp_path):
+    """更新はその場でコミットされ、別の接続からすぐに読める。"""
+    index = manager.add_record({"url": "http://a.example/"})
+    manager.update_scan_result(index, make_dom_tree(url="http://a.example/redirected"))
+
+    other = sqlite3.connect(manager.db_path)
+    row = other.execute("SELECT url, web_page_type, css_selector_list FROM records WHERE id = ?", (index,)).fetchone()
+    other.close()
+    assert row == ("http://a.example/redirected", "plane", '["div#main"]')
+
+def test_chk_diff_and_reset_baseline(manager):
+    unchanged = manager.add_record({"url": "http://a.example/", "result_vl": "h1"})
+    changed = manager.add_record({"url": "http://b.example/", "result_vl": "h2"})
+    manager.update_scan_result(unchanged, make_dom_tree(url="http://a.example/"))
+    manager.reset_baseline()
+    manager.update_scan_result(changed, make_dom_tree(url="http://b.example/", links=["http://b.example/new"]))
+
+    assert manager.chk_diff() == ["http://b.example/"]
+    manager.reset_baseline()
+    assert manager.chk_diff() == []
+
+def test_clear_scan_data_and_validators(manager):
+    index = manager.add_record({"url": "http://a.example/", "css_selector_list": ["div"], "full_scan_datetime": "x"})
+    manager.update_http_validators(index, HttpValidators(etag='"e"', content_length="10"))
+    assert manager.get_http_validators(index) == HttpValidators(etag='"e"', content_length="10")
+
+    manager.clear_scan_data(index)
+
+    record = manager.get_record_as_dict(index)
+    assert record["css_selector_list"] == [] and record["full_scan_datetime"] == ""
+    assert manager.get_http_validators(index).is_empty()
+
+def test_check_history_and_policy(manager):
+    index = manager.add_record({"url": "http://a.example/", "result_vl": "h", "css_selector_list": ["div"],
+                                "web_page_type": "plane"})
+    assert manager.can_skip_scan(index)
+    assert manager.decide_check(index, ChangeRatePolicy()).reason == "never checked"
+    assert manager.next_check_at(index, ChangeRatePolicy()) is None
+
+    manager.record_check(index, changed=False)
+    manager.record_check(index, changed=True)
+
+    record = manager.get_record_as_dict(index)
+    assert record["change_count"] == 1
+    assert record["last_checked_datetime"].endswith("Z")
+    assert manager.next_check_at(index, ChangeRatePolicy()) is not None
+
+def test_update_image_filename_by_url(manager):
+    index = manager.add_record({"url": "http://a.example/"})
+    manager.update_image_filename("http://a.example/", "/images/abc.png")
+    manager.update_image_filename("http://unknown.example/", "/images/x.png")
+    assert manager.get_record_as_dict(index)["image_filename"] == "abc.png"
+
+def test_df_snapshot_and_save_data(manager):
+    manager.add_record({"url": "http://a.example/", "css_selector_list": ["div"]})
+    manager.save_data()
+
+    df = manager.df
+    assert list(df["url"]) == ["http://a.example/"]
+    assert df.iloc[0]["css_selector_list"] == ["div"]
+    assert df.iloc[0]["run_code"].endswith("Z")
+
+
+# --- Tests for importers ---
+
+def test_import_from_json(manager, tmp_path):
+    json_path = tmp_path / "cheacker_url.json"
+    json_path.write_text(json.dumps([
+        {"url": "http://a.example/", "result_vl": "h1", "css_selector_list": ["div"], "web_page_type": "plane",
+         "content_length": 120, "image_filename": None},
+        {"url": "http://b.example/", "result_vl": "h2", "extra": "ignored"},
+    ]), encoding="utf-8")
+
+    assert import_records_from_json(manager, str(json_path)) == 2
+
+    assert manager.url_targets() == [(0, "http://a.example/"), (1, "http://b.example/")]
+    record = manager.get_record_as_dict(0)
+    assert record["css_selector_list"] == ["div"] and record["content_length"] == "120"
+    # 取り込んだ結果は通知済みとして扱う
+    assert manager.chk_diff() == []
+
+def test_import_from_legacy_csv(manager, tmp_path):
+    csv_path = tmp_path / "cheacker_url.csv"
+    csv_path.write_text(
+        "https://a.example/,2025-02-25 07:17:05,abc,2025-02-24 11:05:59,,div.list,0.0\n"
+        "https://b.example/,2025-02-25 07:17:05,def,20250129 07:50,,,plane\n",
+        encoding="utf-8")
+
+    assert import_records_from_csv(manager, str(csv_path)) == 2
+
+    first = manager.get_record_as_dict(0)
+    assert first["css_selector_list"] == ["div.list"] and first["web_page_type"] == ""
+    second = manager.get_record_as_dict(1)
+    assert second["css_selector_list"] == [] and second["web_page_type"] == "plane"
+
+def test_open_imports_only_once(tmp_path):
+    json_path = tmp_path / "cheacker_url.json"
+    json_path.write_text(json.dumps([{"url": "http://a.example/"}]), encoding="utf-8")
+    db_path = str(tmp_path / "store.sqlite3")
+
+    first = open_sqlite_data_manager(db_path, json_path=str(json_path))
+    first.add_record({"url": "http://b.example/"})
+    first.close()
+    second = open_sqlite_data_manager(db_path, json_path=str(json_path))
+
+    assert [url for _, url in second.url_targets()] == ["http://a.example/", "http://b.example/"]
+    second.close()
+
+def test_open_prepares_json_before_first_import(tmp_path):
+    """prepare_json はJSONを取り込む前に1度だけ呼ばれ、その結果が取り込まれる"""
+    json_path = tmp_path / "cheacker_url.json"
+    json_path.write_text(json.dumps([{"url": "http://a.example/", "result_vl": "old"}]), encoding="utf-8")
+    db_path = str(tmp_path / "store.sqlite3")
+    calls = []
+
+    def prepare_json(path):
+        calls.append(path)
+        json_path.write_text(json.dumps([{"url": "http://a.example/", "result_vl": "new"}]), encoding="utf-8")
+
+    first = open_sqlite_data_manager(db_path, json_path=str(json_path), prepare_json=prepare_json)
+    assert first.get_record_as_dict(0)["result_vl"] == "new"
+    first.close()
+    open_sqlite_data_manager(db_path, json_path=str(json_path), prepare_json=prepare_json).close()
+
+    assert calls == [str(json_path)]
+
+
+def test_timeout_count_is_reset_by_successful_check(manager):
+    index = manager.add_record({"url": "http://a.example/"})
+
+    manager.record_timeout(index)
+    manager.record_timeout(index)
+    assert manager.get_record_as_dict(index)["timeout_count"] == 2
+
+    manager.record_check(index, changed=False)
+    assert manager.get_record_as_dict(index)["timeout_count"] == 0
+
+
+def test_missing_columns_are_added_to_existing_database(tmp_path):
+    """以前のバージョンで作成したデータベースを開くと、追加された列が補われる。"""
+    db_path = tmp_path / "old.sqlite3"
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE records (id INTEGER PRIMARY KEY, url TEXT NOT NULL, "
+                 "result_vl TEXT NOT NULL DEFAULT '', baseline_result_vl TEXT NOT NULL DEFAULT '')")
+    conn.execute("INSERT INTO records (id, url) VALUES (0, 'http://a.example/')")
+    conn.commit()
+    conn.close()
+
+    manager = SQLiteDataManager(str(db_path))
+    try:
+        record = manager.get_record_as_dict(0)
+        assert record["timeout_count"] == 0
+        assert record["css_selector_list"] == []
+    finally:
+        manager.close()
@@ -0,0 +1,151 @@
+import asyncio
+import pytest
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+from content_extractor.static_scan import (
+    normalize_href,
+    extract_static_content,
+    fetch_html,
+    static_quick_extract,
+    QuickEngineSelector,
+    QUICK_ENGINE_STATIC,
+    QUICK_ENGINE_BROWSER,
+    QUICK_ENGINE_VERIFY,
+)
+
+# =================================================================
+# static_scan.py のテスト
+# =================================================================
+
+PAGE_URL = "https://example.com/news/index.html"
+
+SAMPLE_HTML = """
+<html><head><title>news</title></head>
+<body>
+  <nav><a href="/">home</a></nav>
+  <div id="content" class="list main">
+    <a href="item/2">Item 2</a>
+    <a href="/item/1?x=1">Item 1</a>
+    <a>no href</a>
+    <a href="/記事/3">Item 3</a>
+    <p>text <b>bold</b></p>
+  </div>
+</body></html>
+"""
+
+
+# --- Tests for normalize_href ---
+
+@pytest.mark.parametrize("href, expected", [
+    ("item/2", "https://example.com/news/item/2"),
+    ("/a/../b", "https://example.com/b"),
+    ("HTTPS://Example.COM:443/x", "https://example.com/x"),
+    ("http://example.com:8080", "http://example.com:8080/"),
+    ("/記事?q=あ b", "https://example.com/%E8%A8%98%E4%BA%8B?q=%E3%81%82%20b"),
+    ("#top", "https://example.com/news/index.html#top"),
+    ("  /trim  ", "https://example.com/trim"),
+    ("mailto:someone@example.com", "mailto:someone@example.com"),
+    ("javascript:void(0)", "javascript:void(0)"),
+])
+def test_normalize_href_matches_browser_href(href, expected):
+    """ブラウザの a.href と同じ形の絶対URLに正規化される。"""
+    assert normalize_href(PAGE_URL, href) == expected
+
+
+# --- Tests for extract_static_content ---
+
+def test_extract_static_content_first_matching_selector():
+    selector, node = extract_static_content(SAMPLE_HTML, PAGE_URL, ["section.gone", "div#content"])
+
+    assert selector == "div#content"
+    assert node.tag == "div"
+    assert node.id == "content"
+    assert node.css_selector == "div#content"
+    assert node.links == sorted([
+        "https://example.com/news/item/2",
+        "https://example.com/item/1?x=1",
+        "https://example.com/%E8%A8%98%E4%BA%8B/3",
+    ])
+    assert "bold" in node.text
+
+def test_extract_static_content_respects_base_href():
+    html = '<html><head><base href="https://cdn.example.org/root/"></head><body><main><a href="p">p</a></main></body></html>'
+    _, node = extract_static_content(html, PAGE_URL, ["main"])
+    assert node.links == ["https://cdn.example.org/root/p"]
+
+def test_extract_static_content_no_match_or_invalid_selector():
+    assert extract_static_content(SAMPLE_HTML, PAGE_URL, ["div[broken", "section.gone"]) is None
+
+
+# --- Tests for static_quick_extract ---
+
+@pytest.mark.asyncio
+async def test_static_quick_extract_reorders_selectors(mocker):
+    mocker.patch('content_extractor.static_scan.fetch_html', new_callable=AsyncMock, return_value=(PAGE_URL, SAMPLE_HTML))
+    selectors = ["section.gone", "div.list.main"]
+
+    node = await static_quick_extract(PAGE_URL, MagicMock(), selectors, "plane")
+
+    assert node.css_selector_list == ["div.list.main", "section.gone"]
+    assert node.url == PAGE_URL
+    assert node.web_type == "plane"
+
+@pytest.mark.asyncio
+async def test_static_quick_extract_fetch_failure(mocker):
+    mocker.patch('content_extractor.static_scan.fetch_html', new_callable=AsyncMock, return_value=None)
+    assert await static_quick_extract(PAGE_URL, MagicMock(), ["div"], "plane") is None
+
+
+# --- Tests for fetch_html ---
+
+@pytest.mark.asyncio
+async def test_fetch_html_timeout_returns_none():
+    """aiohttp のタイムアウト (asyncio.TimeoutError) は取得失敗として扱う。"""
+    session = MagicMock()
+    session.get.return_value.__aenter__ = AsyncMock(side_effect=asyncio.TimeoutError())
+    session.get.return_value.__aexit__ = AsyncMock(return_value=False)
+
+    assert await fetch_html(PAGE_URL, session) is None
+
+
+# --- Tests for QuickEngineSelector ---
+
+def test_engine_selector_promotes_after_consecutive_matches(tmp_path):
+    selector = QuickEngineSelector(state_path=str(tmp_path / "state.json"), promote_after=2)
+    url = "https://example.com/"
+
+    assert selector.choose(url) == QUICK_ENGINE_VERIFY
+    selector.record(url, matched=True)
+    assert selector.choose(url) == QUICK_ENGINE_BROWSER
+    selector.record(url, matched=True)
+    assert selector.choose(url) == QUICK_ENGINE_STATIC
+
+def test_engine_selector_demotes_on_mismatch(tmp_path):
+    selector = QuickEngineSelector(state_path=str(tmp_path / "state.json"), promote_after=1)
+    url = "https://example.com/"
+    selector.record(url, matched=True)
+    selector.record(url, matched=False)
+    assert selector.choose(url) == QUICK_ENGINE_BROWSER
+    assert selector.state[url]["mismatches"] == 1
+
+def test_engine_selector_reverifies_periodically(tmp_path):
+    selector = QuickEngineSelector(state_path=str(tmp_path / "state.json"), promote_after=1, reverify_interval=3)
+    url = "https://example.com/"
+    selector.record(url, matched=True)
+    assert [selector.choose(url) for _ in range(3)] == [QUICK_ENGINE_STATIC, QUICK_ENGINE_STATIC, QUICK_ENGINE_VERIFY]
+
+def test_engine_selector_persists_between_runs(tmp_path):
+    path = tmp_path / "sub" / "state.json"
+    first = QuickEngineSelector(state_path=str(path), promote_after=1)
+    first.record("https://example.com/", matched=True)
+    first.save()
+
+    assert json.loads(path.read_text(encoding="utf-8"))["https://example.com/"]["engine"] == QUICK_ENGINE_STATIC
+    second = QuickEngineSelector(state_path=str(path), promote_after=1)
+    assert second.choose("https://example.com/") == QUICK_ENGINE_STATIC
+
+def test_engine_selector_without_parser_uses_browser(tmp_path, mocker):
+    mocker.patch('content_extractor.static_scan.LexborHTMLParser', None)
+    selector = QuickEngineSelector(state_path=str(tmp_path / "state.json"))
+    assert selector.choose("https://example.com/") == QUICK_ENGINE_BROWSER
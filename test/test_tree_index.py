@@ -0,0 +1,99 @@
+import pytest
+from content_extractor.dom_treeSt import DOMTreeSt, BoundingBox
+from content_extractor.tree_index import TreeIndex
+from content_extractor.dom_utils import flatten_dom_tree, rescore_main_content_with_children
+from content_extractor.scorer import MainContentScorer
+
+# =================================================================
+# tree_index.py のテスト
+# =================================================================
+
+@pytest.fixture
+def complex_dom_tree():
+    # body
+    #   header
+    #   main
+    #     article
+    #       p1
+    #       img
+    #     aside
+    #   footer
+    p1 = DOMTreeSt(tag='p', text='a' * 80, rect=BoundingBox(100, 120, 600, 300), depth=3, links=['http://a/1'])
+    img = DOMTreeSt(tag='img', rect=BoundingBox(100, 420, 600, 200), depth=3)
+    article = DOMTreeSt(tag='article', text='a' * 100, rect=BoundingBox(100, 100, 650, 600), depth=2, children=[p1, img])
+    aside = DOMTreeSt(tag='aside', text='side', rect=BoundingBox(800, 100, 150, 600), depth=2)
+    main = DOMTreeSt(tag='main', text='a' * 120, rect=BoundingBox(80, 80, 900, 700), depth=1, children=[article, aside])
+    header = DOMTreeSt(tag='header', rect=BoundingBox(0, 0, 1000, 80), depth=1)
+    footer = DOMTreeSt(tag='footer', rect=BoundingBox(0, 800, 1000, 100), depth=1)
+    body = DOMTreeSt(tag='body', rect=BoundingBox(0, 0, 1000, 900), depth=0, children=[header, main, footer])
+    return body, header, main, footer, article, p1, img, aside
+
+
+def test_tree_index_preorder_matches_flatten(complex_dom_tree):
+    body = complex_dom_tree[0]
+    index = TreeIndex(body)
+    assert index.nodes == flatten_dom_tree(body)
+    assert len(index) == 8
+
+
+def test_tree_index_parent_level_and_ranges(complex_dom_tree):
+    body, header, main, footer, article, p1, img, aside = complex_dom_tree
+    index = TreeIndex(body)
+
+    assert index.parent[index.position(body)] == -1
+    assert index.parent[index.position(p1)] == index.position(article)
+    assert index.level[index.position(img)] == 3
+
+    assert index.subtree(main) == [main, article, p1, img, aside]
+    assert index.subtree(article) == [article, p1, img]
+    assert index.subtree(footer) == [footer]
+    assert index.subtree(body) == index.nodes
+
+
+def test_tree_index_contains(complex_dom_tree):
+    index = TreeIndex(complex_dom_tree[0])
+    assert complex_dom_tree[2] in index
+    assert DOMTreeSt(tag='main') not in index
+    with pytest.raises(KeyError):
+        index.position(DOMTreeSt(tag='main'))
+
+
+def test_tree_index_handles_very_deep_tree():
+    """再帰上限を大きく超える深さでも構築・スライスできる。"""
+    root = DOMTreeSt(tag='div', depth=0)
+    node = root
+    for depth in range(1, 5000):
+        child = DOMTreeSt(tag='div', depth=depth)
+        node.add_child(child)
+        node = child
+
+    index = TreeIndex(root)
+    assert len(index) == 5000
+    assert len(index.subtree(root.children[0])) == 4999
+    assert len(flatten_dom_tree(root)) == 5000
+
+
+def test_rescore_with_index_matches_scorer(complex_dom_tree):
+    """インデックス経由の再スコアが、部分木を直接スコアリングした結果と一致する。"""
+    body, header, main, footer, article, p1, img, aside = complex_dom_tree
+    index = TreeIndex(body)
+
+    rescored = rescore_main_content_with_children(main, index)
+    indexed_scores = {id(n): n.score for n in rescored}
+
+    expected = MainContentScorer([main], main.rect.width, main.rect.height).score_parent_and_children()
+    expected_scores = {id(n): n.score for n in expected}
+
+    assert [n.tag for n in rescored] == [n.tag for n in expected]
+    assert len(rescored) == 5
+    for key, score in expected_scores.items():
+        assert indexed_scores[key] == pytest.approx(score)
+    assert rescored[0].score >= rescored[-1].score
+
+
+def test_rescore_with_index_falls_back_for_unindexed_node(complex_dom_tree):
+    index = TreeIndex(complex_dom_tree[0])
+    orphan = DOMTreeSt(tag='div', text='a', rect=BoundingBox(0, 0, 100, 100), depth=1,
+                       children=[DOMTreeSt(tag='p', text='b', rect=BoundingBox(0, 0, 50, 50), depth=2)])
+    rescored = rescore_main_content_with_children(orphan, index)
+    assert {n.tag for n in rescored} == {'div', 'p'}
@@ -0,0 +1,160 @@
+import math
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+DEFAULT_CHANGE_PROBABILITY_THRESHOLD = 0.1
+DEFAULT_MAX_STALENESS_HOURS = 24.0
+# 事前分布: 履歴のないURLは「1日に1回程度変化する」とみなし、観測が増えるほど実績の比率に近づく
+DEFAULT_PRIOR_CHANGES = 1.0
+DEFAULT_PRIOR_SECONDS = float(SECONDS_PER_DAY)
+
+
+def estimate_change_rate(change_count: float,
+                         observed_seconds: float,
+                         prior_changes: float = DEFAULT_PRIOR_CHANGES,
+                         prior_seconds: float = DEFAULT_PRIOR_SECONDS) -> float:
+    """
+    変化をポアソン過程とみなし、1秒あたりの変化率を推定します。
+    ガンマ事前分布の事後平均 (変化回数 + 事前回数) / (観測時間 + 事前時間) を返します。
+    """
+    return (max(0.0, change_count) + prior_changes) / (max(0.0, observed_seconds) + prior_seconds)
+
+
+def change_probability(rate: float, elapsed_seconds: float) -> float:
+    """変化率 rate のポアソン過程で、elapsed_seconds の間に1回以上変化する確率"""
+    return 1.0 - math.exp(-rate * max(0.0, elapsed_seconds))
+
+
+def parse_checked_datetime(value) -> Optional[datetime]:
+    """`last_checked_datetime` (UTCのISO 8601文字列) を datetime に変換する。未設定・不正な値は None"""
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        parsed = datetime.fromisoformat(value[:-1] + "+00:00" if value.endswith("Z") else value)
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def has_complete_scan(record: dict) -> bool:
+    """前回のスキャン結果 (ハッシュ・セレクタ・ページ種別) が揃っているレコードか"""
+    return bool(record.get("result_vl")) and bool(record.get("css_selector_list")) and bool(record.get("web_page_type"))
+
+
+def updated_check_history(record: dict, changed: bool, now: Optional[datetime] = None) -> dict:
+    """
+    内容を確認できた時点でのチェック履歴 (last_checked_datetime / change_count / observed_seconds) の新しい値を返す。
+    前回チェックからの経過時間を観測時間に加え、変化を検出した場合は変化回数を1増やす。
+    """
+    now = now or datetime.now(timezone.utc)
+    observed_seconds = float(record.get("observed_seconds") or 0.0)
+    last_checked = parse_checked_datetime(record.get("last_checked_datetime"))
+    if last_checked is not None:
+        observed_seconds += max(0.0, (now - last_checked).total_seconds())
+    return {
+        "last_checked_datetime": now.isoformat().replace("+00:00", "Z"),
+        "change_count": int(record.get("change_count") or 0) + (1 if changed else 0),
+        "observed_seconds": observed_seconds,
+    }
+
+
+@dataclass
+class CheckDecision:
+    check: bool
+    reason: str
+    probability: float = 1.0
+    rate_per_day: float = 0.0
+    elapsed_hours: float = 0.0
+
+
+@dataclass
+class ChangeRatePolicy:
+    """
+    URLごとの変化率から、今回の実行でチェックするかを判断するポリシー。
+
+    - 前回チェック以降に変化している確率が `threshold` 未満ならスキップします。
+    - ただし前回チェックから `max_staleness_hours` 以上経過したURLは必ずチェックします。
+    """
+    enabled: bool = True
+    threshold: float = DEFAULT_CHANGE_PROBABILITY_THRESHOLD
+    max_staleness_hours: float = DEFAULT_MAX_STALENESS_HOURS
+    prior_changes: float = DEFAULT_PRIOR_CHANGES
+    prior_seconds: float = DEFAULT_PRIOR_SECONDS
+
+    @classmethod
+    def from_config(cls, config: Optional[dict]) -> "ChangeRatePolicy":
+        config = config or {}
+        return cls(
+            enabled=config.get("enabled", True),
+            threshold=config.get("change_probability_threshold", DEFAULT_CHANGE_PROBABILITY_THRESHOLD),
+            max_staleness_hours=config.get("max_staleness_hours", DEFAULT_MAX_STALENESS_HOURS),
+            prior_changes=config.get("prior_changes", DEFAULT_PRIOR_CHANGES),
+            prior_seconds=config.get("prior_days", DEFAULT_PRIOR_SECONDS / SECONDS_PER_DAY) * SECONDS_PER_DAY,
+        )
+
+    def decide(self,
+               last_checked: Optional[datetime],
+               change_count: float,
+               observed_seconds: float,
+               now: Optional[datetime] = None) -> CheckDecision:
+        if not self.enabled:
+            return CheckDecision(True, "adaptive scheduling disabled")
+        if last_checked is None:
+            return CheckDecision(True, "never checked")
+
+        now = now or datetime.now(timezone.utc)
+        elapsed_seconds = (now - last_checked).total_seconds()
+        rate = estimate_change_rate(change_count, observed_seconds, self.prior_changes, self.prior_seconds)
+        probability = change_probability(rate, elapsed_seconds)
+        decision = CheckDecision(
+            check=True,
+            reason="",
+            probability=probability,
+            rate_per_day=rate * SECONDS_PER_DAY,
+            elapsed_hours=elapsed_seconds / 3600,
+        )
+
+        if decision.elapsed_hours >= self.max_staleness_hours:
+            decision.reason = f"max staleness reached ({decision.elapsed_hours:.1f}h >= {self.max_staleness_hours}h)"
+        elif probability >= self.threshold:
+            decision.reason = f"change probability {probability:.2f} >= {self.threshold}"
+        else:
+            decision.check = False
+            decision.reason = f"change probability {probability:.2f} < {self.threshold}"
+        return decision
+
+    def next_check_delay(self, change_count: float, observed_seconds: float) -> float:
+        """
+        前回チェックから、変化している確率が `threshold` に達するまでの秒数を返します。
+        (`max_staleness_hours` を上限とします。常駐モードの次回チェック時刻の計算に使用)
+        """
+        max_staleness_seconds = self.max_staleness_hours * 3600
+        rate = estimate_change_rate(change_count, observed_seconds, self.prior_changes, self.prior_seconds)
+        if rate <= 0 or self.threshold >= 1:
+            return max_staleness_seconds
+        return min(-math.log(1.0 - self.threshold) / rate, max_staleness_seconds)
+
+    def decide_for_record(self, record: dict, now: Optional[datetime] = None) -> CheckDecision:
+        """DataManager のレコードについて、今回の実行で確認するかを判断する"""
+        if not has_complete_scan(record):
+            return CheckDecision(True, "no complete previous scan")
+        return self.decide(
+            parse_checked_datetime(record.get("last_checked_datetime")),
+            float(record.get("change_count") or 0),
+            float(record.get("observed_seconds") or 0.0),
+            now=now,
+        )
+
+    def next_check_at(self, record: dict) -> Optional[float]:
+        """
+        レコードを次回チェックすべき時刻 (UNIX時刻) を返す。
+        前回のスキャン結果が揃っていない場合や間引きが無効な場合は None (すぐにチェックする)。
+        """
+        last_checked = parse_checked_datetime(record.get("last_checked_datetime"))
+        if not self.enabled or not has_complete_scan(record) or last_checked is None:
+            return None
+        delay = self.next_check_delay(float(record.get("change_count") or 0), float(record.get("observed_seconds") or 0.0))
+        return last_checked.timestamp() + delay
@@ -0,0 +1,136 @@
+import asyncio
+import heapq
+import json
+import os
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+from aiohttp import web
+
+from setup_logger import setup_logger
+logger = setup_logger("daemon")
+
+
+def _isoformat(timestamp: Optional[float]) -> Optional[str]:
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+class DueQueue:
+    """
+    次回チェック時刻 (UNIX時刻) 順にレコードを取り出すキュー。
+    同じレコードを再登録した場合は最後に登録した時刻が有効になります。
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int]] = []
+        self._due: Dict[int, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def __contains__(self, index: int) -> bool:
+        return index in self._due
+
+    def push(self, index: int, due_at: float) -> None:
+        self._due[index] = due_at
+        heapq.heappush(self._heap, (due_at, index))
+
+    def _discard_stale(self) -> None:
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def next_due(self) -> Optional[float]:
+        """最も早いチェック時刻。キューが空なら None"""
+        self._discard_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def due_count(self, now: float) -> int:
+        return sum(1 for due_at in self._due.values() if due_at <= now)
+
+    def pop_due(self, now: float, limit: Optional[int] = None) -> List[int]:
+        """チェック時刻を過ぎたレコードを早い順に取り出す"""
+        indices = []
+        while limit is None or len(indices) < limit:
+            self._discard_stale()
+            if not self._heap or self._heap[0][0] > now:
+                break
+            _, index = heapq.heappop(self._heap)
+            del self._due[index]
+            indices.append(index)
+        return indices
+
+
+class DaemonStatus:
+    """
+    常駐モードの状態 (キューの長さ・処理中のURL・直近のサイクル結果) を保持し、
+    JSONファイルへの書き出しとローカルのHTTPエンドポイントで公開します。
+    """
+
+    def __init__(self, queue: DueQueue, path: Optional[str] = None):
+        self.queue = queue
+        self.path = path
+        self.state = "starting"
+        self.started_at = time.time()
+        self.in_flight: Set[str] = set()
+        self.cycles = 0
+        self.last_cycle: Dict = {}
+        self.last_cycle_at: Optional[float] = None
+
+    def record_cycle(self, stats: Dict) -> None:
+        self.cycles += 1
+        self.last_cycle = dict(stats)
+        self.last_cycle_at = time.time()
+
+    def snapshot(self) -> Dict:
+        now = time.time()
+        return {
+            "state": self.state,
+            "pid": os.getpid(),
+            "started_at": _isoformat(self.started_at),
+            "updated_at": _isoformat(now),
+            "queue_depth": len(self.queue),
+            "due_now": self.queue.due_count(now),
+            "next_due_at": _isoformat(self.queue.next_due()),
+            "in_flight": sorted(self.in_flight),
+            "in_flight_count": len(self.in_flight),
+            "cycles": self.cycles,
+            "last_cycle_at": _isoformat(self.last_cycle_at),
+            "last_cycle": self.last_cycle,
+        }
+
+    def write(self) -> None:
+        """状態をJSONファイルへ書き出す (一時ファイル経由で置き換えるため、読み手が壊れた内容を見ることはない)"""
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not write daemon status '{self.path}': {e}")
+
+    async def run_writer(self, interval: float) -> None:
+        """interval 秒ごとに状態ファイルを更新し続ける (キャンセルされるまで)"""
+        while True:
+            self.write()
+            await asyncio.sleep(interval)
+
+    async def start_server(self, host: str = "127.0.0.1", port: int = 8765) -> web.AppRunner:
+        """`GET /status` で状態をJSONとして返すローカルHTTPサーバーを起動する"""
+        async def handle_status(request):
+            return web.json_response(self.snapshot())
+
+        app = web.Application()
+        app.router.add_get("/status", handle_status)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        logger.info(f"Daemon status endpoint: http://{host}:{port}/status")
+        return runner
@@ -0,0 +1,158 @@
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, List, Optional, TypeVar
+from urllib.parse import urlsplit
+
+from setup_logger import setup_logger
+logger = setup_logger("host_scheduler")
+
+T = TypeVar("T")
+
+DEFAULT_PER_HOST_CONCURRENCY = 1
+DEFAULT_MIN_INTERVAL_SECONDS = 1.0
+
+
+@dataclass
+class HostLimit:
+    # 同一ホストへの同時処理数の上限
+    concurrency: int = DEFAULT_PER_HOST_CONCURRENCY
+    # 同一ホストへの処理開始の最小間隔 (秒)
+    min_interval: float = DEFAULT_MIN_INTERVAL_SECONDS
+
+
+def host_of(url: str) -> str:
+    """スケジューリングの単位となるホスト名 (小文字、ポートなし) を返す"""
+    try:
+        return (urlsplit(url).hostname or "").lower()
+    except ValueError:
+        return ""
+
+
+class HostScheduler:
+    """
+    ホストごとの同時実行数と処理開始間隔を守りながら、全体の同時実行数まで並列に処理するスケジューラ。
+
+    URLはホストごとのキューに振り分けられ、ワーカーは空きのあるホストをラウンドロビンで選びます。
+    あるホストが間隔待ちの間も他のホストのURLを処理するため、特定ホストへの集中を避けつつ全体の処理量を保てます。
+    """
+
+    def __init__(self,
+                 concurrency: int,
+                 per_host_concurrency: int = DEFAULT_PER_HOST_CONCURRENCY,
+                 min_interval: float = DEFAULT_MIN_INTERVAL_SECONDS,
+                 host_limits: Optional[Dict[str, HostLimit]] = None):
+        self.concurrency = max(1, concurrency)
+        self.default_limit = HostLimit(max(1, per_host_concurrency), max(0.0, min_interval))
+        self.host_limits = {host.lower(): limit for host, limit in (host_limits or {}).items()}
+
+    @classmethod
+    def from_config(cls, concurrency: int, config: Optional[dict]) -> "HostScheduler":
+        """
+        config.yaml の `politeness` セクションからスケジューラを作成する。
+
+        politeness:
+          per_host_concurrency: 1
+          min_interval: 1.0
+          hosts:
+            example.com: {concurrency: 2, min_interval: 0.5}
+        """
+        config = config or {}
+        per_host = config.get("per_host_concurrency", DEFAULT_PER_HOST_CONCURRENCY)
+        interval = config.get("min_interval", DEFAULT_MIN_INTERVAL_SECONDS)
+        host_limits = {}
+        for host, limit in (config.get("hosts") or {}).items():
+            limit = limit or {}
+            host_limits[host] = HostLimit(
+                concurrency=max(1, limit.get("concurrency", per_host)),
+                min_interval=max(0.0, limit.get("min_interval", interval)),
+            )
+        return cls(concurrency, per_host, interval, host_limits)
+
+    def limit_for(self, host: str) -> HostLimit:
+        """ホストの制限を返す。`example.com` の設定は `www.example.com` などのサブドメインにも適用される。"""
+        labels = host.split(".")
+        for i in range(len(labels)):
+            limit = self.host_limits.get(".".join(labels[i:]))
+            if limit is not None:
+                return limit
+        return self.default_limit
+
+    async def run(self,
+                  items: Iterable[T],
+                  handler: Callable[[T], Awaitable[Any]],
+                  url_of: Callable[[T], str] = lambda item: item,
+                  priority_of: Optional[Callable[[T], float]] = None) -> None:
+        """
+        全アイテムを handler で処理し、すべて完了するまで待機します。
+        handler の例外は呼び出し側で処理されている前提で、ここではログに記録して次へ進みます。
+        priority_of を指定した場合、値の小さいアイテムから処理します (同じ値の中では元の順序を保ちます)。
+        """
+        if priority_of is not None:
+            items = sorted(items, key=priority_of)
+        queues: Dict[str, Deque[T]] = {}
+        for item in items:
+            queues.setdefault(host_of(url_of(item)), deque()).append(item)
+        total = sum(len(queue) for queue in queues.values())
+        if not total:
+            return
+
+        loop = asyncio.get_running_loop()
+        hosts: List[str] = list(queues)
+        limits = {host: self.limit_for(host) for host in hosts}
+        active = {host: 0 for host in hosts}
+        next_start = {host: 0.0 for host in hosts}
+        cursor = 0
+        remaining = total
+        condition = asyncio.Condition()
+        logger.info(f"Scheduling {total} URLs across {len(hosts)} hosts with {self.concurrency} workers")
+
+        def pick_host(now: float) -> Optional[str]:
+            # 処理可能なホストのうち、先頭アイテムの優先度が最も高い (値が小さい) ホストをラウンドロビン順に選ぶ
+            nonlocal cursor
+            best = None
+            for offset in range(len(hosts)):
+                host = hosts[(cursor + offset) % len(hosts)]
+                if queues[host] and active[host] < limits[host].concurrency and next_start[host] <= now:
+                    priority = priority_of(queues[host][0]) if priority_of is not None else 0
+                    if best is None or priority < best[0]:
+                        best = (priority, offset, host)
+            if best is None:
+                return None
+            cursor = (cursor + best[1] + 1) % len(hosts)
+            return best[2]
+
+        def seconds_until_ready(now: float) -> Optional[float]:
+            waits = [next_start[host] - now for host in hosts
+                     if queues[host] and active[host] < limits[host].concurrency]
+            return max(0.0, min(waits)) if waits else None
+
+        async def worker() -> None:
+            nonlocal remaining
+            while True:
+                async with condition:
+                    while True:
+                        if remaining == 0:
+                            return
+                        now = loop.time()
+                        host = pick_host(now)
+                        if host is not None:
+                            break
+                        try:
+                            await asyncio.wait_for(condition.wait(), timeout=seconds_until_ready(now))
+                        except asyncio.TimeoutError:
+                            pass
+                    item = queues[host].popleft()
+                    remaining -= 1
+                    active[host] += 1
+                    next_start[host] = now + limits[host].min_interval
+                try:
+                    await handler(item)
+                except Exception as e:
+                    logger.error(f"Unhandled error while processing {url_of(item)}: {e}")
+                finally:
+                    async with condition:
+                        active[host] -= 1
+                        condition.notify_all()
+
+        await asyncio.gather(*(worker() for _ in range(min(self.concurrency, total))))
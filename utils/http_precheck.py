@@ -0,0 +1,163 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Optional, Tuple
+
+import aiohttp
+
+from setup_logger import setup_logger
+logger = setup_logger("http_precheck")
+
+DEFAULT_PRECHECK_CONCURRENCY = 10
+DEFAULT_PRECHECK_TIMEOUT_SECONDS = 10
+
+
+@dataclass
+class HttpValidators:
+    """
+    HTTPキャッシュ検証用のレスポンスヘッダ (ETag / Last-Modified / Content-Length)。
+    DataManager のレコードにはそれぞれ文字列として保存します (未取得は空文字)。
+    """
+    etag: str = ""
+    last_modified: str = ""
+    content_length: str = ""
+
+    @classmethod
+    def from_record(cls, record: dict) -> "HttpValidators":
+        return cls(
+            etag=str(record.get("etag") or ""),
+            last_modified=str(record.get("last_modified") or ""),
+            content_length=str(record.get("content_length") or ""),
+        )
+
+    @classmethod
+    def from_headers(cls, headers) -> "HttpValidators":
+        return cls(
+            etag=headers.get("ETag", "") or "",
+            last_modified=headers.get("Last-Modified", "") or "",
+            content_length=headers.get("Content-Length", "") or "",
+        )
+
+    def to_record(self) -> dict:
+        return {
+            "etag": self.etag,
+            "last_modified": self.last_modified,
+            "content_length": self.content_length,
+        }
+
+    def is_empty(self) -> bool:
+        return not (self.etag or self.last_modified or self.content_length)
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """条件付きリクエスト用のヘッダ (If-None-Match / If-Modified-Since) を返す"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+@dataclass
+class PrecheckResult:
+    url: str
+    # サーバーが「変更なし」と判断できた場合 True (ブラウザでのスキャンを省略できる)
+    not_modified: bool = False
+    # 今回のレスポンスで得られた検証用ヘッダ (スキャン成功後にレコードへ保存する)
+    validators: HttpValidators = field(default_factory=HttpValidators)
+    status: Optional[int] = None
+    error: str = ""
+
+
+def is_not_modified(status: int,
+                    stored: HttpValidators,
+                    current: HttpValidators,
+                    trust_content_length: bool = False
+                    ) -> bool:
+    """
+    レスポンスから「前回から変更なし」と判断できるかを返します。
+
+    - 304 Not Modified は変更なし。
+    - 条件付きヘッダを無視して 200 を返すサーバーでも、ETag または Last-Modified が
+      前回と一致すれば変更なしとみなします。
+    - どちらのヘッダもない場合、`trust_content_length` が有効なときだけ Content-Length の一致で判断します。
+    """
+    if status == 304:
+        return True
+    if status != 200:
+        return False
+    if stored.etag and current.etag:
+        return stored.etag == current.etag
+    if stored.last_modified and current.last_modified:
+        return stored.last_modified == current.last_modified
+    if trust_content_length and stored.content_length and current.content_length:
+        return stored.content_length == current.content_length
+    return False
+
+
+async def precheck_url(url: str,
+                       stored: HttpValidators,
+                       session: aiohttp.ClientSession,
+                       timeout: int = DEFAULT_PRECHECK_TIMEOUT_SECONDS,
+                       trust_content_length: bool = False
+                       ) -> PrecheckResult:
+    """
+    1つのURLに条件付きGETを送り、変更の有無を判定します。
+    本文は読み込まずにヘッダのみで判断します。通信に失敗した場合は「変更あり」として扱います。
+    """
+    try:
+        async with session.get(url,
+                               headers=stored.conditional_headers(),
+                               timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            current = HttpValidators.from_headers(response.headers)
+            if response.status == 304:
+                # 304 では検証用ヘッダが省略されることがあるため、欠けた値は前回の値を引き継ぐ
+                current = HttpValidators(
+                    etag=current.etag or stored.etag,
+                    last_modified=current.last_modified or stored.last_modified,
+                    content_length=stored.content_length,
+                )
+            not_modified = is_not_modified(response.status, stored, current, trust_content_length)
+            return PrecheckResult(url=url, not_modified=not_modified, validators=current, status=response.status)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.debug(f"Pre-check failed: {url} - {e}")
+        return PrecheckResult(url=url, validators=stored, error=str(e) or type(e).__name__)
+
+
+async def precheck_urls(targets: Iterable[Tuple[str, HttpValidators]],
+                        concurrency: int = DEFAULT_PRECHECK_CONCURRENCY,
+                        timeout: int = DEFAULT_PRECHECK_TIMEOUT_SECONDS,
+                        trust_content_length: bool = False,
+                        session: Optional[aiohttp.ClientSession] = None
+                        ) -> Dict[str, PrecheckResult]:
+    """
+    複数URLの条件付きGETを、同時実行数を制限して非同期にまとめて送信します。
+
+    Args:
+        targets: (URL, 保存済みの検証用ヘッダ) のイテラブル
+        concurrency: 同時リクエスト数の上限
+        session: 既存のセッションを使う場合に指定 (省略時はこの関数内で作成して閉じる)
+    Returns:
+        URLをキーとした PrecheckResult の辞書
+    """
+    targets = list(targets)
+    if not targets:
+        return {}
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def _check(url: str, stored: HttpValidators) -> PrecheckResult:
+        async with semaphore:
+            return await precheck_url(url, stored, session, timeout, trust_content_length)
+
+    owns_session = session is None
+    if owns_session:
+        session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=max(1, concurrency)))
+    try:
+        results = await asyncio.gather(*(_check(url, stored) for url, stored in targets))
+    finally:
+        if owns_session:
+            await session.close()
+
+    not_modified = sum(1 for result in results if result.not_modified)
+    logger.info(f"Pre-check finished: {not_modified}/{len(results)} URLs not modified")
+    return {result.url: result for result in results}
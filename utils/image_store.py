@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+import re
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from setup_logger import setup_logger
+logger = setup_logger("image_store")
+
+# 1URLあたりに保持するスクリーンショットの数 (新しいものから)
+DEFAULT_KEEP_PER_URL = 5
+# オブジェクトのファイル名: <画像のSHA-256>.<拡張子>
+OBJECT_NAME_PATTERN = re.compile(r"^[0-9a-f]{64}\.[a-z0-9]+$")
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _entry_objects(entry: Dict[str, str]) -> List[str]:
+    return [entry[key] for key in ("object", "context") if entry.get(key)]
+
+
+class ImageStore:
+    """
+    スクリーンショットを、エンコード済み画像のハッシュをファイル名としたオブジェクトとして保存します。
+
+    - 同じ画像は1つのオブジェクトにまとめられ、変更が行き来するページでも書き直しません。
+    - URLごとの保存履歴をインデックス (JSON) に記録し、gc() で
+      URLごとに直近 keep_per_url 件を超えたものと、合計サイズが max_bytes を超えた分の古いものを削除します
+      (各URLの最新の1件は残します)。
+    - オブジェクトは images ディレクトリの直下に置くため、image_filename (ファイル名) でそのまま参照できます。
+      オブジェクト名の形式でないファイル (以前のファイル名規則の画像など) は削除しません。
+    """
+
+    def __init__(self,
+                 image_dir: str,
+                 index_path: str,
+                 keep_per_url: int = DEFAULT_KEEP_PER_URL,
+                 max_bytes: Optional[int] = None):
+        self.image_dir = image_dir
+        self.index_path = index_path
+        self.keep_per_url = max(1, keep_per_url)
+        self.max_bytes = max_bytes
+        # URL -> [{"object": オブジェクト名, "context": 周辺画像のオブジェクト名 (任意), "stored": 保存日時}] (古い順)
+        self.history: Dict[str, List[Dict[str, str]]] = {}
+        self.load()
+
+    def load(self) -> None:
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                self.history = json.load(f).get("urls", {})
+        except FileNotFoundError:
+            self.history = {}
+        except (json.JSONDecodeError, OSError, AttributeError) as e:
+            logger.warning(f"Could not load image store index '{self.index_path}': {e}")
+            self.history = {}
+
+    def save(self) -> None:
+        directory = os.path.dirname(self.index_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"urls": self.history}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    def object_path(self, name: str) -> str:
+        return os.path.join(self.image_dir, name)
+
+    def _store_object(self, path: str) -> str:
+        """画像ファイルをオブジェクトとして移し、オブジェクト名を返す (同じ内容が既にあれば元のファイルを削除する)"""
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        extension = os.path.splitext(path)[1].lower() or ".png"
+        name = f"{digest.hexdigest()}{extension}"
+        object_path = self.object_path(name)
+
+        if os.path.exists(object_path):
+            logger.debug(f"Image '{path}' is identical to stored object {name}")
+            if os.path.abspath(path) != os.path.abspath(object_path):
+                os.remove(path)
+        else:
+            os.makedirs(self.image_dir, exist_ok=True)
+            os.replace(path, object_path)
+        return name
+
+    def put(self, url: str, path: str, context_path: Optional[str] = None) -> str:
+        """
+        書き出し済みの画像ファイル (と周辺画像) をストアに移してURLの履歴に加え、オブジェクトのパスを返す。
+        直前と同じ画像の場合は履歴を増やさない。
+        """
+        entry = {"object": self._store_object(path)}
+        if context_path:
+            entry["context"] = self._store_object(context_path)
+
+        entries = self.history.setdefault(url, [])
+        last = entries[-1] if entries else {}
+        if last.get("object") != entry["object"] or last.get("context") != entry.get("context"):
+            entry["stored"] = _now_iso()
+            entries.append(entry)
+        return self.object_path(entry["object"])
+
+    def latest(self, url: str) -> Optional[str]:
+        entries = self.history.get(url)
+        return self.object_path(entries[-1]["object"]) if entries else None
+
+    def _object_size(self, name: str) -> int:
+        try:
+            return os.path.getsize(self.object_path(name))
+        except OSError:
+            return 0
+
+    def gc(self) -> Dict[str, int]:
+        """
+        保持数と合計サイズの上限に従って履歴を整理し、どの履歴からも参照されないオブジェクトを削除する。
+        実行の終わりに呼び出す。
+        """
+        for url, entries in self.history.items():
+            if len(entries) > self.keep_per_url:
+                del entries[:-self.keep_per_url]
+
+        refcount: Dict[str, int] = {}
+        for entries in self.history.values():
+            for entry in entries:
+                for name in _entry_objects(entry):
+                    refcount[name] = refcount.get(name, 0) + 1
+        total_bytes = sum(self._object_size(name) for name in refcount)
+
+        if self.max_bytes is not None and total_bytes > self.max_bytes:
+            # 各URLの最新以外の履歴を古い順に外し、参照されなくなったオブジェクトの分だけ減らす
+            candidates = sorted(
+                ((entry["stored"], url, entry)
+                 for url, entries in self.history.items()
+                 for entry in entries[:-1]),
+                key=lambda candidate: candidate[:2],
+            )
+            for _, url, entry in candidates:
+                if total_bytes <= self.max_bytes:
+                    break
+                self.history[url].remove(entry)
+                for name in _entry_objects(entry):
+                    refcount[name] -= 1
+                    if refcount[name] == 0:
+                        total_bytes -= self._object_size(name)
+            if total_bytes > self.max_bytes:
+                logger.warning(f"Image store still uses {total_bytes} bytes after GC (limit {self.max_bytes}); "
+                               f"only the latest image of each URL is left")
+
+        referenced = {name for name, count in refcount.items() if count > 0}
+        removed = 0
+        if os.path.isdir(self.image_dir):
+            for name in os.listdir(self.image_dir):
+                if OBJECT_NAME_PATTERN.match(name) and name not in referenced:
+                    try:
+                        os.remove(self.object_path(name))
+                        removed += 1
+                    except OSError as e:
+                        logger.warning(f"Could not remove unreferenced image '{name}': {e}")
+        logger.info(f"Image store GC: {len(referenced)} objects ({total_bytes} bytes) kept, {removed} removed")
+        return {"objects": len(referenced), "bytes": total_bytes, "removed": removed}
@@ -0,0 +1,106 @@
+import json
+import os
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+from setup_logger import setup_logger
+logger = setup_logger("run_checkpoint")
+
+
+class RunCheckpoint:
+    """
+    実行の進捗を追記型のJSONLファイルに記録し、異常終了した実行を `--resume` で再開できるようにする。
+
+    記録する内容:
+      - start:      この実行でチェックする (index, URL) の一覧
+      - done:       処理を終えたレコードの index
+      - screenshot: 撮影済みスクリーンショットのパス (再開時に撮り直さない)
+      - notified:   通知済みのURL (再開時に重複して通知しない)
+    正常に終了したら finish() でファイルを削除します。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.run_id = ""
+        self.targets: List[Tuple[int, str]] = []
+        self.completed: Set[int] = set()
+        self.screenshots: Dict[str, Dict[str, Optional[str]]] = {}
+        self.notified_urls: Set[str] = set()
+
+    @classmethod
+    def load(cls, path: str) -> Optional["RunCheckpoint"]:
+        """未完了の実行のチェックポイントを読み込む。存在しない場合は None"""
+        if not os.path.isfile(path):
+            return None
+        checkpoint = cls(path)
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # 書き込み途中で終了した行
+                op = entry.get("op")
+                if op == "start":
+                    checkpoint.run_id = entry.get("run_id", "")
+                    checkpoint.targets = [(int(index), url) for index, url in entry.get("targets", [])]
+                elif op == "done":
+                    checkpoint.completed.add(int(entry["index"]))
+                elif op == "screenshot":
+                    checkpoint.screenshots[entry["url"]] = {"email": entry.get("email"),
+                                                            "permanent": entry.get("permanent")}
+                elif op == "notified":
+                    checkpoint.notified_urls.update(entry.get("urls", []))
+        if not checkpoint.run_id:
+            return None
+        return checkpoint
+
+    def _append(self, entry: dict) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def start(self, targets: List[Tuple[int, str]]) -> None:
+        """新しい実行を開始し、以前のチェックポイントを破棄する"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.run_id = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+        self.targets = [(int(index), url) for index, url in targets]
+        self.completed.clear()
+        self.screenshots.clear()
+        self.notified_urls.clear()
+        with open(self.path, "w", encoding="utf-8"):
+            pass
+        self._append({"op": "start", "run_id": self.run_id, "targets": self.targets})
+
+    def remaining_targets(self) -> List[Tuple[int, str]]:
+        return [(index, url) for index, url in self.targets if index not in self.completed]
+
+    def mark_done(self, index: int) -> None:
+        self.completed.add(int(index))
+        self._append({"op": "done", "index": int(index)})
+
+    def get_screenshot(self, url: str) -> Optional[Dict[str, Optional[str]]]:
+        """撮影済みで、ファイルが残っているスクリーンショットのパスを返す"""
+        paths = self.screenshots.get(url)
+        if not paths:
+            return None
+        if any(path and not os.path.isfile(path) for path in paths.values()):
+            return None
+        return paths
+
+    def record_screenshot(self, url: str, email: Optional[str], permanent: Optional[str]) -> None:
+        self.screenshots[url] = {"email": email, "permanent": permanent}
+        self._append({"op": "screenshot", "url": url, "email": email, "permanent": permanent})
+
+    def mark_notified(self, urls: List[str]) -> None:
+        self.notified_urls.update(urls)
+        self._append({"op": "notified", "urls": list(urls)})
+
+    def finish(self) -> None:
+        """実行が正常に終了したのでチェックポイントを削除する"""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,182 @@
+import json
+import math
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from setup_logger import setup_logger
+logger = setup_logger("scan_metrics")
+
+METRIC_PREFIX = "web_checker"
+# OpenMetrics の quantile ラベルと summary() のキー
+QUANTILES = (("0.5", "p50"), ("0.95", "p95"))
+
+# 実行中のスキャンの (記録先, URL)。asyncio のタスクごとに引き継がれるため、
+# スキャン処理の各関数に記録先を渡さなくても span() で計測できる
+_current_scan: ContextVar[Optional[Tuple["ScanMetrics", str]]] = ContextVar("current_scan", default=None)
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def percentile(values: List[float], q: float) -> float:
+    """最近傍順位法によるパーセンタイル (values が空の場合は 0)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q * len(ordered)))
+    return ordered[rank - 1]
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """
+    実行中のスキャン (ScanMetrics.scan の中) であれば、ブロックの所要時間をそのURLの stage として記録する。
+    スキャンの外では何もしない。例外 (タイムアウトによるキャンセルを含む) で抜けた場合は失敗として記録する。
+    """
+    current = _current_scan.get()
+    if current is None:
+        yield
+        return
+    metrics, url = current
+    started = time.perf_counter()
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        metrics.record(url, stage, time.perf_counter() - started, ok=ok)
+
+
+@dataclass
+class UrlTimings:
+    # 段階ごとの合計秒数 (1回のスキャンで同じ段階を複数回通った場合は合算する)
+    stages: Dict[str, float] = field(default_factory=dict)
+    # 例外で中断した段階
+    failed: List[str] = field(default_factory=list)
+
+
+class ScanMetrics:
+    """
+    1回の実行 (常駐モードでは1サイクル) のスキャンについて、URLごと・段階ごとの所要時間を記録します。
+
+    - scan(url) の中で span(stage) を使うと、そのURLの段階の時間として記録します。
+    - cycle_span(stage) は事前チェックや通知など、URL単位でない処理の時間を記録します。
+    - write() で段階ごとの p50/p95 を OpenMetrics (Prometheus) 形式のテキストに書き出し、
+      URLごとの記録をJSONLファイルに追記します (実行をまたいだ推移の確認用)。
+    """
+
+    def __init__(self):
+        self.run_started = _now_iso()
+        self.urls: Dict[str, UrlTimings] = {}
+        self.cycle: Dict[str, float] = {}
+
+    @contextmanager
+    def scan(self, url: str) -> Iterator[None]:
+        """url のスキャン全体 ("total") を計測し、中で呼び出された span() をこのURLの記録にする"""
+        token = _current_scan.set((self, url))
+        try:
+            with span("total"):
+                yield
+        finally:
+            _current_scan.reset(token)
+
+    @contextmanager
+    def cycle_span(self, stage: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.cycle[stage] = self.cycle.get(stage, 0.0) + time.perf_counter() - started
+
+    def record(self, url: str, stage: str, seconds: float, ok: bool = True) -> None:
+        timings = self.urls.setdefault(url, UrlTimings())
+        timings.stages[stage] = timings.stages.get(stage, 0.0) + seconds
+        if not ok and stage not in timings.failed:
+            timings.failed.append(stage)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """段階ごとの URL数・合計・p50・p95・最大・失敗数"""
+        durations: Dict[str, List[float]] = {}
+        failures: Dict[str, int] = {}
+        for timings in self.urls.values():
+            for stage, seconds in timings.stages.items():
+                durations.setdefault(stage, []).append(seconds)
+            for stage in timings.failed:
+                failures[stage] = failures.get(stage, 0) + 1
+        return {
+            stage: {
+                "count": len(values),
+                "sum": sum(values),
+                "p50": percentile(values, 0.5),
+                "p95": percentile(values, 0.95),
+                "max": max(values),
+                "errors": failures.get(stage, 0),
+            }
+            for stage, values in sorted(durations.items())
+        }
+
+    def to_openmetrics(self) -> str:
+        name = f"{METRIC_PREFIX}_stage_seconds"
+        lines = [
+            f"# TYPE {name} summary",
+            f"# UNIT {name} seconds",
+            f"# HELP {name} Time spent in each scan stage per URL in the last run.",
+        ]
+        summary = self.summary()
+        for stage, stats in summary.items():
+            for quantile, key in QUANTILES:
+                lines.append(f'{name}{{stage="{stage}",quantile="{quantile}"}} {stats[key]:.6f}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {stats["sum"]:.6f}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {stats["count"]}')
+
+        errors = f"{METRIC_PREFIX}_stage_errors"
+        lines += [f"# TYPE {errors} counter",
+                  f"# HELP {errors} URLs whose scan stage ended with an exception or timeout in the last run."]
+        for stage, stats in summary.items():
+            lines.append(f'{errors}_total{{stage="{stage}"}} {stats["errors"]}')
+
+        cycle = f"{METRIC_PREFIX}_cycle_stage_seconds"
+        lines += [f"# TYPE {cycle} gauge",
+                  f"# UNIT {cycle} seconds",
+                  f"# HELP {cycle} Time spent in each whole-run stage (pre-check, screenshots, notification) in the last run."]
+        for stage, seconds in sorted(self.cycle.items()):
+            lines.append(f'{cycle}{{stage="{stage}"}} {seconds:.6f}')
+
+        run = f"{METRIC_PREFIX}_last_run_timestamp_seconds"
+        lines += [f"# TYPE {run} gauge",
+                  f"# UNIT {run} seconds",
+                  f"{run} {time.time():.3f}",
+                  "# EOF"]
+        return "\n".join(lines) + "\n"
+
+    def write(self, metrics_path: str, jsonl_path: str) -> None:
+        """OpenMetrics ファイルを書き換え、この実行のURLごとの記録をJSONLファイルに追記する"""
+        for path in (metrics_path, jsonl_path):
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+        tmp_path = f"{metrics_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.to_openmetrics())
+        os.replace(tmp_path, metrics_path)
+
+        with open(jsonl_path, "a", encoding="utf-8") as f:
+            for url, timings in self.urls.items():
+                record = {"run": self.run_started, "url": url,
+                          "stages": {stage: round(seconds, 6) for stage, seconds in timings.stages.items()}}
+                if timings.failed:
+                    record["failed"] = timings.failed
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            if self.cycle:
+                f.write(json.dumps({"run": self.run_started, "cycle": {stage: round(seconds, 6)
+                                                                       for stage, seconds in self.cycle.items()}},
+                                   ensure_ascii=False) + "\n")
+        logger.info(f"Scan metrics for {len(self.urls)} URLs written to {metrics_path}")
+
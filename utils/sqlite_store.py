@@ -0,0 +1,271 @@
+import csv
+import hashlib
+import json
+import os
+import sqlite3
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from content_extractor import DOMTreeSt
+from utils.change_rate import ChangeRatePolicy, CheckDecision, has_complete_scan, updated_check_history
+from utils.http_precheck import HttpValidators
+from setup_logger import setup_logger
+logger = setup_logger("sqlite_store")
+
+# レコードの列定義 (列名: SQLiteの型と既定値)
+RECORD_COLUMNS: Dict[str, str] = {
+    "url": "TEXT NOT NULL",
+    "run_code": "TEXT NOT NULL DEFAULT ''",
+    "result_vl": "TEXT NOT NULL DEFAULT ''",
+    "updated_datetime": "TEXT NOT NULL DEFAULT ''",
+    "full_scan_datetime": "TEXT NOT NULL DEFAULT ''",
+    "css_selector_list": "TEXT NOT NULL DEFAULT '[]'",  # JSON配列として保存
+    "web_page_type": "TEXT NOT NULL DEFAULT ''",
+    "image_filename": "TEXT NOT NULL DEFAULT ''",
+    "etag": "TEXT NOT NULL DEFAULT ''",
+    "last_modified": "TEXT NOT NULL DEFAULT ''",
+    "content_length": "TEXT NOT NULL DEFAULT ''",
+    "last_checked_datetime": "TEXT NOT NULL DEFAULT ''",
+    "change_count": "INTEGER NOT NULL DEFAULT 0",
+    "observed_seconds": "REAL NOT NULL DEFAULT 0",
+    "timeout_count": "INTEGER NOT NULL DEFAULT 0",
+}
+
+# 旧形式のCSV (ヘッダなし) の列順
+LEGACY_CSV_COLUMNS = ["url", "run_code", "result_vl", "updated_datetime", "full_scan_datetime",
+                      "css_selector_list", "web_page_type"]
+
+
+def _now_str() -> str:
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _result_hash(dom_tree: DOMTreeSt) -> str:
+    return hashlib.sha256(str(dom_tree.links).encode()).hexdigest()
+
+
+class SQLiteDataManager:
+    """
+    URLごとのチェック結果を SQLite (WALモード) に保存する DataManager。
+
+    JSON版の DataManager と同じメソッドを持ち、各更新はその場でコミットされるため、
+    実行途中で異常終了してもそれまでの結果は失われません。
+    差分検出は、通知済みの結果 (baseline_result_vl) と現在の結果を比較するクエリで行います。
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+        logger.info(f"Opened SQLite data store {db_path} ({self.count()} records)")
+
+    def _create_schema(self) -> None:
+        columns = ",\n".join(f"{name} {definition}" for name, definition in RECORD_COLUMNS.items())
+        with self.conn:
+            self.conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS records (
+                    id INTEGER PRIMARY KEY,
+                    {columns},
+                    baseline_result_vl TEXT NOT NULL DEFAULT ''
+                )""")
+            # 以前のバージョンで作成したデータベースには、後から追加した列を補う
+            existing = {row["name"] for row in self.conn.execute("PRAGMA table_info(records)")}
+            for name, definition in RECORD_COLUMNS.items():
+                if name not in existing:
+                    self.conn.execute(f"ALTER TABLE records ADD COLUMN {name} {definition}")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_records_url ON records(url)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_records_changed ON records(result_vl, baseline_result_vl)")
+
+    def close(self) -> None:
+        self.conn.close()
+
+    # --- 読み出し ---
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def url_targets(self) -> List[Tuple[int, str]]:
+        rows = self.conn.execute("SELECT id, url FROM records WHERE url != '' ORDER BY id").fetchall()
+        return [(row["id"], row["url"]) for row in rows]
+
+    def get_url(self, index: int) -> str:
+        return self.get_record_as_dict(index)["url"]
+
+    def get_record_as_dict(self, index: int) -> dict:
+        row = self.conn.execute("SELECT * FROM records WHERE id = ?", (index,)).fetchone()
+        if row is None:
+            raise KeyError(index)
+        record = dict(row)
+        record["css_selector_list"] = json.loads(record["css_selector_list"] or "[]")
+        return record
+
+    @property
+    def df(self) -> pd.DataFrame:
+        """全レコードを DataFrame として返す (表示・互換用のスナップショット)"""
+        df = pd.read_sql_query(f"SELECT id, {', '.join(RECORD_COLUMNS)} FROM records ORDER BY id",
+                               self.conn, index_col="id")
+        df["css_selector_list"] = df["css_selector_list"].apply(lambda value: json.loads(value or "[]"))
+        return df
+
+    # --- 更新 (各メソッドで即座にコミットする) ---
+
+    def _update(self, index: int, values: dict) -> None:
+        assignments = ", ".join(f"{column} = ?" for column in values)
+        with self.conn:
+            self.conn.execute(f"UPDATE records SET {assignments} WHERE id = ?", (*values.values(), index))
+
+    def add_record(self, record: dict, index: Optional[int] = None) -> int:
+        """レコードを1件追加してそのidを返す"""
+        values = {column: record.get(column) for column in RECORD_COLUMNS if record.get(column) is not None}
+        values["css_selector_list"] = json.dumps(record.get("css_selector_list") or [], ensure_ascii=False)
+        values["baseline_result_vl"] = values.get("result_vl", "")
+        if index is not None:
+            values["id"] = index
+        placeholders = ", ".join("?" for _ in values)
+        with self.conn:
+            cursor = self.conn.execute(
+                f"INSERT INTO records ({', '.join(values)}) VALUES ({placeholders})", tuple(values.values()))
+        return cursor.lastrowid
+
+    def update_scan_result(self, index: int, dom_tree: DOMTreeSt):
+        """スキャン成功時の結果をまとめて書き込む"""
+        new_hash = _result_hash(dom_tree)
+        logger.info(f" ## UPDATE ## - index : {index} - {new_hash}")
+        logger.debug(f"Updating with selectors: {dom_tree.css_selector_list}")
+        values = {
+            "result_vl": new_hash,
+            "updated_datetime": _now_str(),
+            "css_selector_list": json.dumps(dom_tree.css_selector_list, ensure_ascii=False),
+            "web_page_type": dom_tree.web_type,
+        }
+        # URLがリダイレクト等で変更された場合に対応
+        if dom_tree.url:
+            values["url"] = dom_tree.url
+        self._update(index, values)
+
+    def update_full_scan_timestamp(self, index: int):
+        """Fullスキャンのタイムスタンプのみを更新する"""
+        self._update(index, {"full_scan_datetime": _now_str()})
+
+    def clear_scan_data(self, index: int):
+        """スキャン失敗時に、次回のFullスキャンを促すためにデータをクリアする"""
+        logger.warning(f"Clearing scan data for index: {index} to force full scan next time.")
+        self._update(index, {"css_selector_list": "[]", "full_scan_datetime": "",
+                             **HttpValidators().to_record()})
+
+    def get_http_validators(self, index: int) -> HttpValidators:
+        return HttpValidators.from_record(self.get_record_as_dict(index))
+
+    def update_http_validators(self, index: int, validators: HttpValidators):
+        """スキャン成功時に、事前チェックで得た検証用ヘッダを保存する"""
+        self._update(index, validators.to_record())
+
+    def record_check(self, index: int, changed: bool):
+        """内容を確認できたことを記録し、変化率の推定に使う観測時間と変化回数を更新する"""
+        self._update(index, {**updated_check_history(self.get_record_as_dict(index), changed), "timeout_count": 0})
+
+    def record_timeout(self, index: int):
+        """URLごとの制限時間を超えて中断したことを記録する (次回の実行で後回しにするため)"""
+        with self.conn:
+            self.conn.execute("UPDATE records SET timeout_count = timeout_count + 1 WHERE id = ?", (index,))
+
+    def decide_check(self, index: int, policy: ChangeRatePolicy) -> CheckDecision:
+        return policy.decide_for_record(self.get_record_as_dict(index))
+
+    def next_check_at(self, index: int, policy: ChangeRatePolicy) -> Optional[float]:
+        return policy.next_check_at(self.get_record_as_dict(index))
+
+    def can_skip_scan(self, index: int) -> bool:
+        return has_complete_scan(self.get_record_as_dict(index))
+
+    def update_image_filename(self, url: str, filename: str):
+        """Updates the image_filename for a given URL."""
+        base_filename = os.path.basename(filename)
+        with self.conn:
+            cursor = self.conn.execute("UPDATE records SET image_filename = ? WHERE url = ?", (base_filename, url))
+        if cursor.rowcount:
+            logger.info(f"Updated image_filename for {url} to {base_filename}")
+
+    def save_data(self):
+        """結果は更新ごとにコミット済みのため、実行コードの記録とWALのチェックポイントのみ行う"""
+        with self.conn:
+            self.conn.execute("UPDATE records SET run_code = ?", (_now_str(),))
+        self.conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    # --- 差分検出 ---
+
+    def chk_diff(self) -> list:
+        """通知済みの結果から result_vl が変化したURLを返す"""
+        rows = self.conn.execute(
+            "SELECT url FROM records WHERE result_vl != baseline_result_vl ORDER BY id").fetchall()
+        diff_urls = [row["url"] for row in rows]
+        logger.info(f"Found {len(diff_urls)} updated URLs: {diff_urls}")
+        return diff_urls
+
+    def reset_baseline(self):
+        """差分検出の基準を現在の内容に更新する (通知済みの変更を再検出しないため)"""
+        with self.conn:
+            self.conn.execute("UPDATE records SET baseline_result_vl = result_vl WHERE result_vl != baseline_result_vl")
+
+
+def import_records_from_json(manager: SQLiteDataManager, json_path: str) -> int:
+    """既存の cheacker_url.json (DataManager の保存形式) のレコードを取り込み、件数を返す"""
+    with open(json_path, "r", encoding="utf-8") as f:
+        records = json.load(f)
+    for index, record in enumerate(records):
+        record = {key: value for key, value in record.items() if value is not None}
+        for column, default in (("change_count", 0), ("observed_seconds", 0.0)):
+            record[column] = record.get(column) or default
+        for column in ("etag", "last_modified", "content_length"):
+            if column in record:
+                record[column] = str(record[column])
+        manager.add_record(record, index=index)
+    logger.info(f"Imported {len(records)} records from {json_path}")
+    return len(records)
+
+
+def import_records_from_csv(manager: SQLiteDataManager, csv_path: str) -> int:
+    """旧形式の cheacker_url.csv (ヘッダなし、セレクタは1つ) のレコードを取り込み、件数を返す"""
+    count = 0
+    with open(csv_path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.reader(f):
+            if not row or not row[0]:
+                continue
+            record = dict(zip(LEGACY_CSV_COLUMNS, row))
+            selector = record.get("css_selector_list", "")
+            record["css_selector_list"] = [selector] if selector else []
+            # 旧形式ではページ種別の代わりに数値が入っているため、次回Fullスキャンで判定し直す
+            if record.get("web_page_type", "").replace(".", "", 1).isdigit():
+                record["web_page_type"] = ""
+            manager.add_record(record, index=count)
+            count += 1
+    logger.info(f"Imported {count} records from {csv_path}")
+    return count
+
+
+def open_sqlite_data_manager(db_path: str,
+                             json_path: Optional[str] = None,
+                             csv_path: Optional[str] = None,
+                             prepare_json: Optional[Callable[[str], None]] = None) -> SQLiteDataManager:
+    """
+    SQLiteのデータストアを開く。データベースが空の場合に限り、既存のJSON (なければCSV) から1度だけ取り込む。
+    prepare_json を指定した場合は、JSONを読み込む前に json_path を渡して呼び出す
+    (途中で終了した実行のジャーナルをスナップショットへまとめるため)。
+    """
+    manager = SQLiteDataManager(db_path)
+    if manager.count() == 0:
+        if json_path and prepare_json:
+            prepare_json(json_path)
+        if json_path and os.path.isfile(json_path) and os.path.getsize(json_path) > 0:
+            import_records_from_json(manager, json_path)
+        elif csv_path and os.path.isfile(csv_path):
+            import_records_from_csv(manager, csv_path)
+    return manager
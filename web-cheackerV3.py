@@ -7,22 +7,36 @@ import threading
 import asyncio
 import shutil
 import traceback
+from contextlib import nullcontext
 import re
 import json
 import html
-import requests
-from playwright.async_api import async_playwright
+import time
+import signal
+import argparse
+import aiohttp
 
 # +----------------------------------------------------------------
 # + my module imports
 # +----------------------------------------------------------------
-from content_extractor import run_full_scan_standalone, run_quick_scan_standalone
-from mail import send_email
+from content_extractor import run_full_scan, run_quick_scan, BrowserPool, ResourceAllowlist, PageSettler
+from content_extractor import RobotsCache, create_http_session
+from mail import send_email, build_message, NotificationDispatcher, SmtpSettings
 from text_struct import text_struct
 import util_str
 from content_extractor import DOMTreeSt, BoundingBox
-from setup_logger import setup_logger
-from content_extractor import save_screenshot
+from content_extractor.dom_treeSt import SCAN_MODE_FULL
+from setup_logger import DEFAULT_LOG_FILE, set_file_log_level, setup_logger
+from content_extractor import capture_screenshots, capture_main_content, ScreenshotOutput
+from content_extractor.playwright_helpers import generate_filename
+from utils.http_precheck import HttpValidators, precheck_urls
+from utils.host_scheduler import HostScheduler
+from utils.change_rate import ChangeRatePolicy, CheckDecision, has_complete_scan, updated_check_history
+from utils.daemon import DueQueue, DaemonStatus
+from utils.sqlite_store import open_sqlite_data_manager
+from utils.run_checkpoint import RunCheckpoint
+from utils.image_store import ImageStore, DEFAULT_KEEP_PER_URL
+from utils.scan_metrics import ScanMetrics, span
 # +----------------------------------------------------------------
 # + Constant definition
 # +----------------------------------------------------------------
@@ -34,23 +48,11 @@ USER_DIR_PATH = os.path.join(SCRIPT_PATH, "./user")
 # カレントディレクトリをpythonパスに追加する
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-# +----------------------------------------------------------------
-# pandas option 
-# +----------------------------------------------------------------
-# 表示オプションを変更して、すべての行と列を表示する
-pd.set_option('display.max_rows', None)
-pd.set_option('display.max_columns', None)
-
-
-
 # +----------------------------------------------------------------
 # logging settings
 # +----------------------------------------------------------------
-LOGGER_DATEFORMAT = "%Y%m%d_%H%M%S"
-nowtime = datetime.now()
-formatted_now = nowtime.strftime(LOGGER_DATEFORMAT)
 
-logger = setup_logger("web-cheacker",log_file=f"./log/web-chk_{formatted_now}.log")
+logger = setup_logger("web-cheacker", log_file=DEFAULT_LOG_FILE)
 
 logger.debug(SCRIPT_PATH)
 
@@ -120,9 +122,26 @@ class User:
 # + NotificationManager class
 # +----------------------------------------------------------------
 class NotificationManager:
-    def __init__(self, user: User):
+    """
+    更新通知とエラー通知を送信する。
+    dispatcher を指定した場合はイベントループの外で送信し、1回の実行 (サイクル) の間はSMTP接続を使い回す。
+    """
+    def __init__(self, user: User, dispatcher: NotificationDispatcher | None = None):
         self.user = user
         self.config = user.config
+        self.dispatcher = dispatcher
+
+    async def _send(self, body: str, body_type: str, image_list: list | None = None) -> None:
+        if self.dispatcher is None:
+            # 従来の送信処理 (毎回接続する) もイベントループを止めないようにスレッドで実行する
+            await asyncio.to_thread(self.user.send_resultmail, body, body_type, image_list or [])
+            return
+        if self.user.yaml_file is None:
+            logger.warning("not send mail")
+            return
+        gmail = self.user.yaml_file["gmail"]
+        message = build_message(gmail["account"], gmail["receiver_mail"], body, body_type, image_list)
+        await self.dispatcher.send(message)
 
     async def send_update_notification(self, diff_urls: list, image_list: list):
         if not diff_urls:
@@ -139,9 +158,9 @@ class NotificationManager:
         logger.info("Generating HTML body for email...")
         body = text_struct.generate_html(diff_urls, image_list)
         logger.info("Sending update notification email...")
-        self.user.send_resultmail(body, body_type="html", image_list=image_list)
+        await self._send(body, body_type="html", image_list=image_list)
 
-    def send_error_notification(self, error_list: list):
+    async def send_error_notification(self, error_list: list):
         if not error_list:
             return
 
@@ -158,7 +177,18 @@ class NotificationManager:
         error_body_lines.append("</ul>")
         
         logger.info("Sending error report email...")
-        self.user.send_resultmail("\n".join(error_body_lines), body_type="html")
+        await self._send("\n".join(error_body_lines), body_type="html")
+
+    async def finish_cycle(self):
+        """スプールに残っている送信失敗分を再送し、SMTP接続を閉じる (サイクルの終わりに呼び出す)"""
+        if self.dispatcher is None:
+            return
+        await self.dispatcher.flush_spool()
+        await self.dispatcher.release()
+
+    async def close(self):
+        if self.dispatcher is not None:
+            await self.dispatcher.close()
 
 # +----------------------------------------------------------------
 # + json function
@@ -236,36 +266,6 @@ def safe_parse_datetime(date_str: str) -> datetime:
     return datetime(1970, 1, 1, tzinfo=timezone.utc)
 
 
-# +----------------------------------------------------------------
-#   Last-Modified function
-# +----------------------------------------------------------------
-
-from email.utils import parsedate_to_datetime
-
-def get_last_modified(url: str) -> str | None:
-    """
-    URLのLast-Modifiedヘッダを取得し、単純な文字列として返す。
-    タイムゾーンは考慮せず、日付と時刻の文字列表現として扱う。
-    """
-    try:
-        # タイムアウトを設定して、応答がない場合に長時間待たないようにする
-        response = requests.head(url, timeout=10)
-        response.raise_for_status() # 200番台以外のステータスコードで例外を発生
-        
-        last_modified_header = response.headers.get('Last-Modified')
-        if last_modified_header:
-            # 例: "Wed, 21 Oct 2015 07:28:00 GMT" -> datetimeオブジェクトに変換
-            dt_object = parsedate_to_datetime(last_modified_header)
-            # datetimeオブジェクトを単純な文字列にフォーマットして返す
-            return dt_object.strftime("%Y-%m-%d %H:%M:%S")
-            
-    except requests.RequestException as e:
-        logger.debug(f"Could not get Last-Modified for {url}: {e}")
-    except (TypeError, ValueError) as e:
-        logger.debug(f"Could not parse Last-Modified header for {url}: {e}")
-        
-    return None
-
 # + ----------------------------------------------------------------
 #  remove encoded chars
 # + ----------------------------------------------------------------
@@ -293,9 +293,34 @@ CSV_COLUMN = { "url" : 0, # scraping url
 }
 
 
+# HTTPの条件付きリクエスト用にレコードごとに保存する検証用ヘッダ
+HTTP_VALIDATOR_COLUMNS = ["etag", "last_modified", "content_length"]
+# 変化率の推定用にレコードごとに保存するチェック履歴 (列名: 既定値)
+CHANGE_HISTORY_COLUMNS = {
+    "last_checked_datetime": "",  # 最後に内容を確認した日時
+    "change_count": 0,            # 確認時に result_vl の変化を検出した回数
+    "observed_seconds": 0.0,      # 初回確認から最後の確認までの累計観測時間 (秒)
+    "timeout_count": 0,           # 連続してURLごとの制限時間を超えた回数 (確認できたら0に戻す)
+}
+
+
+# 追記型ジャーナルがこのサイズを超えたらスナップショット (JSON) へまとめる
+DEFAULT_JOURNAL_MAX_BYTES = 4 * 1024 * 1024
+
+
 class DataManager:
-    def __init__(self, file_path):
+    """
+    URLごとのチェック結果を cheacker_url.json (スナップショット) と
+    同じ場所の cheacker_url.journal.jsonl (追記型ジャーナル) で管理する。
+
+    更新はジャーナルへ1行ずつ追記し、スナップショットへのまとめ (compaction) は
+    save_data() (正常終了時) かジャーナルが journal_max_bytes を超えた時にだけ行う。
+    起動時はスナップショットの上にジャーナルを再生するため、途中で終了した実行の結果も失われない。
+    """
+    def __init__(self, file_path, journal_max_bytes: int = DEFAULT_JOURNAL_MAX_BYTES):
         self.file_path = file_path
+        self.journal_path = os.path.splitext(file_path)[0] + ".journal.jsonl"
+        self.journal_max_bytes = journal_max_bytes
         self.lock = threading.Lock()
         try:
             with self.lock:
@@ -303,28 +328,134 @@ class DataManager:
         except (FileNotFoundError, ValueError):
             self.df = pd.DataFrame(columns=[
                 "url", "run_code", "result_vl", "updated_datetime", 
-                "full_scan_datetime", "css_selector_list", "web_page_type", "image_filename"
+                "full_scan_datetime", "css_selector_list", "web_page_type", "image_filename",
+                *HTTP_VALIDATOR_COLUMNS, *CHANGE_HISTORY_COLUMNS
             ])
         
+        # 空のファイル ("[]") から読み込んだ場合など、基本列が欠けていれば補う
+        for column in ["url", "run_code", "result_vl", "updated_datetime", "full_scan_datetime", "web_page_type"]:
+            if column not in self.df.columns:
+                self.df[column] = ""
         if 'css_selector_list' not in self.df.columns:
             self.df['css_selector_list'] = [[] for _ in range(len(self.df))]
         if 'image_filename' not in self.df.columns:
             self.df['image_filename'] = ""
+        for column in HTTP_VALIDATOR_COLUMNS:
+            if column not in self.df.columns:
+                self.df[column] = ""
+        for column, default in CHANGE_HISTORY_COLUMNS.items():
+            if column not in self.df.columns:
+                self.df[column] = default
 
         self.df = self.df.fillna({
             'web_page_type': '',
             'result_vl': '',
             'full_scan_datetime': '',
-            'image_filename': ''
+            'image_filename': '',
+            **{column: '' for column in HTTP_VALIDATOR_COLUMNS},
+            **CHANGE_HISTORY_COLUMNS
         })
+        # read_json が数値に変換した Content-Length 等を文字列に揃える
+        for column in HTTP_VALIDATOR_COLUMNS:
+            self.df[column] = self.df[column].astype(str)
+        for column, default in CHANGE_HISTORY_COLUMNS.items():
+            self.df[column] = self.df[column].astype(type(default))
         self.df['css_selector_list'] = self.df['css_selector_list'].apply(lambda x: x if isinstance(x, list) else [])
 
         self.before_df = self.df.copy()
-        logger.info(f"Loaded data:\n{self.df}")
+        self._replay_journal()
+        logger.info("Loaded data: %d URLs", len(self.df))
+
+    # --- journal ---
+
+    def _replay_journal(self):
+        """前回のスナップショット以降にジャーナルへ追記された更新を適用する"""
+        if not os.path.isfile(self.journal_path):
+            return
+        applied = 0
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, start=1):
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # 書き込み途中で終了した最終行などは読み飛ばす
+                    logger.warning(f"Skipping broken journal line {line_no} in {self.journal_path}")
+                    continue
+                op = entry.get("op")
+                if op == "set":
+                    index = entry["index"]
+                    if not self._journal_target_matches(index, entry.get("url")):
+                        continue
+                    self._apply(index, entry["fields"])
+                    applied += 1
+                elif op == "baseline":
+                    self.before_df = self.df.copy()
+                elif op == "pending":
+                    # まとめる前に未通知だった変更は、通知済みの値を基準として戻す
+                    urls = entry.get("urls", {})
+                    for index, result_vl in entry["result_vl"].items():
+                        if self._journal_target_matches(int(index), urls.get(index)):
+                            self.before_df.at[int(index), "result_vl"] = result_vl
+        logger.info(f"Replayed {applied} journal entries from {self.journal_path}")
+
+    def _journal_target_matches(self, index: int, url: str | None) -> bool:
+        """
+        ジャーナルの行番号が今も同じURLを指しているかを確認する。
+        クラッシュ後にスナップショットが編集され (URLの追加・削除)、行がずれた場合は別のURLに適用しない
+        (url のない以前の形式のエントリは行番号だけで確認する)
+        """
+        if index not in self.df.index:
+            logger.warning(f"Skipping journal entry for unknown index {index} ({url})")
+            return False
+        if url is not None and self.df.at[index, 'url'] != url:
+            logger.warning(f"Skipping journal entry for {url}: index {index} now holds {self.df.at[index, 'url']}")
+            return False
+        return True
+
+    def _apply(self, index: int, fields: dict):
+        for key, value in fields.items():
+            self.df.at[index, key] = value
+
+    def _append_journal(self, entry: dict):
+        with self.lock:
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                size = f.tell()
+        if size > self.journal_max_bytes:
+            logger.info(f"Journal exceeded {self.journal_max_bytes} bytes; compacting into {self.file_path}")
+            self._compact()
+
+    def _set_fields(self, index: int, fields: dict):
+        """レコードを更新し、その内容をジャーナルへ追記する"""
+        # 適用前のURLを記録する (ページ遷移の追跡で fields が url 自体を書き換える場合がある)
+        url = self.df.at[index, 'url']
+        self._apply(index, fields)
+        self._append_journal({"op": "set", "index": int(index), "url": url, "fields": fields})
+
+    def _compact(self):
+        """DataFrame全体をスナップショットへ書き出し、ジャーナルを空にする"""
+        with self.lock:
+            tmp_path = f"{self.file_path}.tmp"
+            self.df.to_json(tmp_path, orient='records', force_ascii=False, indent=4)
+            os.replace(tmp_path, self.file_path)
+            # 未通知の変更が残っている場合は、通知済みの値を新しいジャーナルの先頭に残す
+            pending = self.df['result_vl'] != self.before_df['result_vl']
+            with open(self.journal_path, 'w', encoding='utf-8') as f:
+                if pending.any():
+                    baseline = {str(index): value for index, value in self.before_df.loc[pending, 'result_vl'].items()}
+                    urls = {str(index): url for index, url in self.df.loc[pending, 'url'].items()}
+                    f.write(json.dumps({"op": "pending", "result_vl": baseline, "urls": urls}, ensure_ascii=False) + "\n")
 
     def get_record_as_dict(self, index: int) -> dict:
         return self.df.loc[index].to_dict()
 
+    def url_targets(self) -> list:
+        """(レコードのindex, URL) のリストを返す"""
+        return [(index, row['url']) for index, row in self.df.iterrows() if row['url']]
+
+    def get_url(self, index: int) -> str:
+        return self.df.at[index, 'url']
+
     def update_record_from_dom_tree(self, index: int, dom_tree: DOMTreeSt):
         record = {
             "result_vl": hashlib.sha256(str(dom_tree.links).encode()).hexdigest(),
@@ -333,8 +464,7 @@ class DataManager:
             "web_page_type": dom_tree.web_type,
             "url": dom_tree.url
         }
-        for key, value in record.items():
-            self.df.at[index, key] = value
+        self._set_fields(index, record)
         logger.info(f" ## update ## - index : {index}")
         
     def update_scan_result(self, index: int, dom_tree: DOMTreeSt):
@@ -346,24 +476,56 @@ class DataManager:
         logger.info(f" ## UPDATE ## - index : {index} - {new_hash}")
         logger.debug(f"Updating with selectors: {dom_tree.css_selector_list}")
 
-        self.df.at[index, "result_vl"] = new_hash
-        self.df.at[index, "updated_datetime"] = get_Strdatetime()
-        self.df.at[index, "css_selector_list"] = dom_tree.css_selector_list
-        self.df.at[index, "web_page_type"] = dom_tree.web_type
-        
+        fields = {
+            "result_vl": new_hash,
+            "updated_datetime": get_Strdatetime(),
+            "css_selector_list": dom_tree.css_selector_list,
+            "web_page_type": dom_tree.web_type,
+        }
         # URLがリダイレクト等で変更された場合に対応
         if dom_tree.url != self.df.at[index, "url"]:
-            self.df.at[index, "url"] = dom_tree.url
+            fields["url"] = dom_tree.url
+        self._set_fields(index, fields)
 
     def update_full_scan_timestamp(self, index: int):
         """Fullスキャンのタイムスタンプのみを更新する"""
-        self.df.at[index, "full_scan_datetime"] = get_Strdatetime()
+        self._set_fields(index, {"full_scan_datetime": get_Strdatetime()})
 
     def clear_scan_data(self, index: int):
         """スキャン失敗時に、次回のFullスキャンを促すためにデータをクリアする"""
         logger.warning(f"Clearing scan data for index: {index} to force full scan next time.")
-        self.df.at[index, "css_selector_list"] = []
-        self.df.at[index, "full_scan_datetime"] = ""
+        # 検証用ヘッダも消し、次回の事前チェックで「変更なし」と判定されてスキャンが省略されないようにする
+        self._set_fields(index, {
+            "css_selector_list": [],
+            "full_scan_datetime": "",
+            **{column: "" for column in HTTP_VALIDATOR_COLUMNS}
+        })
+
+    def get_http_validators(self, index: int) -> HttpValidators:
+        return HttpValidators.from_record(self.df.loc[index].to_dict())
+
+    def update_http_validators(self, index: int, validators: HttpValidators):
+        """スキャン成功時に、事前チェックで得た検証用ヘッダを保存する"""
+        self._set_fields(index, validators.to_record())
+
+    def record_check(self, index: int, changed: bool):
+        """
+        内容を確認できたことを記録し、変化率の推定に使う観測時間と変化回数を更新する。
+        (スキャン成功時、または事前チェックで「変更なし」と判定された時に呼び出す)
+        """
+        self._set_fields(index, {**updated_check_history(self.get_record_as_dict(index), changed), "timeout_count": 0})
+
+    def record_timeout(self, index: int):
+        """URLごとの制限時間を超えて中断したことを記録する (次回の実行で後回しにするため)"""
+        self._set_fields(index, {"timeout_count": int(self.df.at[index, "timeout_count"]) + 1})
+
+    def decide_check(self, index: int, policy: ChangeRatePolicy) -> CheckDecision:
+        """変化率の推定値から、今回の実行でこのURLを確認するかを判断する"""
+        return policy.decide_for_record(self.get_record_as_dict(index))
+
+    def can_skip_scan(self, index: int) -> bool:
+        """前回のスキャン結果が揃っており、事前チェックの結果だけでスキャンを省略してよいかを返す"""
+        return has_complete_scan(self.get_record_as_dict(index))
 
     def update_image_filename(self, url: str, filename: str):
         """Updates the image_filename for a given URL."""
@@ -371,13 +533,14 @@ class DataManager:
         if not index.empty:
             # Get just the filename, not the full path
             base_filename = os.path.basename(filename)
-            self.df.loc[index, 'image_filename'] = base_filename
+            for i in index:
+                self._set_fields(i, {'image_filename': base_filename})
             logger.info(f"Updated image_filename for {url} to {base_filename}")
 
     def save_data(self):
-        with self.lock:
-            self.df['run_code'] = get_Strdatetime()
-            self.df.to_json(self.file_path, orient='records', force_ascii=False, indent=4)
+        """正常終了時に、ジャーナルの内容をスナップショット (JSON) へまとめる"""
+        self.df['run_code'] = get_Strdatetime()
+        self._compact()
 
     def chk_diff(self) -> list:
         # result_vl列を比較して差分を検出
@@ -386,170 +549,341 @@ class DataManager:
         logger.info(f"Found {len(diff_urls)} updated URLs: {diff_urls}")
         return diff_urls
 
+    def reset_baseline(self):
+        """差分検出の基準を現在の内容に更新する (通知済みの変更を再検出しないため)"""
+        self.before_df = self.df.copy()
+        self._append_journal({"op": "baseline"})
+
+    def next_check_at(self, index: int, policy: ChangeRatePolicy) -> float | None:
+        """変化率の推定値から次回チェックすべき時刻 (UNIX時刻) を返す。None はすぐにチェックすることを表す"""
+        return policy.next_check_at(self.get_record_as_dict(index))
+
 # csv function end ---------------------------------------------------------------- 
 
 
+def result_hash(links) -> str:
+    """result_vl に保存する、メインコンテンツのリンク一覧のハッシュ"""
+    return hashlib.sha256(str(links).encode()).hexdigest()
+
+
+class ScanScreenshots:
+    """
+    スキャン中、ページを閉じる前に変更を検知したURLのメインコンテンツを撮影する (screenshot.capture_at_scan)。
+    撮影できたURLは差分検出後のスクリーンショット処理でページを読み込み直さない。
+    """
+    def __init__(self,
+                 outputs: dict[str, ScreenshotOutput],
+                 context_outputs: dict[str, ScreenshotOutput] | None = None):
+        self.outputs = outputs
+        self.context_outputs = context_outputs
+        # URL -> 出力名ごとのファイルパス
+        self.captured: dict[str, dict] = {}
+
+    def hook_for(self, url: str, previous_hash: str):
+        """result_vl が previous_hash から変わった場合にだけ撮影するフックを返す"""
+        async def capture_if_changed(page, node: DOMTreeSt) -> None:
+            if node.is_empty_result or result_hash(node.links) == previous_hash:
+                return
+            paths = await capture_main_content(page, node.rect, generate_filename(url),
+                                               self.outputs, self.context_outputs)
+            if paths.get("email") and paths.get("permanent"):
+                self.captured[url] = paths
+        return capture_if_changed
+
+
 async def process_url_async(url: str,
                             index_num: int,
                             data_manager: DataManager,
                             error_list: list,
                             config: dict,
-                            semaphore: asyncio.Semaphore):
+                            browser_pool: BrowserPool,
+                            validators: HttpValidators | None = None,
+                            resource_allowlist: ResourceAllowlist | None = None,
+                            page_settler: PageSettler | None = None,
+                            scan_screenshots: ScanScreenshots | None = None,
+                            robots_cache: RobotsCache | None = None,
+                            scan_metrics: ScanMetrics | None = None):
     """
     非同期で単一のURLを処理するワーカー関数。
-    セマフォを使用して同時実行数を制御します。
+    同時実行数は呼び出し側の HostScheduler が制御し、ブラウザは共有プールから借り受けます。
+    validators を渡した場合、スキャン成功時にそのレコードの検証用ヘッダとして保存します。
+    resource_allowlist を渡した場合、Fullスキャンで許可リストを学習し、Quickスキャンで不要なリクエストを遮断します。
+    page_settler を渡した場合、その設定でDOMの静止を待ち、URLごとの静止時間を記録します。
+    scan_screenshots を渡した場合、変更を検知したURLはスキャン中のページでメインコンテンツを撮影します。
+    robots_cache を渡した場合、Fullスキャンではホストごとにキャッシュしたrobots.txtで許可を確認します。
+    scan_metrics を渡した場合、このURLのスキャンの段階ごとの所要時間 (span) を記録します。
+
+    robots.txtの取得からQuickスキャン・Fullスキャン・ページ遷移の追跡までの合計時間は scan.timeout_per_url 秒に制限され、
+    超えた場合は処理をキャンセルし (ページとコンテキストは閉じられる)、次回の実行で後回しにするよう記録します。
     """
-    async with semaphore:
-        try:
-            start_time = datetime.now()
-            record = data_manager.get_record_as_dict(index_num)
-
-            css_selector_list = record.get('css_selector_list', [])
-            full_scan_datetime_str = record.get('full_scan_datetime', '')
-            web_page_type = record.get('web_page_type', '')
+    timeout_sec = config.get('scan', {}).get('timeout_per_url', 60)
+    try:
+        # wait_for が作成するタスクに計測対象のURLが引き継がれる
+        with scan_metrics.scan(url) if scan_metrics is not None else nullcontext():
+            await asyncio.wait_for(
+                _scan_url_async(url, index_num, data_manager, error_list, config, browser_pool, validators,
+                                resource_allowlist, page_settler, scan_screenshots, robots_cache),
+                timeout=timeout_sec,
+            )
+    except asyncio.TimeoutError:
+        timeout_msg = f"Processing cancelled after exceeding {timeout_sec} sec"
+        logger.warning(f"TIMEOUT for {url}: {timeout_msg}")
+        error_list.append([url, timeout_msg])
+        data_manager.record_timeout(index_num)
+
+
+async def _scan_url_async(url: str,
+                          index_num: int,
+                          data_manager: DataManager,
+                          error_list: list,
+                          config: dict,
+                          browser_pool: BrowserPool,
+                          validators: HttpValidators | None,
+                          resource_allowlist: ResourceAllowlist | None,
+                          page_settler: PageSettler | None,
+                          scan_screenshots: ScanScreenshots | None = None,
+                          robots_cache: RobotsCache | None = None):
+    """process_url_async の本体 (Quickスキャン → 必要に応じてFullスキャン → 結果の保存)"""
+    try:
+        record = data_manager.get_record_as_dict(index_num)
 
-            diff_days = 99
-            if full_scan_datetime_str:
-                try:
-                    diff_days = (datetime.now(timezone.utc) - safe_parse_datetime(full_scan_datetime_str)).days
-                except TypeError:
-                    logger.warning(f"Could not parse datetime: {full_scan_datetime_str}")
-
-            rescored_candidate = None
-            # Quickスキャン試行
-            if css_selector_list and diff_days < 4 and web_page_type:
-                logger.info(f"QUICK SCAN URL: {url}, index: {index_num}")
-                rescored_candidate = await run_quick_scan_standalone(
-                    url=url,
-                    css_selector_list=css_selector_list,
-                    webtype_str=web_page_type
-                )
-
-            # Fullスキャン (Quickスキャンしなかった、または失敗した場合)
-            if not rescored_candidate:
-                if css_selector_list:
-                    # logger.info(f"Quick scan failed. Falling back to FULL SCAN for URL: {url}")
-                    pass
-                #else:
-                logger.info(f"FULL SCAN URL: {url}, index: {index_num}")
-
-                rescored_candidate = await run_full_scan_standalone(
-                    url=record['url'],
-                    arg_webtype=web_page_type
-                )
-
-                if rescored_candidate:
-                    if rescored_candidate.is_empty_result:
-                        logger.info(f"Full scan identified {url} as an empty result page.")
-                        error_list.append([url, "Empty result page detected"])
-                        data_manager.clear_scan_data(index_num)
-                        return
-                    data_manager.update_full_scan_timestamp(index_num)
-                else:
-                    logger.info("Full scan returned None")
-                    error_list.append([url, "Full scan returned None"])
-                    data_manager.clear_scan_data(index_num)
-                    return
-
-            # 結果処理 (共通)
-            if rescored_candidate:
-                new_hash = hashlib.sha256(str(rescored_candidate.links).encode()).hexdigest()
-                if rescored_candidate.is_empty_result:
-                    logger.info(f"Quick scan identified {url} as an empty result page.")
-                    error_list.append([url, "Empty result page detected"])
-                    data_manager.clear_scan_data(index_num)
-                    return
-                if not web_page_type or record['result_vl'] != new_hash:
-                    data_manager.update_scan_result(index_num, rescored_candidate)
-            else:
-                logger.error(f"Scan process resulted in None for URL: {url}")
-                error_list.append([url, "Scan process resulted in None"])
-                data_manager.clear_scan_data(index_num)
+        css_selector_list = record.get('css_selector_list', [])
+        full_scan_datetime_str = record.get('full_scan_datetime', '')
+        web_page_type = record.get('web_page_type', '')
 
-            # タイムアウトチェック
-            duration = (datetime.now() - start_time).total_seconds()
-            timeout_sec = config.get('scan', {}).get('timeout_per_url', 60)
-            if duration > timeout_sec:
-                timeout_msg = f"Processing time exceeded {timeout_sec} sec -> {duration:.2f} sec"
-                logger.warning(f"TIMEOUT for {url}: {timeout_msg}")
-                error_list.append([url, timeout_msg])
+        diff_days = 99
+        if full_scan_datetime_str:
+            try:
+                diff_days = (datetime.now(timezone.utc) - safe_parse_datetime(full_scan_datetime_str)).days
+            except TypeError:
+                logger.warning(f"Could not parse datetime: {full_scan_datetime_str}")
+
+        on_result = scan_screenshots.hook_for(url, record['result_vl']) if scan_screenshots is not None else None
+        rescored_candidate = None
+        # Quickスキャン試行 (失敗した場合は読み込み済みのページでそのままFullスキャンする)
+        full_scan_interval_days = config.get('scan', {}).get('full_scan_interval_days', 4)
+        if css_selector_list and diff_days < full_scan_interval_days and web_page_type:
+            logger.info(f"QUICK SCAN URL: {url}, index: {index_num}")
+            rescored_candidate = await run_quick_scan(
+                url=url,
+                pool=browser_pool,
+                css_selector_list=css_selector_list,
+                webtype_str=web_page_type,
+                resource_allowlist=resource_allowlist,
+                page_settler=page_settler,
+                full_scan_fallback=True,
+                on_result=on_result,
+                robots_cache=robots_cache
+            )
+        else:
+            logger.info(f"FULL SCAN URL: {url}, index: {index_num}")
+
+            rescored_candidate = await run_full_scan(
+                url=record['url'],
+                pool=browser_pool,
+                arg_webtype=web_page_type,
+                resource_allowlist=resource_allowlist,
+                page_settler=page_settler,
+                on_result=on_result,
+                robots_cache=robots_cache
+            )
 
-        except Exception as e:
-            tb = traceback.extract_tb(e.__traceback__)
-            last_entry = tb[-1]
-            logger.error(f"Error processing URL {url}: {e} at line {last_entry.lineno}")
-            error_list.append([url, e, last_entry.line, last_entry.lineno])
+        if not rescored_candidate:
+            logger.info("Full scan returned None")
+            error_list.append([url, "Full scan returned None"])
+            data_manager.clear_scan_data(index_num)
+            return
 
+        # Fullスキャン (Quickスキャンからのフォールバックを含む) の結果
+        if rescored_candidate.scan_mode == SCAN_MODE_FULL:
+            if rescored_candidate.is_empty_result:
+                logger.info(f"Full scan identified {url} as an empty result page.")
+                error_list.append([url, "Empty result page detected"])
+                data_manager.clear_scan_data(index_num)
+                return
+            data_manager.update_full_scan_timestamp(index_num)
+
+        # 結果処理 (共通)
+        with span("hash"):
+            new_hash = result_hash(rescored_candidate.links)
+        if rescored_candidate.is_empty_result:
+            logger.info(f"Quick scan identified {url} as an empty result page.")
+            error_list.append([url, "Empty result page detected"])
+            data_manager.clear_scan_data(index_num)
+            return
+        with span("save_result"):
+            if not web_page_type or record['result_vl'] != new_hash:
+                data_manager.update_scan_result(index_num, rescored_candidate)
+            if validators is not None:
+                data_manager.update_http_validators(index_num, validators)
+            data_manager.record_check(index_num, changed=bool(record['result_vl']) and record['result_vl'] != new_hash)
+
+    except Exception as e:
+        tb = traceback.extract_tb(e.__traceback__)
+        last_entry = tb[-1]
+        logger.error(f"Error processing URL {url}: {e} at line {last_entry.lineno}")
+        error_list.append([url, e, last_entry.line, last_entry.lineno])
+
+
+async def run_check_cycle(targets: list,
+                          user: User,
+                          data_manager: DataManager,
+                          notification_manager: NotificationManager,
+                          scheduler: HostScheduler,
+                          browser_pool: BrowserPool,
+                          http_session: aiohttp.ClientSession | None = None,
+                          in_flight: set | None = None,
+                          checkpoint: RunCheckpoint | None = None,
+                          resource_allowlist: ResourceAllowlist | None = None,
+                          page_settler: PageSettler | None = None,
+                          robots_cache: RobotsCache | None = None) -> dict:
+    """
+    指定されたURL群について 事前チェック → スキャン → 差分検出 → スクリーンショット → 通知 を1回行う。
+    単発実行と常駐モードの両方から呼び出され、ブラウザプールやHTTPセッションは呼び出し側が保持する。
+    metrics.enabled の場合、URLごと・段階ごとの所要時間をサイクルの終わりに書き出す。
 
-async def main():
-    user = User("jav")
+    Args:
+        targets: (レコードのindex, URL) のリスト
+        in_flight: 指定した場合、処理中のURLをこの集合に出し入れする (常駐モードの状態表示用)
+        checkpoint: 指定した場合、処理済みのURL・撮影済みのスクリーンショット・通知済みのURLを記録し、
+                    再開した実行ではそれらを繰り返さない
+        resource_allowlist: 指定した場合、スキャンで学習・更新したリソース許可リストをサイクルの終わりに保存する
+        page_settler: 指定した場合、その設定でDOMの静止を待ち、記録した静止時間をサイクルの終わりに保存する
+        robots_cache: 指定した場合、robots.txtをホストごとに再利用し、サイクルの終わりに保存する
+    Returns:
+        サイクルの集計値の辞書
+    """
     config = user.config
-    notification_manager = NotificationManager(user)
-
-    # 一時フォルダのクリーンアップ
-    temp_dir = config.get('screenshot', {}).get('temporary_dir', 'temp_image')
-    if os.path.isdir(temp_dir):
-        shutil.rmtree(temp_dir)
-
-    util_str.util_handle_path(user.data_file_path)
-
-    data_manager = DataManager(user.data_file_path)
     error_list = []
-
-    # 同時実行数を設定から取得
-    worker_count = config.get('scan', {}).get('worker_threads', 2)
-    semaphore = asyncio.Semaphore(worker_count)
-    logger.info(f"Starting {worker_count} async workers...")
-
-    tasks = []
-    for index, row in data_manager.df.iterrows():
-        if 'url' in row and row['url']:
-            task = asyncio.create_task(
-                process_url_async(row['url'], index, data_manager, error_list, config, semaphore)
+    scan_screenshots = create_scan_screenshots(user)
+    image_store = create_image_store(user)
+    scan_metrics = ScanMetrics()
+
+    # --- 事前チェック: 条件付きGETで「変更なし」のURLはブラウザを起動せずに省略する ---
+    precheck_results = {}
+    precheck_config = config.get('precheck', {})
+    if precheck_config.get('enabled', True) and targets:
+        with scan_metrics.cycle_span("precheck"):
+            precheck_results = await precheck_urls(
+                [(url, data_manager.get_http_validators(index)) for index, url in targets],
+                concurrency=precheck_config.get('concurrency', 10),
+                timeout=precheck_config.get('timeout', 10),
+                trust_content_length=precheck_config.get('trust_content_length', False),
+                session=http_session,
             )
-            tasks.append(task)
 
-    # 全てのタスクが完了するのを待つ
-    if tasks:
-        await asyncio.gather(*tasks)
+    skipped_urls = []
+    scan_targets = []
+    for index, url in targets:
+        result = precheck_results.get(url)
+        if result and result.not_modified and data_manager.can_skip_scan(index):
+            skipped_urls.append(url)
+            data_manager.record_check(index, changed=False)
+            if checkpoint is not None:
+                checkpoint.mark_done(index)
+            continue
+        scan_targets.append((index, url, result.validators if result and not result.error else None))
+    if skipped_urls:
+        logger.info(f"Pre-check: skipping {len(skipped_urls)} not-modified URLs: {skipped_urls}")
+
+    async def scan_target(target):
+        index, url, validators = target
+        if in_flight is not None:
+            in_flight.add(url)
+        try:
+            await process_url_async(url, index, data_manager, error_list, config, browser_pool, validators,
+                                    resource_allowlist, page_settler, scan_screenshots, robots_cache,
+                                    scan_metrics=scan_metrics)
+            if checkpoint is not None:
+                checkpoint.mark_done(index)
+        finally:
+            if in_flight is not None:
+                in_flight.discard(url)
+
+    # 全てのURLの処理が完了するまで待つ
+    # 前回までに制限時間を超えたURLは、他のURLを先に処理してから後回しにする (連続した回数が多いほど後)
+    timeout_counts = {index: int(data_manager.get_record_as_dict(index).get('timeout_count') or 0)
+                      for index, _, _ in scan_targets}
+    with scan_metrics.cycle_span("scan"):
+        await scheduler.run(scan_targets, scan_target, url_of=lambda target: target[1],
+                            priority_of=lambda target: timeout_counts[target[0]])
     logger.info("All async workers have finished.")
+    if resource_allowlist is not None:
+        resource_allowlist.save()
+    if page_settler is not None:
+        page_settler.save()
+    if robots_cache is not None:
+        robots_cache.save()
 
     # --- 差分チェック ---
     diff_urls = data_manager.chk_diff()
-    
+    if checkpoint is not None and checkpoint.notified_urls:
+        # 中断前の実行で通知済みの変更は再通知しない
+        already_notified = [url for url in diff_urls if url in checkpoint.notified_urls]
+        if already_notified:
+            logger.info(f"Resume: {len(already_notified)} changes were already notified: {already_notified}")
+        diff_urls = [url for url in diff_urls if url not in checkpoint.notified_urls]
+
+    ss_config = config.get('screenshot', {})
+    temp_dir = ss_config.get('temporary_dir', 'temp_image')
     email_image_list = []
     if diff_urls:
         # --- Screenshot Generation ---
-        ss_config = config.get('screenshot', {})
         if ss_config.get('enabled', False):
-            temp_dir = ss_config.get('temporary_dir', 'temp_image')
-            perm_dir = user.image_dir_path # Use the correct path
-            email_width = ss_config.get('email_width', 500)
-            perm_width = ss_config.get('permanent_width', 1920)
-
-            permanent_image_list = []
-            async with async_playwright() as p:
-                browser = await p.chromium.launch()
-                logger.info(f"Generating screenshots for email to {temp_dir}...")
-                email_image_list = await save_screenshot(browser, url_list=diff_urls, save_dir=temp_dir, width=email_width)
-                
-                logger.info(f"Generating screenshots for permanent storage to {perm_dir}...")
-                permanent_image_list = await save_screenshot(browser, url_list=diff_urls, save_dir=perm_dir, width=perm_width)
-                await browser.close()
-
-
-            # --- Update DataFrame with permanent image filenames ---
-            if permanent_image_list:
-                for i, url in enumerate(diff_urls):
-                    # Assuming the lists correspond by index
-                    if i < len(permanent_image_list):
-                        data_manager.update_image_filename(url, permanent_image_list[i])
-
-    # --- データ保存 (画像ファイル名を含む) ---
-    data_manager.save_data()
+            # 中断前の実行で撮影済みのURLは撮り直さない
+            captured = {}
+            if checkpoint is not None:
+                for url in diff_urls:
+                    paths = checkpoint.get_screenshot(url)
+                    if paths:
+                        captured[url] = paths
+
+            def archive_screenshot(url: str, paths: dict) -> None:
+                # 永続保存用の画像をストアに移し、image_filename はストアのオブジェクトを指す
+                email_path = paths.get("email")
+                permanent_path = paths.get("permanent")
+                if permanent_path:
+                    try:
+                        permanent_path = image_store.put(url, permanent_path, context_path=paths.get("context"))
+                    except OSError as e:
+                        # 画像が見つからない場合もサイクルは止めず、image_filename は前回のまま残す
+                        logger.warning(f"Failed to archive screenshot for {url}: {e}")
+                        permanent_path = None
+                    else:
+                        data_manager.update_image_filename(url, permanent_path)
+                captured[url] = {"email": email_path, "permanent": permanent_path}
+                if checkpoint is not None:
+                    checkpoint.record_screenshot(url, email_path, permanent_path)
+
+            # スキャン中に撮影済みのURLはページを読み込み直さない
+            if scan_screenshots is not None:
+                for url in diff_urls:
+                    paths = scan_screenshots.captured.get(url)
+                    if url not in captured and paths:
+                        archive_screenshot(url, paths)
+            capture_urls = [url for url in diff_urls if url not in captured]
+
+            if capture_urls:
+                # 各URLを1回だけ描画し、その1枚からメール用と永続保存用の画像を作成する
+                outputs = create_screenshot_outputs(user)
+                logger.info(f"Generating screenshots for {len(capture_urls)} URLs (email: {temp_dir}, archive: {image_store.image_dir})...")
+                with scan_metrics.cycle_span("screenshots"):
+                    new_images = await capture_screenshots(browser_pool, capture_urls, outputs,
+                                                           concurrency=ss_config.get('concurrency', 2))
+
+                # --- Update DataFrame with permanent image filenames ---
+                for url in capture_urls:
+                    archive_screenshot(url, new_images[url])
+
+            email_image_list = [captured[url]["email"] for url in diff_urls]
 
     # --- 通知処理 ---
-    await notification_manager.send_update_notification(diff_urls, email_image_list)
+    # (結果は更新ごとにジャーナル/データベースへ保存済み)
+    with scan_metrics.cycle_span("notify"):
+        await notification_manager.send_update_notification(diff_urls, email_image_list)
+    if checkpoint is not None and diff_urls:
+        checkpoint.mark_notified(diff_urls)
+    data_manager.reset_baseline()
 
     if error_list:
         logger.info("-------- ERROR list output -----------")
@@ -557,13 +891,329 @@ async def main():
             logger.warning(error_msg)
         traceback.print_exc()
     
-    notification_manager.send_error_notification(error_list)
+    with scan_metrics.cycle_span("notify"):
+        await notification_manager.send_error_notification(error_list)
+        await notification_manager.finish_cycle()
+
+    # 保持数・容量の上限を超えたスクリーンショットを削除する
+    if config.get('screenshot', {}).get('enabled', False):
+        with scan_metrics.cycle_span("image_gc"):
+            image_store.gc()
+            image_store.save()
+
+    metrics_paths = scan_metrics_paths(user)
+    if metrics_paths is not None:
+        scan_metrics.write(*metrics_paths)
 
     # 一時フォルダの再クリーンアップ
     if os.path.isdir(temp_dir):
         shutil.rmtree(temp_dir)
 
-    logger.info(f"{data_manager.df}")
+    return {
+        "targets": len(targets),
+        "scanned": len(scan_targets),
+        "not_modified": len(skipped_urls),
+        "updated": len(diff_urls),
+        "errors": len(error_list),
+    }
+
+
+def create_browser_pool(config: dict) -> BrowserPool:
+    """ブラウザプールは実行全体で1つだけ起動し、全ワーカーとスクリーンショット処理で共有する"""
+    scan_config = config.get('scan', {})
+    return BrowserPool(
+        size=scan_config.get('browser_count', scan_config.get('worker_threads', 2)),
+        max_pages_per_browser=scan_config.get('pages_per_browser', 50),
+    )
+
+
+def create_scheduler(config: dict) -> HostScheduler:
+    """ホストごとの同時実行数・アクセス間隔を守りながら、ホストをまたいで並列に処理する"""
+    worker_count = config.get('scan', {}).get('worker_threads', 2)
+    logger.info(f"Starting {worker_count} async workers...")
+    return HostScheduler.from_config(worker_count, config.get('politeness', {}))
+
+
+def create_resource_allowlist(user: User) -> ResourceAllowlist | None:
+    """設定 (resource_filter.enabled) が有効な場合に、Quickスキャン用のリソース許可リストを読み込む"""
+    filter_config = user.config.get('resource_filter', {})
+    if not filter_config.get('enabled', False):
+        return None
+    state_path = filter_config.get('state_file') or os.path.join(user.directory, "resource_allowlist.json")
+    return ResourceAllowlist(state_path)
+
+
+def create_robots_cache(user: User, session: aiohttp.ClientSession) -> RobotsCache:
+    """設定 (robots) からrobots.txtのキャッシュを作成する。取得には共有セッションを使う"""
+    robots_config = user.config.get('robots', {})
+    state_path = None
+    if robots_config.get('persist', True):
+        state_path = robots_config.get('state_file') or os.path.join(user.directory, "robots_cache.json")
+    return RobotsCache(ttl_seconds=robots_config.get('ttl_hours', 24) * 3600, state_path=state_path, session=session)
+
+
+def create_notification_dispatcher(user: User) -> NotificationDispatcher | None:
+    """メール通知が有効な場合に、送信用のディスパッチャー (接続の使い回しと送信失敗時のスプール) を作成する"""
+    notification_config = user.config.get('notification', {})
+    if notification_config.get('type', 'none') != 'email' or user.yaml_file is None:
+        return None
+    return NotificationDispatcher(
+        SmtpSettings.from_config(user.yaml_file, notification_config.get('smtp')),
+        spool_dir=notification_config.get('spool_dir') or os.path.join(user.directory, "mail_spool"),
+        max_attempts=notification_config.get('max_attempts', 5),
+    )
+
+
+def create_page_settler(user: User) -> PageSettler:
+    """設定 (page_settle) からDOMの静止待機の設定を作成する。静止時間はユーザーディレクトリに記録する"""
+    settle_config = user.config.get('page_settle', {})
+    stats_path = settle_config.get('stats_file') or os.path.join(user.directory, "settle_times.json")
+    return PageSettler.from_config(settle_config, stats_path=stats_path)
+
+
+def create_screenshot_outputs(user: User) -> dict[str, ScreenshotOutput]:
+    """設定 (screenshot) から、メール用と永続保存用の画像の保存先・サイズ・形式を作成する"""
+    ss_config = user.config.get('screenshot', {})
+    return {
+        "email": ScreenshotOutput.from_config(ss_config.get('email_output'),
+                                              save_dir=ss_config.get('temporary_dir', 'temp_image'),
+                                              width=ss_config.get('email_width', 500)),
+        # 永続保存用は一時フォルダに書き出してから、画像ストア (create_image_store) に移す
+        "permanent": ScreenshotOutput.from_config(ss_config.get('permanent_output'),
+                                                  save_dir=os.path.join(ss_config.get('temporary_dir', 'temp_image'),
+                                                                        "archive"),
+                                                  width=ss_config.get('permanent_width', 1920)),
+    }
+
+
+def create_image_store(user: User) -> ImageStore:
+    """設定 (screenshot.store) から、永続保存用スクリーンショットの画像ストアを作成する"""
+    store_config = user.config.get('screenshot', {}).get('store', {}) or {}
+    max_mb = store_config.get('max_mb')
+    return ImageStore(
+        image_dir=user.image_dir_path,
+        index_path=store_config.get('index_file') or os.path.join(user.directory, "image_store.json"),
+        keep_per_url=store_config.get('keep_per_url', DEFAULT_KEEP_PER_URL),
+        max_bytes=int(max_mb * 1024 * 1024) if max_mb else None,
+    )
+
+
+def scan_metrics_paths(user: User) -> tuple[str, str] | None:
+    """
+    スキャンの段階ごとの所要時間の書き出し先 (OpenMetrics テキスト, JSONL)。metrics.enabled が無効な場合は None
+    出力先ディレクトリの省略時はユーザーディレクトリの metrics/
+    """
+    metrics_config = user.config.get('metrics', {}) or {}
+    if not metrics_config.get('enabled', True):
+        return None
+    metrics_dir = metrics_config.get('dir') or os.path.join(user.directory, "metrics")
+    return (os.path.join(metrics_dir, "scan_stages.prom"),
+            os.path.join(metrics_dir, "scan_stages.jsonl"))
+
+
+def create_scan_screenshots(user: User) -> ScanScreenshots | None:
+    """設定 (screenshot.enabled と screenshot.capture_at_scan) が有効な場合に、スキャン時の撮影設定を作成する"""
+    ss_config = user.config.get('screenshot', {})
+    if not (ss_config.get('enabled', False) and ss_config.get('capture_at_scan', False)):
+        return None
+    outputs = create_screenshot_outputs(user)
+    context_outputs = None
+    if ss_config.get('context_shot', False):
+        # 周辺画像は永続保存用と同じ保存先・形式で書き出す
+        context_outputs = {"context": outputs["permanent"]}
+    return ScanScreenshots(outputs, context_outputs)
+
+
+def clean_temp_dir(config: dict):
+    temp_dir = config.get('screenshot', {}).get('temporary_dir', 'temp_image')
+    if os.path.isdir(temp_dir):
+        shutil.rmtree(temp_dir)
+
+
+def create_data_manager(user: User):
+    """
+    設定 (storage.backend) に応じたデータストアを開く。
+    'sqlite' の場合、データベースが空なら既存の cheacker_url.json (なければ cheacker_url.csv) から1度だけ取り込む。
+    """
+    storage_config = user.config.get('storage', {})
+    if storage_config.get('backend', 'json') == 'sqlite':
+        db_path = storage_config.get('sqlite_path') or os.path.join(user.directory, "cheacker_url.sqlite3")
+        return open_sqlite_data_manager(
+            db_path,
+            json_path=user.data_file_path,
+            csv_path=os.path.join(user.directory, "cheacker_url.csv"),
+            # スナップショットだけでなく、ジャーナルに残った更新も取り込む
+            prepare_json=lambda json_path: DataManager(json_path).save_data(),
+        )
+    util_str.util_handle_path(user.data_file_path)
+    return DataManager(user.data_file_path,
+                       journal_max_bytes=storage_config.get('journal_max_bytes', DEFAULT_JOURNAL_MAX_BYTES))
+
+
+async def main(resume: bool = False):
+    """
+    全URLを1回チェックする。
+    進捗はチェックポイントに記録され、異常終了した場合は resume=True (--resume) で残りのURLから再開できる。
+    """
+    user = User("jav")
+    config = user.config
+    set_file_log_level(config.get('logging', {}).get('file_level', 'INFO'))
+    notification_manager = NotificationManager(user, create_notification_dispatcher(user))
+
+    data_manager = create_data_manager(user)
+    scheduler = create_scheduler(config)
+
+    all_targets = data_manager.url_targets()
+    rate_skipped_urls = []
+
+    checkpoint_path = os.path.join(user.directory, "run_checkpoint.jsonl")
+    checkpoint = RunCheckpoint.load(checkpoint_path)
+    if resume and checkpoint is not None:
+        # 中断した実行の残りのURLから再開する (撮影済みのスクリーンショットを使うため一時フォルダは消さない)
+        targets = checkpoint.remaining_targets()
+        logger.info(f"Resuming run {checkpoint.run_id}: {len(checkpoint.completed)} URLs already done, "
+                    f"{len(targets)} remaining")
+    else:
+        if resume:
+            logger.info("No interrupted run to resume. Starting a new run.")
+        elif checkpoint is not None:
+            logger.warning(f"Run {checkpoint.run_id} was interrupted. Starting a new run (use --resume to continue it).")
+
+        # 一時フォルダのクリーンアップ
+        clean_temp_dir(config)
+
+        # --- 変化率による間引き: 前回確認以降に変化している見込みが低いURLは今回の確認を省略する ---
+        change_policy = ChangeRatePolicy.from_config(config.get('adaptive', {}))
+        targets = []
+        for index, url in all_targets:
+            decision = data_manager.decide_check(index, change_policy)
+            if decision.check:
+                targets.append((index, url))
+                logger.debug(f"Adaptive check: {url} - {decision.reason}")
+            else:
+                rate_skipped_urls.append(url)
+                logger.info(f"Adaptive skip: {url} - {decision.reason} "
+                            f"(rate: {decision.rate_per_day:.3f}/day, last checked {decision.elapsed_hours:.1f}h ago)")
+
+        checkpoint = RunCheckpoint(checkpoint_path)
+        checkpoint.start(targets)
+
+    browser_pool = create_browser_pool(config)
+    # 事前チェックとrobots.txtの取得で、接続プールとDNSキャッシュを共有する
+    try:
+        async with browser_pool, create_http_session() as http_session:
+            stats = await run_check_cycle(targets, user, data_manager, notification_manager, scheduler, browser_pool,
+                                          http_session=http_session, checkpoint=checkpoint,
+                                          resource_allowlist=create_resource_allowlist(user),
+                                          page_settler=create_page_settler(user),
+                                          robots_cache=create_robots_cache(user, http_session))
+    finally:
+        await notification_manager.close()
+
+    # --- データ保存: 正常終了時にスナップショットへまとめる ---
+    data_manager.save_data()
+    checkpoint.finish()
+
+    # --- 実行サマリー ---
+    logger.info("-------- Run summary -----------")
+    logger.info(f"URLs: {len(all_targets)}, skipped by change rate: {len(rate_skipped_urls)}, scanned: {stats['scanned']}, "
+                f"not modified (pre-check): {stats['not_modified']}, updated: {stats['updated']}, errors: {stats['errors']}")
+    logger.info(f"Browser sessions saved by change rate: {len(rate_skipped_urls)}, by pre-check: {stats['not_modified']}")
+
+
+async def run_daemon():
+    """
+    常駐モード。ブラウザプール・HTTPセッション・DataManager を保持したまま、
+    次回チェック時刻のキューから期限が来たURLを順次チェックし続ける。
+    結果は更新ごとに保存され (スナップショットへのまとめは停止時)、状態は状態ファイル (と任意でローカルHTTPエンドポイント) で公開する。
+    """
+    user = User("jav")
+    config = user.config
+    set_file_log_level(config.get('logging', {}).get('file_level', 'INFO'))
+    daemon_config = config.get('daemon', {})
+    notification_manager = NotificationManager(user, create_notification_dispatcher(user))
+    clean_temp_dir(config)
+
+    data_manager = create_data_manager(user)
+    scheduler = create_scheduler(config)
+    change_policy = ChangeRatePolicy.from_config(config.get('adaptive', {}))
+    resource_allowlist = create_resource_allowlist(user)
+    page_settler = create_page_settler(user)
+
+    # 同じURLを短時間に繰り返しチェックしないための最小間隔 (スキャン失敗時の再試行間隔も兼ねる)
+    min_interval = daemon_config.get('min_check_interval_minutes', 30) * 60
+    idle_poll = daemon_config.get('idle_poll_seconds', 60)
+
+    queue = DueQueue()
+    now = time.time()
+    for index, url in data_manager.url_targets():
+        queue.push(index, data_manager.next_check_at(index, change_policy) or now)
+
+    status = DaemonStatus(queue, daemon_config.get('status_file') or os.path.join(user.directory, "daemon_status.json"))
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows では Ctrl-C によるキャンセルで停止する
+
+    browser_pool = create_browser_pool(config)
+    status_runner = None
+    status_writer = asyncio.create_task(status.run_writer(daemon_config.get('status_interval_seconds', 5)))
+    try:
+        async with browser_pool, create_http_session() as http_session:
+            robots_cache = create_robots_cache(user, http_session)
+            if daemon_config.get('status_port'):
+                status_runner = await status.start_server(port=daemon_config['status_port'])
+            logger.info(f"Daemon started with {len(queue)} URLs in the queue")
+
+            while not stop_event.is_set():
+                now = time.time()
+                due_indices = queue.pop_due(now)
+                if not due_indices:
+                    status.state = "idle"
+                    next_due = queue.next_due()
+                    wait = idle_poll if next_due is None else min(idle_poll, max(0.0, next_due - now))
+                    try:
+                        await asyncio.wait_for(stop_event.wait(), timeout=wait)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                status.state = "running"
+                targets = [(index, data_manager.get_url(index)) for index in due_indices]
+                logger.info(f"Daemon cycle: checking {len(targets)} due URLs ({len(queue)} waiting)")
+                stats = await run_check_cycle(targets, user, data_manager, notification_manager, scheduler,
+                                              browser_pool, http_session=http_session, in_flight=status.in_flight,
+                                              resource_allowlist=resource_allowlist, page_settler=page_settler,
+                                              robots_cache=robots_cache)
+
+                finished_at = time.time()
+                for index in due_indices:
+                    due_at = data_manager.next_check_at(index, change_policy) or finished_at
+                    queue.push(index, max(due_at, finished_at + min_interval))
+                status.record_cycle(stats)
+                status.write()
+                logger.info(f"Daemon cycle finished: {stats}, next due at {queue.next_due()}")
+    finally:
+        status.state = "stopped"
+        status_writer.cancel()
+        if status_runner is not None:
+            await status_runner.cleanup()
+        await notification_manager.close()
+        data_manager.save_data()
+        status.write()
+        logger.info("Daemon stopped")
+
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Check registered web pages for updates.")
+    parser.add_argument("--daemon", action="store_true",
+                        help="Keep running and check URLs continuously as they become due.")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted run, skipping URLs it already finished.")
+    args = parser.parse_args()
+
+    asyncio.run(run_daemon() if args.daemon else main(resume=args.resume))